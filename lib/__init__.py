@@ -1,3 +1,6 @@
 from .usd_manager import UsdManager
 from .file_manager import FileManager
-from .data_base import ProjectDataBase
\ No newline at end of file
+from .data_base import ProjectDataBase
+from .project_cache import ProjectCache
+from .layer_cache import LayerCache
+from .db_executor import DataBaseExecutor
\ No newline at end of file
@@ -1,5 +1,294 @@
 import sqlite3
+import threading
+import contextlib
+import datetime
+import hashlib
 import os
+import re
+import sys
+import time
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    SQLite connection that defers commits and rollbacks while a ProjectDataBase.transaction() is open on it.
+
+    The CRUD methods keep calling commit() and using the connection as a context manager, when a transaction is
+    active those calls simply join it and the transaction commits (or rolls back) once, when it ends.
+    """
+    # Incremented each time a SnapshotConnection reloads its copy, see data_version().
+    snapshot_generation = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transaction_depth = 0
+
+    def commit(self):
+        if self.transaction_depth == 0:
+            super().commit()
+
+    def rollback(self):
+        if self.transaction_depth == 0:
+            super().rollback()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.transaction_depth == 0:
+            return super().__exit__(exc_type, exc_value, traceback)
+        return False
+
+
+class ConnectionPool:
+    """
+    Keeps one persistent SQLite connection per thread for a single database file.
+
+    Every connection is configured once when it is opened (journal mode, synchronous level and busy timeout)
+    and then reused by all the queries issued from that thread, so the project database is not reopened
+    on every CRUD call.
+    """
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_path, busy_timeout=5000, journal_mode="WAL", synchronous="NORMAL"):
+        """
+        :param db_path: The filesystem path to the SQLite database.
+        :param busy_timeout: Milliseconds to wait on a locked database before raising.
+        :param journal_mode: The SQLite journal mode used by every connection.
+        :param synchronous: The SQLite synchronous level used by every connection.
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+
+        self._local = threading.local()
+        self._connections = {}  # Thread ident -> connection, used to close connections of finished threads.
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_pool(cls, db_path, busy_timeout=5000, journal_mode="WAL", synchronous="NORMAL"):
+        """
+        Returns the shared pool for a database file, creating it the first time it is requested.
+
+        Pools are shared between every ProjectDataBase instance that points to the same file with the same settings.
+        """
+        key = (os.path.abspath(db_path), busy_timeout, journal_mode.upper(), synchronous.upper())
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(db_path, busy_timeout, journal_mode.upper(), synchronous.upper())
+                cls._pools[key] = pool
+            return pool
+
+    def connect(self):
+        """
+        Returns the connection owned by the calling thread, opening and configuring it if needed.
+
+        """
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000.0, check_same_thread=False, factory=PooledConnection)
+            conn.db_path = self.db_path
+            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.connection = conn
+
+            with self._lock:
+                self._close_finished_threads()
+                self._connections[threading.get_ident()] = conn
+        return conn
+
+    def close(self):
+        """
+        Closes the connection owned by the calling thread.
+
+        """
+        conn = getattr(self._local, "connection", None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+            with self._lock:
+                self._connections.pop(threading.get_ident(), None)
+
+    def close_all(self):
+        """
+        Closes every connection of the pool. Threads will reopen a new one on their next query.
+
+        """
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections = {}
+        self._local = threading.local()
+
+    def _close_finished_threads(self):
+        alive_threads = {thread.ident for thread in threading.enumerate()}
+        for thread_id in list(self._connections):
+            if thread_id not in alive_threads:
+                self._connections.pop(thread_id).close()
+
+
+class SnapshotCursor:
+    """
+    Cursor of a SnapshotConnection. Each statement runs on the in-memory copy or on the project file, see
+    SnapshotConnection.runs_on_file(), the results (rows, lastrowid, rowcount) come from where it ran.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = None
+
+    def execute(self, sql, parameters=()):
+        if self.connection.runs_on_file(sql):
+            self._cursor = self.connection.file_connection.cursor()
+        else:
+            self._cursor = sqlite3.Connection.cursor(self.connection)
+        self._cursor.execute(sql, parameters)
+        return self
+
+    def executemany(self, sql, parameters):
+        self.connection.runs_on_file(sql, write=True)
+        self._cursor = self.connection.file_connection.cursor()
+        self._cursor.executemany(sql, parameters)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SnapshotConnection(PooledConnection):
+    """
+    In-memory copy of the project database, loaded with the sqlite3 backup API and reloaded by SnapshotPool when
+    the file changes. Reads are answered from memory, writes are sent to the pooled connection of the file.
+
+    Everything runs on the file while a write transaction is open there, so a transaction reads its own changes.
+    After a write the copy is reloaded before the next read.
+    """
+    # Statements answered from the copy: queries, pragmas that do not assign anything and deferred read snapshots.
+    read_pattern = re.compile(r"\s*(SELECT|WITH|VALUES|EXPLAIN|PRAGMA [^=]*$|BEGIN(\s+DEFERRED)?(\s+TRANSACTION)?\s*;?\s*$)", re.IGNORECASE)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_connection = None
+        self.file_state = None  # (data_version, total_changes, file mtimes) when the copy was loaded.
+        self.stale = True
+        self.checked_at = 0.0
+
+    @property
+    def in_transaction(self):
+        return super().in_transaction or self.file_connection.in_transaction
+
+    def runs_on_file(self, sql, write=False):
+        """
+        Returns True if sql has to run on the project file. Writes also mark the copy stale.
+
+        """
+        if write or not self.read_pattern.match(sql):
+            self.stale = True
+            return True
+        return self.transaction_depth > 0 or self.file_connection.in_transaction
+
+    def cursor(self, factory=None):
+        return SnapshotCursor(self)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+    def commit(self):
+        if self.transaction_depth == 0:
+            self.file_connection.commit()
+            super().commit()
+
+    def rollback(self):
+        if self.transaction_depth == 0:
+            self.file_connection.rollback()
+            super().rollback()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # sqlite3.Connection.__exit__ would only end the transaction of the copy, the writes went to the file.
+        if self.transaction_depth == 0:
+            if exc_type is not None:
+                self.rollback()
+            else:
+                try:
+                    self.commit()
+                except sqlite3.Error:
+                    self.rollback()
+                    raise
+        return False
+
+    def reload(self):
+        """
+        Copies the project file into memory if it changed since the last copy, or if this connection wrote to it.
+
+        :return: True if the copy was reloaded.
+        """
+        self.checked_at = time.monotonic()
+        file_state = (self.file_connection.execute("PRAGMA data_version").fetchone()[0],
+                      self.file_connection.total_changes,
+                      *(os.path.getmtime(path) if os.path.exists(path) else None
+                        for path in (self.file_connection.db_path, self.file_connection.db_path + "-wal")))
+        if not self.stale and file_state == self.file_state:
+            return False
+
+        self.file_connection.backup(self)
+        self.file_state = file_state
+        self.stale = False
+        self.snapshot_generation += 1
+        return True
+
+
+class SnapshotPool:
+    """
+    Keeps one in-memory copy of the project database per thread, on top of the ConnectionPool of the file.
+
+    Browsing never waits on the file server: the copy is checked against the file at most every refresh_interval
+    seconds (PRAGMA data_version and the mtimes of the database and its WAL) and reloaded when they moved.
+    """
+    def __init__(self, file_pool, refresh_interval=2.0):
+        """
+        :param file_pool: The ConnectionPool of the project file, writes are sent to its connections.
+        :param refresh_interval: Minimum number of seconds between two checks of the file.
+        """
+        self.file_pool = file_pool
+        self.refresh_interval = refresh_interval
+        self._local = threading.local()
+
+    def connect(self):
+        """
+        Returns the in-memory copy of the calling thread, loading it the first time and reloading it if it is out of date.
+
+        """
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(":memory:", check_same_thread=False, factory=SnapshotConnection)
+            conn.row_factory = sqlite3.Row
+            conn.file_connection = self.file_pool.connect()
+            self._local.connection = conn
+
+        # Never reload in the middle of a transaction, its reads must stay on one snapshot.
+        if not conn.in_transaction and (conn.stale or time.monotonic() - conn.checked_at >= self.refresh_interval):
+            conn.reload()
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "connection", None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+        self.file_pool.close()
+
+    def close_all(self):
+        self._local = threading.local()
+        self.file_pool.close_all()
+
 
 class ProjectDataBase:
     # Tables
@@ -125,195 +414,902 @@ class ProjectDataBase:
         FOREIGN KEY(task_id) REFERENCES tasks(task_id)
     );
     """
-    
 
-    # Initialization
-    def __init__(self, db_path):
-        self.db_path = db_path
-        self.initialize_db()  # Call the initialize_db method
+    create_thumbnails_sql = """
+    CREATE TABLE IF NOT EXISTS thumbnails (
+        hash TEXT PRIMARY KEY,
+        data BLOB
+    );
+    """
 
-    def initialize_db(self):
-        # Ensure the folder exists
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+    # Columns returned by the version queries. Snapshots live in the thumbnails table and are fetched lazily by hash.
+    variantVersion_columns = "variantVersion_id, department_id, var_id, version, comment, date, usd_path, pinned, snapshot_hash, timestamp"
+    file_columns = "file_id, task_id, version, comment, date, file_path, file_type, snapshot_hash, timestamp"
 
-        try:
-            # Connect to the SQLite database
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create tables
-            cursor.execute(self.create_assets_sql)
-            cursor.execute(self.create_sequences_sql)
-            cursor.execute(self.create_shots_sql)
-            cursor.execute(self.create_departments_sql)
-            cursor.execute(self.create_setVar_sql)
-            cursor.execute(self.create_variant_sql)
-            cursor.execute(self.create_variantVersion_sql)
-            cursor.execute(self.create_tasks_sql)
-            cursor.execute(self.create_files_sql)
-            cursor.execute(self.trigger_insert_variantVersion_sql)
-            cursor.execute(self.trigger_update_variantVersion_sql)
-            
-            # Commit the changes
-            conn.commit()
-        except sqlite3.Error as e:
-            print(f"An error occurred: {e.args[0]}")
-        finally:
-            # Close the connection
-            conn.close()
-    
-    # Asset CRUD        
-    def create_asset(self, type, name, usd_path, description):
+    # Formats written to the date columns, the first one is the current one. Older USD publishes used the second.
+    date_formats = ["%Y-%m-%d %H:%M:%S", "%d-%m-%Y %H:%M:%S"]
+
+    # Upper bound of the version numbers and timestamps, open ended ranges stop below it.
+    max_version = 2 ** 63 - 1
+
+    # Indexes
+    create_lookup_indexes_sql = [
+        "CREATE INDEX IF NOT EXISTS idx_assets_name ON assets(name)",
+        "CREATE INDEX IF NOT EXISTS idx_sequences_name ON sequences(name)",
+        "CREATE INDEX IF NOT EXISTS idx_shots_seq_name ON shots(seq_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_departments_asset_name ON departments(asset_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_departments_seq_name ON departments(seq_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_departments_shot_name ON departments(shot_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_department_name ON tasks(department_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_setVar_department_name ON setVar(department_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_variant_setVar_name ON variant(setVar_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_variantVersion_var_version ON variantVersion(var_id, version)",
+        "CREATE INDEX IF NOT EXISTS idx_variantVersion_department_version ON variantVersion(department_id, version)",
+        "CREATE INDEX IF NOT EXISTS idx_files_task_version ON files(task_id, version)",
+    ]
+
+    # One row per version number. Rows of the other scope leave the column NULL, and NULLs never collide.
+    create_unique_version_indexes_sql = [
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_variantVersion_var_version_unique ON variantVersion(var_id, version)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_variantVersion_department_version_unique ON variantVersion(department_id, version)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_files_task_version_unique ON files(task_id, version)",
+    ]
+
+    # Range scans of the dailies reports, see publishes_between() and saves_between().
+    create_timestamp_indexes_sql = [
+        "CREATE INDEX IF NOT EXISTS idx_variantVersion_timestamp ON variantVersion(timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_files_timestamp ON files(timestamp)",
+    ]
+
+    # Frame range overlaps scan frame_start and filter frame_end in the index. The per sequence index also holds the
+    # handles, so the farm totals are read from it without touching the table.
+    create_frame_indexes_sql = [
+        "CREATE INDEX IF NOT EXISTS idx_shots_frames ON shots(frame_start, frame_end)",
+        "CREATE INDEX IF NOT EXISTS idx_shots_seq_frames ON shots(seq_id, frame_start, frame_end, handles)",
+    ]
+
+    # Pins are scoped per variant and per department. The partial indexes hold only the pinned rows, so the
+    # triggers find the previous pin of the same scope with one index probe instead of rewriting the whole table.
+    create_pinned_indexes_sql = [
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_variantVersion_var_pinned ON variantVersion(var_id) WHERE pinned = 1",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_variantVersion_department_pinned ON variantVersion(department_id) WHERE pinned = 1",
+    ]
+
+    trigger_insert_scoped_pin_sql = """
+    CREATE TRIGGER IF NOT EXISTS UnpinScopeBeforeInsert
+    BEFORE INSERT ON variantVersion
+    FOR EACH ROW
+    WHEN NEW.pinned = 1
+    BEGIN
+        UPDATE variantVersion SET pinned = 0 WHERE var_id = NEW.var_id AND pinned = 1;
+        UPDATE variantVersion SET pinned = 0 WHERE department_id = NEW.department_id AND pinned = 1;
+    END;
+    """
+
+    trigger_update_scoped_pin_sql = """
+    CREATE TRIGGER IF NOT EXISTS UnpinScopeBeforeUpdate
+    BEFORE UPDATE OF pinned ON variantVersion
+    FOR EACH ROW
+    WHEN NEW.pinned = 1 AND OLD.pinned IS NOT 1
+    BEGIN
+        UPDATE variantVersion SET pinned = 0 WHERE var_id = NEW.var_id AND pinned = 1;
+        UPDATE variantVersion SET pinned = 0 WHERE department_id = NEW.department_id AND pinned = 1;
+    END;
+    """
+
+    # Migrations
+    def _migration_lookup_indexes(self, cursor):
         """
-        Add a new asset to the database.
+        Adds composite indexes on every foreign key and name lookup used by the CRUD methods.
 
-        :param type: The type of the asset.
-        :param name: The name of the asset.
-        :param usd_path: The filesystem path to the asset's USD file.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO assets (type, name, usd_path, description) 
-                VALUES (?, ?, ?, ?)
-            """, (type, name, usd_path, description))
-            conn.commit()
-            return cursor.lastrowid  # Returns the id of the newly created asset
+        for index_sql in self.create_lookup_indexes_sql:
+            cursor.execute(index_sql)
 
-    def get_asset(self, name=None, all=False):
+    def _migration_thumbnail_store(self, cursor):
         """
-        Retrieve all assets or a specific asset by name.
-        
-        :param name: The name of the asset to retrieve (optional).
-        :param all: Boolean indicating whether to retrieve all assets.
-        :return: A list of assets if all=True, or a single asset if all=False and name is provided.
+        Moves the inline snapshot BLOBs of variantVersion and files into the content-addressed thumbnails table.
+
+        The snapshot columns are kept (SQLite can not drop them on every version we ship with) but are emptied,
+        the rows reference their image through snapshot_hash instead.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
-            cursor = conn.cursor()
-            
-            if all:
-                cursor.execute("SELECT * FROM assets")
-                return cursor.fetchall()  # Returns a list of Row objects
-            else:
-                cursor.execute("SELECT * FROM assets WHERE name = ?", (name,))
-                result = cursor.fetchone()
-                return dict(result) if result else None  # Returns a dictionary or None
+        cursor.execute(self.create_thumbnails_sql)
+        for table, id_column in (("variantVersion", "variantVersion_id"), ("files", "file_id")):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN snapshot_hash TEXT")
 
-    def update_asset(self, asset_id, name, usd_path, type, description):
+            rows = cursor.execute(f"SELECT {id_column}, snapshot FROM {table} WHERE snapshot IS NOT NULL").fetchall()
+            for row_id, snapshot in rows:
+                snapshot_hash = self.store_thumbnail(cursor, snapshot)
+                cursor.execute(f"UPDATE {table} SET snapshot = NULL, snapshot_hash = ? WHERE {id_column} = ?", (snapshot_hash, row_id))
+
+    def _migration_unique_versions(self, cursor):
         """
-        Update an asset details.
+        Replaces the version lookup indexes with UNIQUE ones so two publishes can never register the same version.
 
-        :param asset_id: The ID of the asset to update.
-        :param name: The new name of the asset.
-        :param usd_path: The new filesystem path to the asset's USD file.
-        :param description: The new text description of the asset.
+        Duplicates left by concurrent publishes are kept: the newest row of each duplicated version keeps its number
+        (its path holds the content of the last writer), the older rows are renumbered after the highest version of
+        their scope and reported, so no publish or save history is lost.
+        """
+        for table, id_column, scope_column in (("variantVersion", "variantVersion_id", "var_id"),
+                                                ("variantVersion", "variantVersion_id", "department_id"),
+                                                ("files", "file_id", "task_id")):
+            duplicates = cursor.execute(f"""
+                SELECT t.{id_column}, t.{scope_column}, t.version FROM {table} t
+                JOIN (
+                    SELECT {scope_column}, version, MAX({id_column}) AS kept_id FROM {table}
+                    WHERE {scope_column} IS NOT NULL GROUP BY {scope_column}, version HAVING COUNT(*) > 1
+                ) d ON d.{scope_column} = t.{scope_column} AND d.version = t.version AND t.{id_column} != d.kept_id
+                ORDER BY t.{id_column}
+            """).fetchall()
+
+            next_versions = {}
+            for row_id, scope_value, version in duplicates:
+                if scope_value not in next_versions:
+                    next_versions[scope_value] = cursor.execute(
+                        f"SELECT MAX(version) + 1 FROM {table} WHERE {scope_column} = ?", (scope_value,)).fetchone()[0]
+                new_version = next_versions[scope_value]
+                next_versions[scope_value] += 1
+                cursor.execute(f"UPDATE {table} SET version = ? WHERE {id_column} = ?", (new_version, row_id))
+                print(f"{table} {id_column} {row_id}: duplicate version {version} of {scope_column} {scope_value} renumbered to {new_version}")
+
+        cursor.execute("DROP INDEX IF EXISTS idx_variantVersion_var_version")
+        cursor.execute("DROP INDEX IF EXISTS idx_variantVersion_department_version")
+        cursor.execute("DROP INDEX IF EXISTS idx_files_task_version")
+        for index_sql in self.create_unique_version_indexes_sql:
+            cursor.execute(index_sql)
+
+    def _migration_scoped_pins(self, cursor):
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE assets
-                SET name = ?, usd_path = ?, type = ?, description = ?,
-                WHERE id = ?
-            """, (name, usd_path, type, asset_id, description))
-            conn.commit()
+        Replaces the project-wide single-pin triggers with triggers scoped to the variant or department of the pinned version.
 
-    def delete_asset(self, name):
+        The old triggers rewrote every variantVersion row on each pin and unpinned the versions of every other asset.
         """
-        Delete an Asset from the database by its name.
+        cursor.execute("DROP TRIGGER IF EXISTS SetOnlyOnePinnedAfterInsert")
+        cursor.execute("DROP TRIGGER IF EXISTS SetOnlyOnePinnedBeforeUpdate")
+
+        # Keep the newest pin of each scope before the partial indexes enforce uniqueness.
+        for scope_column in ("var_id", "department_id"):
+            cursor.execute(f"""
+                UPDATE variantVersion SET pinned = 0
+                WHERE pinned = 1 AND {scope_column} IS NOT NULL AND variantVersion_id NOT IN (
+                    SELECT MAX(variantVersion_id) FROM variantVersion WHERE pinned = 1 AND {scope_column} IS NOT NULL GROUP BY {scope_column}
+                )
+            """)
+
+        for index_sql in self.create_pinned_indexes_sql:
+            cursor.execute(index_sql)
+        cursor.execute(self.trigger_insert_scoped_pin_sql)
+        cursor.execute(self.trigger_update_scoped_pin_sql)
 
+    # Parent-to-child order of the foreign keys, each child references a table earlier in the list.
+    cascade_tables = [
+        ("shots", [("seq_id", "sequences", "id")]),
+        ("departments", [("seq_id", "sequences", "id"), ("shot_id", "shots", "id"), ("asset_id", "assets", "id")]),
+        ("tasks", [("department_id", "departments", "department_id")]),
+        ("setVar", [("department_id", "departments", "department_id")]),
+        ("variant", [("setVar_id", "setVar", "setVar_id")]),
+        ("variantVersion", [("var_id", "variant", "var_id"), ("department_id", "departments", "department_id")]),
+        ("files", [("task_id", "tasks", "task_id")]),
+    ]
+
+    def _migration_cascading_deletes(self, cursor):
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                DELETE FROM assets WHERE name = ?
-            """, (name,))
-            conn.commit()
+        Rebuilds every child table with ON DELETE CASCADE foreign keys, so deleting an entity removes its whole subtree.
 
-    # Sequence CRUD     
-    def create_sequence(self, name, usd_path, description):
+        Orphans left by the old name-based deletes are swept first, otherwise the foreign key check would reject them.
+        SQLite can not alter a constraint in place, each table is copied into a new definition and renamed back,
+        its indexes and triggers are recreated from their stored SQL. migrate() turns foreign_keys off around the rebuild.
         """
-        Add a new sequence to the database.
+        self._sweep_orphans(cursor)
 
-        :param name: The name of the sequence.
-        :param usd_path: The filesystem path to the sequence's USD file.
-        :param description: A text description of the sequence.
+        for table, references in self.cascade_tables:
+            table_sql, = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+            dependents = [row[0] for row in cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL", (table,))]
+            sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+            columns = ", ".join(row[1] for row in cursor.execute(f"PRAGMA table_info({table})"))
+
+            new_sql = re.sub(rf"CREATE TABLE( IF NOT EXISTS)? {table}\b", f"CREATE TABLE {table}_new", table_sql, count=1)
+            new_sql = re.sub(r"(REFERENCES \w+\(\w+\))(?! ON DELETE)", r"\1 ON DELETE CASCADE", new_sql)
+
+            cursor.execute(new_sql)
+            cursor.execute(f"INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}")
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+            for dependent_sql in dependents:
+                cursor.execute(dependent_sql)
+            if sequence is not None:
+                cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+
+        violations = cursor.execute("PRAGMA foreign_key_check").fetchall()
+        if violations:
+            raise sqlite3.IntegrityError(f"Foreign key violations left after the rebuild: {violations[:5]}")
+
+    create_changelog_sql = """
+    CREATE TABLE IF NOT EXISTS changelog (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT,
+        row_id INTEGER,
+        op TEXT,
+        parent_column TEXT,
+        parent_id INTEGER
+    );
+    """
+
+    # Tables recorded in the changelog, with their id column and the parent columns the UI caches are keyed by.
+    changelog_tables = [
+        ("assets", "id", []),
+        ("sequences", "id", []),
+        ("shots", "id", ["seq_id"]),
+        ("departments", "department_id", ["asset_id", "seq_id", "shot_id"]),
+        ("tasks", "task_id", ["department_id"]),
+        ("setVar", "setVar_id", ["department_id"]),
+        ("variant", "var_id", ["setVar_id"]),
+        ("variantVersion", "variantVersion_id", ["var_id", "department_id"]),
+        ("files", "file_id", ["task_id"]),
+    ]
+
+    def changelog_triggers_sql(self):
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO sequences (name, usd_path, description) 
-                VALUES (?, ?, ?)
-            """, (name, usd_path, description))
-            conn.commit()
-            return cursor.lastrowid  # Returns the id of the newly created sequence
+        Builds the AFTER INSERT/UPDATE/DELETE triggers that record every row change in the changelog.
 
-    def get_sequence(self, name=None, all=False):
+        A change is logged once per parent it belongs to, an update that moves a row also logs its old parent.
+        """
+        triggers = []
+        for table, id_column, parent_columns in self.changelog_tables:
+            for op, row in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+                statements = []
+                if not parent_columns:
+                    statements.append(f"INSERT INTO changelog (table_name, row_id, op) VALUES ('{table}', {row}.{id_column}, '{op}');")
+                for column in parent_columns:
+                    statements.append(
+                        f"INSERT INTO changelog (table_name, row_id, op, parent_column, parent_id) "
+                        f"SELECT '{table}', {row}.{id_column}, '{op}', '{column}', {row}.{column} WHERE {row}.{column} IS NOT NULL;")
+                    if op == "update":
+                        statements.append(
+                            f"INSERT INTO changelog (table_name, row_id, op, parent_column, parent_id) "
+                            f"SELECT '{table}', OLD.{id_column}, 'delete', '{column}', OLD.{column} "
+                            f"WHERE OLD.{column} IS NOT NULL AND OLD.{column} IS NOT NEW.{column};")
+
+                body = "\n        ".join(statements)
+                triggers.append(f"""
+    CREATE TRIGGER IF NOT EXISTS Changelog_{table}_{op}
+    AFTER {op.upper()} ON {table}
+    FOR EACH ROW
+    BEGIN
+        {body}
+    END;
+    """)
+        return triggers
+
+    def _migration_changelog(self, cursor):
         """
-        Rretrieve all sequences or a specific sequence by name.
-        
-        :param name: The name of the sequence to retrieve (optional).
-        :param all: Boolean indicating whether to retrieve all sequences.
-        :return: A list of sequences if all=True, or a single sequence if all=False and name is provided.
+        Adds the changelog table and the triggers feeding it, so clients can ask what changed since a sequence number.
+
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
-            cursor = conn.cursor()
-            
-            if all:
-                cursor.execute("SELECT * FROM sequences")
-                return cursor.fetchall()  # Returns a list of Row objects
-            else:
-                cursor.execute("SELECT * FROM sequences WHERE name = ?", (name,))
-                result = cursor.fetchone()
-                return dict(result) if result else None  # Returns a dictionary or None
+        cursor.execute(self.create_changelog_sql)
+        for trigger_sql in self.changelog_triggers_sql():
+            cursor.execute(trigger_sql)
 
-    def update_sequence(self, seq_id, name, usd_path, description):
+    def _migration_epoch_timestamps(self, cursor):
         """
-        Update a sequence's details in the database.
+        Adds an indexed integer epoch timestamp column to variantVersion and files, backfilled from the date text,
+        and rewrites the dates stored in the older day-first format to the current one.
 
-        :param seq_id: The ID of the sequence to update.
-        :param name: The new name of the sequence.
-        :param usd_path: The new filesystem path to the sequence's USD file.
-        :param description: The new text description of the sequence.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE sequences
-                SET name = ?, usd_path = ?, description = ?
-                WHERE id = ?
-            """, (name, usd_path, description, seq_id))
-            conn.commit()
+        for table, id_column in (("variantVersion", "variantVersion_id"), ("files", "file_id")):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN timestamp INTEGER")
 
-    def delete_sequence(self, name):
+            rows = cursor.execute(f"SELECT {id_column}, date FROM {table} WHERE date IS NOT NULL").fetchall()
+            updates = []
+            for row_id, date in rows:
+                timestamp = self.parse_timestamp(date)
+                if timestamp is not None:
+                    updates.append((self.format_timestamp(timestamp), timestamp, row_id))
+            cursor.executemany(f"UPDATE {table} SET date = ?, timestamp = ? WHERE {id_column} = ?", updates)
+
+        for index_sql in self.create_timestamp_indexes_sql:
+            cursor.execute(index_sql)
+
+    def _migration_frame_ranges(self, cursor):
         """
-        Delete a sequence from the database by its name.
+        Adds integer frame_start, frame_end and handles columns to shots, parsed from the framerange text, and indexes them.
 
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                DELETE FROM sequences WHERE name = ?
-            """, (name,))
-            conn.commit()
+        cursor.execute("ALTER TABLE shots ADD COLUMN frame_start INTEGER")
+        cursor.execute("ALTER TABLE shots ADD COLUMN frame_end INTEGER")
+        cursor.execute("ALTER TABLE shots ADD COLUMN handles INTEGER NOT NULL DEFAULT 0")
 
-    # Shot CRUD
-    def create_shot(self, seq_id, name, framerange, description, usd_path):
+        rows = cursor.execute("SELECT id, framerange FROM shots WHERE framerange IS NOT NULL").fetchall()
+        updates = [self.parse_framerange(framerange) + (shot_id,) for shot_id, framerange in rows]
+        cursor.executemany("UPDATE shots SET frame_start = ?, frame_end = ? WHERE id = ?", updates)
+
+        for index_sql in self.create_frame_indexes_sql:
+            cursor.execute(index_sql)
+
+    # Full-text index of the names, descriptions and comments, see search(). The rowid encodes the source row as
+    # row_id * 8 + kind code, so the triggers update a single entry by rowid and the kind is read back without a join.
+    # Paths are stored for display only, every version path repeats the asset name and would drown its hits.
+    create_search_index_sql = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        name,
+        text,
+        path UNINDEXED,
+        tokenize = 'porter unicode61'
+    );
+    """
+
+    # Indexed sources: (kind, kind code, table, id column, name column, text column, path column).
+    search_sources = [
+        ("asset", 1, "assets", "id", "name", "description", "usd_path"),
+        ("sequence", 2, "sequences", "id", "name", "description", "usd_path"),
+        ("shot", 3, "shots", "id", "name", "description", "usd_path"),
+        ("variantVersion", 4, "variantVersion", "variantVersion_id", "NULL", "comment", "usd_path"),
+        ("file", 5, "files", "file_id", "NULL", "comment", "file_path"),
+    ]
+
+    def search_triggers_sql(self):
         """
-        Add a new shot to the database.
-        
-        :param seq_id: The ID of the sequence this shot belongs to.
-        :param name: The name of the shot.
-        :param framerange: The frame range of the shot.
+        Builds the AFTER INSERT/UPDATE/DELETE triggers that keep search_index in sync with its source tables.
+
+        Updates only fire when the indexed columns change, pinning a version does not touch the index.
+        """
+        triggers = []
+        for kind, code, table, id_column, name_column, text_column, path_column in self.search_sources:
+            columns = [column for column in (id_column, name_column, text_column, path_column) if column != "NULL"]
+            values = ", ".join(column if column == "NULL" else f"NEW.{column}" for column in (name_column, text_column, path_column))
+            insert = f"INSERT INTO search_index (rowid, name, text, path) VALUES (NEW.{id_column} * 8 + {code}, {values});"
+            delete = f"DELETE FROM search_index WHERE rowid = OLD.{id_column} * 8 + {code};"
+            for op, event, body in (("insert", "INSERT", insert),
+                                    ("update", f"UPDATE OF {', '.join(columns)}", f"{delete}\n        {insert}"),
+                                    ("delete", "DELETE", delete)):
+                triggers.append(f"""
+    CREATE TRIGGER IF NOT EXISTS Search_{table}_{op}
+    AFTER {event} ON {table}
+    FOR EACH ROW
+    BEGIN
+        {body}
+    END;
+    """)
+        return triggers
+
+    def _migration_search_index(self, cursor):
+        """
+        Adds the search_index full-text table, filled from the existing rows, and the triggers keeping it in sync.
+        Builds of SQLite without FTS5 skip it, search() then returns no hits.
+
+        """
+        try:
+            cursor.execute(self.create_search_index_sql)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search disabled, SQLite was built without FTS5: {e}")
+            return
+
+        for kind, code, table, id_column, name_column, text_column, path_column in self.search_sources:
+            cursor.execute(f"""
+                INSERT INTO search_index (rowid, name, text, path)
+                SELECT {id_column} * 8 + {code}, {name_column}, {text_column}, {path_column} FROM {table}
+            """)
+        for trigger_sql in self.search_triggers_sql():
+            cursor.execute(trigger_sql)
+
+    # Latest published and pinned version of every variant and department sublayer, see get_current_version().
+    # Rows of the other scope leave the column NULL like in variantVersion. The partial index holds only the scopes
+    # whose pin lags the latest version, the status views read it without touching the up to date ones.
+    create_current_versions_sql = """
+    CREATE TABLE IF NOT EXISTS current_versions (
+        var_id INTEGER,
+        department_id INTEGER,
+        latest_id INTEGER,
+        latest_version INTEGER,
+        latest_path TEXT,
+        pinned_id INTEGER,
+        pinned_version INTEGER,
+        pinned_path TEXT
+    );
+    """
+
+    create_current_versions_indexes_sql = [
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_current_versions_var ON current_versions(var_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_current_versions_department ON current_versions(department_id)",
+        "CREATE INDEX IF NOT EXISTS idx_current_versions_lagging ON current_versions(var_id, department_id) WHERE pinned_version < latest_version",
+    ]
+
+    def current_versions_refresh_sql(self, scope_column, scope_value):
+        """
+        Statements recomputing the current_versions row of one scope. Each version is read with one index probe,
+        the latest from the version index and the pin from the partial pinned index. Scopes left without a
+        published version lose their row.
+
+        """
+        columns = "variantVersion_id, version, usd_path"
+        return [
+            f"UPDATE current_versions SET "
+            f"(latest_id, latest_version, latest_path) = (SELECT {columns} FROM variantVersion "
+            f"WHERE {scope_column} = {scope_value} AND usd_path IS NOT NULL ORDER BY version DESC LIMIT 1), "
+            f"(pinned_id, pinned_version, pinned_path) = (SELECT {columns} FROM variantVersion "
+            f"WHERE {scope_column} = {scope_value} AND pinned = 1) "
+            f"WHERE {scope_column} = {scope_value};",
+            f"DELETE FROM current_versions WHERE {scope_column} = {scope_value} AND latest_id IS NULL;",
+        ]
+
+    def current_versions_triggers_sql(self):
+        """
+        Builds the AFTER INSERT/UPDATE/DELETE triggers on variantVersion that keep current_versions up to date.
+
+        Reservations (no usd_path yet) are skipped until they are published. An update that moves a version also
+        refreshes its old scope.
+        """
+        triggers = []
+        for op, event, row in (("insert", "INSERT", "NEW"),
+                               ("update", "UPDATE OF var_id, department_id, version, usd_path, pinned", "NEW"),
+                               ("delete", "DELETE", "OLD")):
+            statements = []
+            for scope_column in ("var_id", "department_id"):
+                if row == "NEW":
+                    statements.append(
+                        f"INSERT OR IGNORE INTO current_versions ({scope_column}) "
+                        f"SELECT NEW.{scope_column} WHERE NEW.{scope_column} IS NOT NULL AND NEW.usd_path IS NOT NULL;")
+                statements += self.current_versions_refresh_sql(scope_column, f"{row}.{scope_column}")
+                if op == "update":
+                    statements += [f"{statement[:-1]} AND OLD.{scope_column} IS NOT NEW.{scope_column};"
+                                   for statement in self.current_versions_refresh_sql(scope_column, f"OLD.{scope_column}")]
+
+            body = "\n        ".join(statements)
+            triggers.append(f"""
+    CREATE TRIGGER IF NOT EXISTS CurrentVersions_{op}
+    AFTER {event} ON variantVersion
+    FOR EACH ROW
+    BEGIN
+        {body}
+    END;
+    """)
+        return triggers
+
+    def _migration_current_versions(self, cursor):
+        """
+        Adds the current_versions table, filled from the published versions, and the triggers keeping it up to date.
+
+        """
+        cursor.execute(self.create_current_versions_sql)
+        for index_sql in self.create_current_versions_indexes_sql:
+            cursor.execute(index_sql)
+
+        for scope_column in ("var_id", "department_id"):
+            cursor.execute(f"""
+                INSERT INTO current_versions ({scope_column})
+                SELECT DISTINCT {scope_column} FROM variantVersion WHERE {scope_column} IS NOT NULL AND usd_path IS NOT NULL
+            """)
+            refresh_sql = self.current_versions_refresh_sql(scope_column, f"current_versions.{scope_column}")[0]
+            cursor.execute(f"{refresh_sql[:-1]} AND current_versions.{scope_column} IS NOT NULL")
+
+        for trigger_sql in self.current_versions_triggers_sql():
+            cursor.execute(trigger_sql)
+
+    # Composition arcs between the project layers, see get_layer_dependencies() and get_layer_dependents(). Paths
+    # are absolute and normalized. indexed_layers records the file state each layer was scanned at, so only the
+    # layers changed since are scanned again. The asset_path index answers the reverse "who uses" queries.
+    create_indexed_layers_sql = """
+    CREATE TABLE IF NOT EXISTS indexed_layers (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    """
+
+    create_layer_dependencies_sql = """
+    CREATE TABLE IF NOT EXISTS layer_dependencies (
+        layer_path TEXT NOT NULL,
+        asset_path TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        PRIMARY KEY (layer_path, asset_path, kind)
+    ) WITHOUT ROWID;
+    """
+
+    create_layer_dependencies_indexes_sql = [
+        "CREATE INDEX IF NOT EXISTS idx_layer_dependencies_asset ON layer_dependencies(asset_path, layer_path)",
+    ]
+
+    def _migration_layer_dependencies(self, cursor):
+        """
+        Adds the layer dependency index. It starts empty, DependencyIndex.update() fills it.
+
+        """
+        cursor.execute(self.create_indexed_layers_sql)
+        cursor.execute(self.create_layer_dependencies_sql)
+        for index_sql in self.create_layer_dependencies_indexes_sql:
+            cursor.execute(index_sql)
+
+    # Ordered schema upgrades. Migration N (1-based) upgrades a database from PRAGMA user_version N-1 to N.
+    # Only append to this list, never reorder or edit an entry that has already shipped.
+    migrations = [
+        _migration_lookup_indexes,
+        _migration_thumbnail_store,
+        _migration_unique_versions,
+        _migration_scoped_pins,
+        _migration_cascading_deletes,
+        _migration_changelog,
+        _migration_epoch_timestamps,
+        _migration_frame_ranges,
+        _migration_search_index,
+        _migration_current_versions,
+        _migration_layer_dependencies,
+    ]
+
+    # Lookups issued while browsing and publishing. None of them should fall back to a full table SCAN.
+    hot_queries = [
+        ("get_asset", "SELECT * FROM assets WHERE name = ?", ("",)),
+        ("get_sequence", "SELECT * FROM sequences WHERE name = ?", ("",)),
+        ("get_shot", "SELECT * FROM shots WHERE seq_id = ? AND name = ?", (0, "")),
+        ("get_shots", "SELECT * FROM shots WHERE seq_id = ?", (0,)),
+        ("get_department", "SELECT * FROM departments WHERE asset_id = ? AND name = ?", (0, "")),
+        ("get_sequence_departments", "SELECT * FROM departments WHERE seq_id = ?", (0,)),
+        ("get_shot_departments", "SELECT * FROM departments WHERE shot_id = ?", (0,)),
+        ("get_task", "SELECT * FROM tasks WHERE department_id = ? AND name = ?", (0, "")),
+        ("get_setVar", "SELECT * FROM setVar WHERE department_id = ? AND name = ?", (0, "")),
+        ("get_variant", "SELECT * FROM variant WHERE setVar_id = ? AND name = ?", (0, "")),
+        ("get_variantVersion", "SELECT * FROM variantVersion WHERE var_id = ? AND version = ?", (0, 0)),
+        ("get_variantVersions", "SELECT * FROM variantVersion WHERE var_id = ?", (0,)),
+        ("get_sublayerVersions", "SELECT * FROM variantVersion WHERE department_id = ?", (0,)),
+        ("get_variantVersions_page", "SELECT * FROM variantVersion WHERE var_id = ? AND version < ? ORDER BY version DESC LIMIT ?", (0, 0, 50)),
+        ("get_sublayerVersions_page", "SELECT * FROM variantVersion WHERE department_id = ? AND version < ? ORDER BY version DESC LIMIT ?", (0, 0, 50)),
+        ("get_variantVersions_since", "SELECT * FROM variantVersion WHERE var_id = ? AND variantVersion_id > ?", (0, 0)),
+        ("get_current_variant_version", "SELECT * FROM current_versions WHERE var_id = ?", (0,)),
+        ("get_current_sublayer_version", "SELECT * FROM current_versions WHERE department_id = ?", (0,)),
+        ("unpin_variant", "UPDATE variantVersion SET pinned = 0 WHERE var_id = ? AND pinned = 1", (0,)),
+        ("unpin_department", "UPDATE variantVersion SET pinned = 0 WHERE department_id = ? AND pinned = 1", (0,)),
+        ("get_file", "SELECT * FROM files WHERE task_id = ? AND file_id = ?", (0, 0)),
+        ("get_files", "SELECT * FROM files WHERE task_id = ?", (0,)),
+        ("get_files_page", "SELECT * FROM files WHERE task_id = ? AND version < ? ORDER BY version DESC LIMIT ?", (0, 0, 50)),
+        ("get_files_since", "SELECT * FROM files WHERE task_id = ? AND file_id > ?", (0, 0)),
+        ("publishes_between", "SELECT * FROM variantVersion WHERE timestamp >= ? AND timestamp < ?", (0, 0)),
+        ("saves_between", "SELECT * FROM files WHERE timestamp >= ? AND timestamp < ?", (0, 0)),
+        ("get_shots_in_range", "SELECT * FROM shots WHERE frame_start <= ? AND frame_end >= ?", (0, 0)),
+        ("get_sequence_shots_in_range", "SELECT * FROM shots WHERE seq_id = ? AND frame_start <= ? AND frame_end >= ?", (0, 0, 0)),
+        ("get_changes_since", "SELECT * FROM changelog WHERE seq > ? ORDER BY seq", (0,)),
+        ("get_layer_dependencies", "SELECT asset_path, kind FROM layer_dependencies WHERE layer_path = ?", ("",)),
+        ("get_layer_dependents", "SELECT layer_path, kind FROM layer_dependencies WHERE asset_path = ?", ("",)),
+    ]
+
+    # Initialization
+    def __init__(self, db_path, busy_timeout=5000, journal_mode="WAL", synchronous="NORMAL", snapshot=False, refresh_interval=2.0):
+        """
+        :param db_path: The filesystem path to the project database.
+        :param busy_timeout: Milliseconds to wait on a database locked by another artist before raising.
+        :param journal_mode: SQLite journal mode of the pooled connections.
+        :param synchronous: SQLite synchronous level of the pooled connections.
+        :param snapshot: Answer reads from an in-memory copy of the database, for clients that mostly browse.
+                         Writes still go to the file, see SnapshotPool.
+        :param refresh_interval: With snapshot=True, minimum number of seconds between two checks of the file for changes.
+        """
+        self.db_path = db_path
+        self.snapshot = snapshot
+
+        # Ensure the folder exists before the pool opens the file.
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.pool = ConnectionPool.get_pool(db_path, busy_timeout=busy_timeout, journal_mode=journal_mode, synchronous=synchronous)
+
+        self.initialize_db()  # Call the initialize_db method
+
+        # The schema is created and migrated on the file first, the copies are taken from the upgraded database.
+        if snapshot:
+            self.pool = SnapshotPool(self.pool, refresh_interval=refresh_interval)
+
+    def connect(self):
+        """
+        Returns the persistent connection of the calling thread.
+
+        Can be used as a context manager, in which case the changes are committed on exit (or rolled back on error).
+        """
+        return self.pool.connect()
+
+    def close(self):
+        """
+        Closes the pooled connection of the calling thread.
+
+        """
+        self.pool.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Groups every write issued by the calling thread into a single commit.
+
+        CRUD methods called inside the block join the transaction instead of committing on their own. Nested blocks
+        join the outermost one, which commits on exit or rolls everything back if an exception escapes.
+
+        Usage:
+            with db.transaction():
+                db.create_shot(...)
+                db.create_department(...)
+        """
+        conn = self.connect()
+        if conn.transaction_depth > 0:
+            conn.transaction_depth += 1
+            try:
+                yield conn
+            finally:
+                conn.transaction_depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.transaction_depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.transaction_depth = 0
+            conn.rollback()
+            raise
+        conn.transaction_depth = 0
+        try:
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def initialize_db(self):
+        try:
+            # Connect to the SQLite database
+            conn = self.connect()
+            cursor = conn.cursor()
+
+            # The base schema is only created on new databases, later changes are applied by the migrations.
+            if self.get_schema_version() == 0:
+                # Create tables
+                cursor.execute(self.create_assets_sql)
+                cursor.execute(self.create_sequences_sql)
+                cursor.execute(self.create_shots_sql)
+                cursor.execute(self.create_departments_sql)
+                cursor.execute(self.create_setVar_sql)
+                cursor.execute(self.create_variant_sql)
+                cursor.execute(self.create_variantVersion_sql)
+                cursor.execute(self.create_tasks_sql)
+                cursor.execute(self.create_files_sql)
+                cursor.execute(self.trigger_insert_variantVersion_sql)
+                cursor.execute(self.trigger_update_variantVersion_sql)
+
+                # Commit the changes
+                conn.commit()
+
+            self.migrate()
+        except sqlite3.Error as e:
+            print(f"An error occurred: {e.args[0]}")
+
+    def get_schema_version(self):
+        """
+        Returns the schema version of the database, stored in PRAGMA user_version.
+
+        """
+        return self.connect().execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self):
+        """
+        Upgrades the database in place by applying every migration newer than its schema version.
+
+        Each migration runs in its own write transaction together with the user_version bump, so an interrupted
+        upgrade resumes from the last completed step and two clients opening an old project can not apply the same step twice.
+        """
+        conn = self.connect()
+        target_version = len(self.migrations)
+
+        current_version = self.get_schema_version()
+        if current_version > target_version:
+            print(f"Database schema version {current_version} is newer than this tool ({target_version}). Please update the pipeline.")
+            return
+
+        # Table rebuilds must not trigger the cascades, foreign_keys can only be switched outside a transaction.
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            self._apply_migrations(conn, current_version, target_version)
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+
+    def _apply_migrations(self, conn, current_version, target_version):
+        while current_version < target_version:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Another client may have upgraded the database while we were waiting for the lock.
+                current_version = self.get_schema_version()
+                if current_version >= target_version:
+                    conn.commit()
+                    break
+
+                migration = self.migrations[current_version]
+                migration(self, cursor)
+                cursor.execute(f"PRAGMA user_version = {current_version + 1}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            current_version += 1
+    
+    # Asset CRUD        
+    def create_asset(self, type, name, usd_path, description):
+        """
+        Add a new asset to the database.
+
+        :param type: The type of the asset.
+        :param name: The name of the asset.
+        :param usd_path: The filesystem path to the asset's USD file.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO assets (type, name, usd_path, description) 
+                VALUES (?, ?, ?, ?)
+            """, (type, name, usd_path, description))
+            conn.commit()
+            return cursor.lastrowid  # Returns the id of the newly created asset
+
+    def get_asset(self, name=None, all=False):
+        """
+        Retrieve all assets or a specific asset by name.
+        
+        :param name: The name of the asset to retrieve (optional).
+        :param all: Boolean indicating whether to retrieve all assets.
+        :return: A list of assets if all=True, or a single asset if all=False and name is provided.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            
+            if all:
+                cursor.execute("SELECT * FROM assets")
+                return cursor.fetchall()  # Returns a list of Row objects
+            else:
+                cursor.execute("SELECT * FROM assets WHERE name = ?", (name,))
+                result = cursor.fetchone()
+                return dict(result) if result else None  # Returns a dictionary or None
+
+    def update_asset(self, asset_id, name, usd_path, type, description):
+        """
+        Update an asset details.
+
+        :param asset_id: The ID of the asset to update.
+        :param name: The new name of the asset.
+        :param usd_path: The new filesystem path to the asset's USD file.
+        :param description: The new text description of the asset.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE assets
+                SET name = ?, usd_path = ?, type = ?, description = ?,
+                WHERE id = ?
+            """, (name, usd_path, type, asset_id, description))
+            conn.commit()
+
+    def delete_asset(self, name):
+        """
+        Delete an Asset from the database by its name.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM assets WHERE name = ?
+            """, (name,))
+            conn.commit()
+
+    def delete_asset_by_id(self, asset_id):
+        """
+        Delete an asset with its departments, setVars, variants, versions and files by its ID. Everything that belongs to it is removed by the ON DELETE CASCADE relations.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM assets WHERE id = ?", (asset_id,))
+            conn.commit()
+
+    # Sequence CRUD     
+    def create_sequence(self, name, usd_path, description):
+        """
+        Add a new sequence to the database.
+
+        :param name: The name of the sequence.
+        :param usd_path: The filesystem path to the sequence's USD file.
+        :param description: A text description of the sequence.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO sequences (name, usd_path, description) 
+                VALUES (?, ?, ?)
+            """, (name, usd_path, description))
+            conn.commit()
+            return cursor.lastrowid  # Returns the id of the newly created sequence
+
+    def get_sequence(self, name=None, all=False):
+        """
+        Rretrieve all sequences or a specific sequence by name.
+        
+        :param name: The name of the sequence to retrieve (optional).
+        :param all: Boolean indicating whether to retrieve all sequences.
+        :return: A list of sequences if all=True, or a single sequence if all=False and name is provided.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            
+            if all:
+                cursor.execute("SELECT * FROM sequences")
+                return cursor.fetchall()  # Returns a list of Row objects
+            else:
+                cursor.execute("SELECT * FROM sequences WHERE name = ?", (name,))
+                result = cursor.fetchone()
+                return dict(result) if result else None  # Returns a dictionary or None
+
+    def update_sequence(self, seq_id, name, usd_path, description):
+        """
+        Update a sequence's details in the database.
+
+        :param seq_id: The ID of the sequence to update.
+        :param name: The new name of the sequence.
+        :param usd_path: The new filesystem path to the sequence's USD file.
+        :param description: The new text description of the sequence.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE sequences
+                SET name = ?, usd_path = ?, description = ?
+                WHERE id = ?
+            """, (name, usd_path, description, seq_id))
+            conn.commit()
+
+    def delete_sequence(self, name):
+        """
+        Delete a sequence from the database by its name.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM sequences WHERE name = ?
+            """, (name,))
+            conn.commit()
+
+    def delete_sequence_by_id(self, seq_id):
+        """
+        Delete a sequence with its shots, departments, versions and files by its ID. Everything that belongs to it is removed by the ON DELETE CASCADE relations.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM sequences WHERE id = ?", (seq_id,))
+            conn.commit()
+
+    # Shot CRUD
+    framerange_pattern = re.compile(r"^\s*(\d+)\s*[-:]\s*(\d+)\s*$")
+
+    @classmethod
+    def parse_framerange(cls, framerange):
+        """
+        Parses a "1001-1045" frame range into its first and last frames.
+
+        :return: A (frame_start, frame_end) tuple, or (None, None) if framerange is empty or malformed.
+        """
+        match = cls.framerange_pattern.match(framerange or "")
+        if not match:
+            return None, None
+        return int(match.group(1)), int(match.group(2))
+
+    def create_shot(self, seq_id, name, framerange, description, usd_path, handles=0):
+        """
+        Add a new shot to the database.
+        
+        :param seq_id: The ID of the sequence this shot belongs to.
+        :param name: The name of the shot.
+        :param framerange: The frame range of the shot, e.g. "1001-1045". Also stored as integer frame_start/frame_end.
         :param description: A text description of the shot.
+        :param handles: Extra frames rendered on each side of the range.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        frame_start, frame_end = self.parse_framerange(framerange)
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT INTO shots (seq_id, name, framerange, description, usd_path)
-                VALUES (?, ?, ?, ?, ?)
-            """, (seq_id, name, framerange, description, usd_path))
+                INSERT INTO shots (seq_id, name, framerange, description, usd_path, frame_start, frame_end, handles)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (seq_id, name, framerange, description, usd_path, frame_start, frame_end, handles))
             conn.commit()
             return cursor.lastrowid  # Returns the id of the newly created shot
 
@@ -326,8 +1322,7 @@ class ProjectDataBase:
         :param all: Boolean indicating whether to retrieve all shots for the sequence.
         :return: A list of shots if all=True, or a single shot if all=False and shot_name is provided.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
+        with self.connect() as conn:
             cursor = conn.cursor()
             
             if all:
@@ -338,7 +1333,7 @@ class ProjectDataBase:
                 result = cursor.fetchone()
                 return dict(result) if result else None  # Returns a dictionary or None
 
-    def update_shot(self, shot_id, seq_id, name, framerange, description):
+    def update_shot(self, shot_id, seq_id, name, framerange, description, handles=None):
         """
         Update a shot's details in the database.
 
@@ -347,27 +1342,40 @@ class ProjectDataBase:
         :param name: The new name of the shot.
         :param framerange: The new frame range of the shot.
         :param description: The new text description of the shot.
+        :param handles: The new handles of the shot, None to keep them.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        frame_start, frame_end = self.parse_framerange(framerange)
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE shots
-                SET seq_id = ?, name = ?, framerange = ?, description = ?
+                SET seq_id = ?, name = ?, framerange = ?, description = ?, frame_start = ?, frame_end = ?, handles = COALESCE(?, handles)
                 WHERE id = ?
-            """, (seq_id, name, framerange, description, shot_id))
+            """, (seq_id, name, framerange, description, frame_start, frame_end, handles, shot_id))
             conn.commit()
 
     def delete_shot(self, name):
         """
         Delete a shot from the database by its name.
+        Names are not unique across parents, prefer delete_shot_by_id().
 
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM shots WHERE name = ?
             """, (name,))
             conn.commit()
+
+    def delete_shot_by_id(self, shot_id):
+        """
+        Delete a shot with its departments, versions and files by its ID. Everything that belongs to it is removed by the ON DELETE CASCADE relations.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM shots WHERE id = ?", (shot_id,))
+            conn.commit()
     
     # Department CRUD
     def create_department(self, id_type, id_value, name, usd_path):
@@ -382,7 +1390,7 @@ class ProjectDataBase:
         if id_type not in ['sequence', 'shot', 'asset']:
             raise ValueError("Invalid id_type specified. Use 'sequence', 'shot', or 'asset'.")
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             
             # Initialize all potential foreign keys with NULL
@@ -413,8 +1421,7 @@ class ProjectDataBase:
         :param all: Boolean indicating whether to retrieve all departments linked to the sequence, shot or asset.
         :return: A list of departments if all=True, or a single department if all=False and department_name is provided.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
+        with self.connect() as conn:
             cursor = conn.cursor()
             if id_type == "sequence":
                 id_column = "seq_id"
@@ -439,7 +1446,7 @@ class ProjectDataBase:
         Update a department's details in the database, allowing linkage to either a sequence, shot or asset.
 
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             if id_type == "sequence":
                 id_column = "seq_id"
@@ -459,7 +1466,7 @@ class ProjectDataBase:
         Delete a department from the database by its name and associated sequence, shot or asset.
 
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             if id_type == "sequence":
                 id_column = "seq_id"
@@ -472,6 +1479,16 @@ class ProjectDataBase:
             """, (name, id_value))
             conn.commit()
 
+    def delete_department_by_id(self, department_id):
+        """
+        Delete a department with its tasks, setVars, variants, versions and files by its ID. Everything that belongs to it is removed by the ON DELETE CASCADE relations.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM departments WHERE department_id = ?", (department_id,))
+            conn.commit()
+
     # Task CRUD
     def create_task(self, department_id, task_name):
         """
@@ -480,7 +1497,7 @@ class ProjectDataBase:
         :param department_id: The ID of the department to which the task is associated.
         :param task_name: The name of the task.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO tasks (department_id, name)
@@ -498,8 +1515,7 @@ class ProjectDataBase:
         :param all: Boolean indicating whether to retrieve all tasks linked to the department.
         :return: A list of tasks if all=True, or a single task if all=False and task_name is provided.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
+        with self.connect() as conn:
             cursor = conn.cursor()
             if all:
                 cursor.execute(f"""
@@ -518,7 +1534,7 @@ class ProjectDataBase:
         Update a task's details in the database.
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute(f"""
                 UPDATE tasks
@@ -532,11 +1548,11 @@ class ProjectDataBase:
         Delete a task from the database by its name and associated department or variant.
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute(f"""
-                DELETE FROM departments WHERE name = ? AND task_id = ?
-            """, (task_name, task_id))
+                DELETE FROM tasks WHERE task_id = ? AND name = ?
+            """, (task_id, task_name))
             conn.commit()
 
     # SetVar CRUD
@@ -545,7 +1561,7 @@ class ProjectDataBase:
         Add a new setVar to a specific department.
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO setVar (department_id, name, usd_path)
@@ -563,8 +1579,7 @@ class ProjectDataBase:
         :param all: Boolean indicating whether to retrieve all setVars in the department.
         :return: A list of setVars if all=True, or a single setVar if all=False and setVar_name is provided.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
+        with self.connect() as conn:
             cursor = conn.cursor()
             
             if all:
@@ -585,7 +1600,7 @@ class ProjectDataBase:
         Update a setVar's details in the database.
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE setVar
@@ -597,22 +1612,33 @@ class ProjectDataBase:
     def delete_setVar(self, name):
         """
         Delete a setVar from the database by its name.
+        Names are not unique across parents, prefer delete_setVar_by_id().
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM setVar WHERE name = ?
             """, (name,))
             conn.commit()
 
+    def delete_setVar_by_id(self, setVar_id):
+        """
+        Delete a setVar with its variants and their versions by its ID. Everything that belongs to it is removed by the ON DELETE CASCADE relations.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM setVar WHERE setVar_id = ?", (setVar_id,))
+            conn.commit()
+
     # Variant CRUD
     def create_variant(self, setVar_id, name):
         """
         Add a new variant to a specific setVar.
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO variant (setVar_id, name)
@@ -630,8 +1656,7 @@ class ProjectDataBase:
         :param all: Boolean indicating whether to retrieve all variants in the setVar.
         :return: A list of variants if all=True, or a single variant if all=False and var_name is provided.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
+        with self.connect() as conn:
             cursor = conn.cursor()
             
             if all:
@@ -652,7 +1677,7 @@ class ProjectDataBase:
         Update a variant details in the database.
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE variant
@@ -664,29 +1689,74 @@ class ProjectDataBase:
     def delete_variant(self, name):
         """
         Delete a variant from the database by its name.
+        Names are not unique across parents, prefer delete_variant_by_id().
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM variant WHERE name = ?
             """, (name,))
             conn.commit()
 
-    # File CRUD
-    def create_file(self, task_id, version, comment, date, file_path, file_type, snapshot):
+    def delete_variant_by_id(self, var_id):
+        """
+        Delete a variant with its versions by its ID. Everything that belongs to it is removed by the ON DELETE CASCADE relations.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM variant WHERE var_id = ?", (var_id,))
+            conn.commit()
+
+    # File CRUD
+    def create_file(self, task_id, version, comment, date, file_path, file_type, snapshot):
+        """
+        Add a new file associated with a specific task.
+        
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            snapshot_hash = self.store_thumbnail(cursor, snapshot)
+            cursor.execute("""
+                INSERT INTO files (task_id, version, comment, date, file_path, file_type, snapshot_hash, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (task_id, version, comment, date, file_path, file_type, snapshot_hash, self.parse_timestamp(date)))
+            conn.commit()
+            return cursor.lastrowid  # Returns the ID of the newly created file
+
+    def reserve_file(self, task_id):
+        """
+        Atomically allocate the next version number of a task and reserve it with a placeholder row.
+
+        The highest version is read from the (task_id, version) index inside a BEGIN IMMEDIATE transaction,
+        so concurrent savers are serialized and each one gets a different number.
+
+        :param task_id: The ID of the task.
+        :return: A (file_id, version) tuple. Complete the row with finalize_file() or release it with delete_file().
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM files WHERE task_id = ?", (task_id,))
+            version = cursor.fetchone()[0]
+            # The placeholder keeps the reserve time until it is finalized, so sweep_orphans() can tell stale ones.
+            cursor.execute("INSERT INTO files (task_id, version, timestamp) VALUES (?, ?, ?)", (task_id, version, int(time.time())))
+        return cursor.lastrowid, version
+
+    def finalize_file(self, file_id, comment, date, file_path, file_type, snapshot):
         """
-        Add a new file associated with a specific task.
-        
+        Fill in a file row reserved with reserve_file() once the scene has been written.
+
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
+            snapshot_hash = self.store_thumbnail(cursor, snapshot)
             cursor.execute("""
-                INSERT INTO files (task_id, version, comment, date, file_path, file_type, snapshot)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (task_id, version, comment, date, file_path, file_type, snapshot))
+                UPDATE files
+                SET comment = ?, date = ?, file_path = ?, file_type = ?, snapshot_hash = ?, timestamp = ?
+                WHERE file_id = ?
+            """, (comment, date, file_path, file_type, snapshot_hash, self.parse_timestamp(date), file_id))
             conn.commit()
-            return cursor.lastrowid  # Returns the ID of the newly created file
 
     def get_file(self, task_id, file_id=None, all=False):
         """
@@ -697,38 +1767,74 @@ class ProjectDataBase:
         :param all: Boolean indicating whether to retrieve all files in the task.
         :return: A list of files if all=True, or a single file if all=False and file_id is provided.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Makes the fetch return a dictionary-like Row object
+        with self.connect() as conn:
             cursor = conn.cursor()
             
             if all:
-                # Retrieve all files for the specified task
-                cursor.execute("""
-                    SELECT * FROM files WHERE task_id = ?
+                # Retrieve all files for the specified task, skipping versions reserved by a save still in progress
+                cursor.execute(f"""
+                    SELECT {self.file_columns} FROM files WHERE task_id = ? AND file_path IS NOT NULL ORDER BY version DESC
                 """, (task_id,))
                 return cursor.fetchall()  # Returns a list of Row objects
             elif file_id is not None:
                 # Retrieve a specific file by file_id within the specified task
-                cursor.execute("""
-                    SELECT * FROM files WHERE task_id = ? AND file_id = ?
+                cursor.execute(f"""
+                    SELECT {self.file_columns} FROM files WHERE task_id = ? AND file_id = ?
                 """, (task_id, file_id))
                 return cursor.fetchone()  # Returns a single Row object or None
             else:
                 # No valid identifier provided; return None or handle as appropriate
                 return None
 
+    def get_files_since(self, task_id, file_id):
+        """
+        Retrieve the saved files of a task whose row is newer than file_id, to append them to a list already loaded.
+
+        Row ids only grow, so this also returns versions reserved before file_id but saved after it.
+
+        :param task_id: The ID of the task.
+        :param file_id: The newest file_id the caller has already seen (0 for every file).
+        :return: A list of Row objects ordered by version.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {self.file_columns} FROM files WHERE task_id = ? AND file_id > ? AND file_path IS NOT NULL
+                ORDER BY version
+            """, (task_id, file_id))
+            return cursor.fetchall()
+
+    def get_files_page(self, task_id, before_version=None, limit=50):
+        """
+        Retrieve one page of the saved files of a task, newest first. Pass the oldest version of a page as
+        before_version to get the next one (keyset pagination, each page is a single index range scan).
+
+        :param task_id: The ID of the task.
+        :param before_version: Only return versions older than this one, None for the first page.
+        :param limit: The maximum number of files returned, -1 for no limit.
+        :return: A list of Row objects ordered by version, newest first.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {self.file_columns} FROM files
+                WHERE task_id = ? AND version < ? AND file_path IS NOT NULL
+                ORDER BY version DESC LIMIT ?
+            """, (task_id, before_version if before_version is not None else self.max_version, limit))
+            return cursor.fetchall()
+
     def update_file(self, file_id, version, task_id, comment, date, file_path, file_type):
         """
         Update details of an existing file.
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE files
-                SET task_id = ?, version = ?, comment = ?, date = ?, file_path = ?, file_type = ?
+                SET task_id = ?, version = ?, comment = ?, date = ?, file_path = ?, file_type = ?, timestamp = ?
                 WHERE file_id = ?
-            """, (task_id, version, comment, date, file_path, file_type, file_id))
+            """, (task_id, version, comment, date, file_path, file_type, self.parse_timestamp(date), file_id))
             conn.commit()
 
     def delete_file(self, file_id):
@@ -736,7 +1842,7 @@ class ProjectDataBase:
         Delete a file from the database by its file ID.
         
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
             conn.commit()
@@ -751,26 +1857,65 @@ class ProjectDataBase:
         :param comment: A comment or note about the USD version.
         :param date: The date the USD version was added or modified.
         :param usd_path: The filesystem path to the USD file.
+        :param snapshot: The image bytes of the snapshot, stored once per content hash in the thumbnails table.
         """
         if id_type == "variant":
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
+                snapshot_hash = self.store_thumbnail(cursor, snapshot)
                 cursor.execute("""
-                    INSERT INTO variantVersion (var_id, version, comment, date, usd_path, snapshot, pinned, department_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (id_value, version, comment, date, usd_path, snapshot, False, None))
+                    INSERT INTO variantVersion (var_id, version, comment, date, usd_path, snapshot_hash, pinned, department_id, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (id_value, version, comment, date, usd_path, snapshot_hash, False, None, self.parse_timestamp(date)))
                 conn.commit()
                 return cursor.lastrowid  # Returns the ID of the newly created USD version
         else:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
+                snapshot_hash = self.store_thumbnail(cursor, snapshot)
                 cursor.execute("""
-                    INSERT INTO variantVersion (department_id, version, comment, date, usd_path, snapshot, pinned, var_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (id_value, version, comment, date, usd_path, snapshot, False, None))
+                    INSERT INTO variantVersion (department_id, version, comment, date, usd_path, snapshot_hash, pinned, var_id, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (id_value, version, comment, date, usd_path, snapshot_hash, False, None, self.parse_timestamp(date)))
                 conn.commit()
                 return cursor.lastrowid  # Returns the ID of the newly created USD version
-    
+
+    def reserve_variantVersion(self, id_type, id_value):
+        """
+        Atomically allocate the next USD version number of a variant/department and reserve it with a placeholder row.
+
+        The highest version is read from the (var_id, version) or (department_id, version) index inside a
+        BEGIN IMMEDIATE transaction, so concurrent publishers are serialized and each one gets a different number.
+
+        :param id_type: Either "department" or "variant".
+        :param id_value: The ID of the variant/department the USD version is associated with.
+        :return: A (variantVersion_id, version) tuple. Complete the row with finalize_variantVersion() or release it with delete_usdVersion().
+        """
+        id_column = "var_id" if id_type == "variant" else "department_id"
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COALESCE(MAX(version), 0) + 1 FROM variantVersion WHERE {id_column} = ?", (id_value,))
+            version = cursor.fetchone()[0]
+            cursor.execute(f"INSERT INTO variantVersion ({id_column}, version, pinned, timestamp) VALUES (?, ?, ?, ?)",
+                           (id_value, version, False, int(time.time())))
+        return cursor.lastrowid, version
+
+    def finalize_variantVersion(self, variantVersion_id, comment, date, usd_path, snapshot):
+        """
+        Fill in a USD version reserved with reserve_variantVersion() once the USD file has been exported.
+
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            snapshot_hash = self.store_thumbnail(cursor, snapshot)
+            cursor.execute("""
+                UPDATE variantVersion
+                SET comment = ?, date = ?, usd_path = ?, snapshot_hash = ?, timestamp = ?
+                WHERE variantVersion_id = ?
+            """, (comment, date, usd_path, snapshot_hash, self.parse_timestamp(date), variantVersion_id))
+            conn.commit()
+
     def get_variantVersion(self, id_type, id_value, variantVersion_version=None, all=False):
         """
         Retrieve all USD versions for a variant/department or a specific USD version by its ID.
@@ -782,32 +1927,73 @@ class ProjectDataBase:
         :return: A list of USD versions if all=True, or a single USD version if all=False and usdVersion_id is provided.
         """
         if id_type == "variant":
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 
                 if all:
-                    cursor.execute("SELECT * FROM variantVersion WHERE var_id = ?", (id_value,))
+                    cursor.execute(f"SELECT {self.variantVersion_columns} FROM variantVersion WHERE var_id = ? AND usd_path IS NOT NULL ORDER BY version DESC", (id_value,))
                     return cursor.fetchall()  # Returns a list of Row objects
                 elif variantVersion_version is not None:
-                    cursor.execute("SELECT * FROM variantVersion WHERE var_id = ? AND version = ?", (id_value, variantVersion_version))
+                    cursor.execute(f"SELECT {self.variantVersion_columns} FROM variantVersion WHERE var_id = ? AND version = ?", (id_value, variantVersion_version))
                     return cursor.fetchone()  # Returns a single Row object or None
                 else:
                     return None
         else:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 
                 if all:
-                    cursor.execute("SELECT * FROM variantVersion WHERE department_id = ?", (id_value,))
+                    cursor.execute(f"SELECT {self.variantVersion_columns} FROM variantVersion WHERE department_id = ? AND usd_path IS NOT NULL ORDER BY version DESC", (id_value,))
                     return cursor.fetchall()  # Returns a list of Row objects
                 elif variantVersion_version is not None:
-                    cursor.execute("SELECT * FROM variantVersion WHERE department_id = ? AND version = ?", (id_value, variantVersion_version))
+                    cursor.execute(f"SELECT {self.variantVersion_columns} FROM variantVersion WHERE department_id = ? AND version = ?", (id_value, variantVersion_version))
                     return cursor.fetchone()  # Returns a single Row object or None
                 else:
                     return None
 
+    def get_variantVersions_since(self, id_type, id_value, variantVersion_id):
+        """
+        Retrieve the published USD versions of a variant/department whose row is newer than variantVersion_id, to
+        append them to a list already loaded.
+
+        Row ids only grow, so this also returns versions reserved before variantVersion_id but published after it.
+
+        :param id_type: Either "department" or "variant".
+        :param id_value: The ID of the variant/department.
+        :param variantVersion_id: The newest variantVersion_id the caller has already seen (0 for every version).
+        :return: A list of Row objects ordered by version.
+        """
+        id_column = "var_id" if id_type == "variant" else "department_id"
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {self.variantVersion_columns} FROM variantVersion
+                WHERE {id_column} = ? AND variantVersion_id > ? AND usd_path IS NOT NULL
+                ORDER BY version
+            """, (id_value, variantVersion_id))
+            return cursor.fetchall()
+
+    def get_variantVersions_page(self, id_type, id_value, before_version=None, limit=50):
+        """
+        Retrieve one page of the published USD versions of a variant/department, newest first. Pass the oldest version
+        of a page as before_version to get the next one (keyset pagination, each page is a single index range scan).
+
+        :param id_type: Either "department" or "variant".
+        :param id_value: The ID of the variant/department.
+        :param before_version: Only return versions older than this one, None for the first page.
+        :param limit: The maximum number of versions returned, -1 for no limit.
+        :return: A list of Row objects ordered by version, newest first.
+        """
+        id_column = "var_id" if id_type == "variant" else "department_id"
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {self.variantVersion_columns} FROM variantVersion
+                WHERE {id_column} = ? AND version < ? AND usd_path IS NOT NULL
+                ORDER BY version DESC LIMIT ?
+            """, (id_value, before_version if before_version is not None else self.max_version, limit))
+            return cursor.fetchall()
+
     def update_variantVersion(self, variantVersion_id, **kwargs):
         """
         Dynamically update details of an existing USD version based on provided keyword arguments.
@@ -815,11 +2001,15 @@ class ProjectDataBase:
         :param variantVersion_id: The ID of the USD version to update.
         :param kwargs: Keyword arguments corresponding to the column names and their new values.
         """
+        # The timestamp follows the date text.
+        if 'date' in kwargs:
+            kwargs['timestamp'] = self.parse_timestamp(kwargs['date'])
+
         # Construct the SET part of the SQL query dynamically based on kwargs
         set_clause = ', '.join([f"{key} = ?" for key in kwargs])
         parameters = list(kwargs.values()) + [variantVersion_id]
 
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute(f"""
                 UPDATE variantVersion
@@ -834,13 +2024,708 @@ class ProjectDataBase:
         
         :param usdVersion_id: The ID of the USD version to delete.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM variantVersion WHERE variantVersion_id = ?", (variantVersion_id,))
             conn.commit()
-        
+
+    # Bulk CRUD
+    def _insert_many(self, table, columns, rows):
+        """
+        Inserts every row with a single executemany inside the active (or a new) transaction.
+
+        The write lock is held for the whole statement, so the AUTOINCREMENT ids are consecutive and the last one
+        is enough to rebuild all of them.
+
+        :return: The ids of the inserted rows, in input order.
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+
+        placeholders = ", ".join("?" for _ in columns)
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+            last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def _delete_many(self, sql, rows):
+        rows = list(rows)
+        if not rows:
+            return 0
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(sql, rows)
+            return cursor.rowcount
+
+    def create_assets_bulk(self, assets):
+        """
+        Add many assets in one transaction.
+
+        :param assets: Iterable of (type, name, usd_path, description) tuples, as passed to create_asset().
+        :return: The ids of the new assets, in input order.
+        """
+        return self._insert_many("assets", ("type", "name", "usd_path", "description"), assets)
+
+    def create_sequences_bulk(self, sequences):
+        """
+        Add many sequences in one transaction.
+
+        :param sequences: Iterable of (name, usd_path, description) tuples, as passed to create_sequence().
+        :return: The ids of the new sequences, in input order.
+        """
+        return self._insert_many("sequences", ("name", "usd_path", "description"), sequences)
+
+    def create_shots_bulk(self, shots):
+        """
+        Add many shots in one transaction.
+
+        :param shots: Iterable of (seq_id, name, framerange, description, usd_path) tuples, as passed to create_shot().
+        :return: The ids of the new shots, in input order.
+        """
+        rows = ((seq_id, name, framerange, description, usd_path) + self.parse_framerange(framerange)
+                for seq_id, name, framerange, description, usd_path in shots)
+        return self._insert_many("shots", ("seq_id", "name", "framerange", "description", "usd_path", "frame_start", "frame_end"), rows)
+
+    def create_departments_bulk(self, id_type, departments):
+        """
+        Add many departments of the same entity type in one transaction.
+
+        :param id_type: A string indicating the type of entity ('sequence', 'shot', or 'asset') the departments are associated with.
+        :param departments: Iterable of (id_value, name, usd_path) tuples.
+        :return: The ids of the new departments, in input order.
+        """
+        if id_type not in ['sequence', 'shot', 'asset']:
+            raise ValueError("Invalid id_type specified. Use 'sequence', 'shot', or 'asset'.")
+        id_column = {"sequence": "seq_id", "shot": "shot_id", "asset": "asset_id"}[id_type]
+
+        return self._insert_many("departments", (id_column, "name", "usd_path"), departments)
+
+    def delete_assets_bulk(self, asset_ids):
+        """
+        Delete many assets by ID in one transaction, like delete_asset_by_id(). Names are not unique across
+        parents and the ON DELETE CASCADE relations remove everything below each row.
+
+        :return: The number of deleted rows.
+        """
+        return self._delete_many("DELETE FROM assets WHERE id = ?", ((asset_id,) for asset_id in asset_ids))
+
+    def delete_sequences_bulk(self, seq_ids):
+        """
+        Delete many sequences by ID in one transaction, like delete_sequence_by_id(). Names are not unique across
+        parents and the ON DELETE CASCADE relations remove everything below each row.
+
+        :return: The number of deleted rows.
+        """
+        return self._delete_many("DELETE FROM sequences WHERE id = ?", ((sequence_id,) for sequence_id in seq_ids))
+
+    def delete_shots_bulk(self, shot_ids):
+        """
+        Delete many shots by ID in one transaction, like delete_shot_by_id(). Names are not unique across
+        parents and the ON DELETE CASCADE relations remove everything below each row.
+
+        :return: The number of deleted rows.
+        """
+        return self._delete_many("DELETE FROM shots WHERE id = ?", ((shot_id,) for shot_id in shot_ids))
+
+    def delete_departments_bulk(self, id_type, departments):
+        """
+        Delete many departments of the same entity type in one transaction.
+
+        :param id_type: Either "sequence", "shot" or "asset".
+        :param departments: Iterable of (id_value, name) tuples.
+        :return: The number of deleted rows.
+        """
+        if id_type not in ['sequence', 'shot', 'asset']:
+            raise ValueError("Invalid id_type specified. Use 'sequence', 'shot', or 'asset'.")
+        id_column = {"sequence": "seq_id", "shot": "shot_id", "asset": "asset_id"}[id_type]
+
+        return self._delete_many(f"DELETE FROM departments WHERE {id_column} = ? AND name = ?", departments)
+
+    # Project tree
+    # One set-based query per level of the hierarchy, see load_tree(). Snapshots are left out, they load lazily.
+    tree_queries = [
+        ("assets", "SELECT * FROM assets"),
+        ("sequences", "SELECT * FROM sequences"),
+        ("shots", "SELECT * FROM shots"),
+        ("departments", "SELECT * FROM departments"),
+        ("tasks", "SELECT * FROM tasks"),
+        ("setVars", "SELECT * FROM setVar"),
+        ("variants", "SELECT * FROM variant"),
+        ("latest_versions", f"""
+            SELECT {", ".join("vv." + column for column in variantVersion_columns.split(", "))}
+            FROM current_versions cv
+            JOIN variantVersion vv ON vv.variantVersion_id = cv.latest_id
+            WHERE cv.var_id IS NOT NULL
+        """),
+        ("current_versions", "SELECT * FROM current_versions"),
+    ]
+
+    def load_tree(self):
+        """
+        Retrieve the whole project skeleton (assets, sequences, shots, departments, tasks, setVars, variants and the
+        latest version of every variant) in one query per level, read from a single consistent snapshot.
+
+        :return: A dictionary of Row lists keyed by the names in tree_queries, plus "changelog_seq": the latest
+                 change included in the snapshot.
+        """
+        conn = self.connect()
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")  # Deferred: a read snapshot, the write lock is never taken.
+        try:
+            tree = {name: conn.execute(sql).fetchall() for name, sql in self.tree_queries}
+            tree["changelog_seq"] = self.get_changelog_seq()
+        finally:
+            if own_transaction:
+                conn.rollback()
+        return tree
+
+    # Publish history
+    @classmethod
+    def parse_timestamp(cls, date):
+        """
+        Converts a date column value (local time, in any of date_formats) to an integer epoch timestamp.
+
+        :return: The timestamp, or None if date is empty or in an unknown format.
+        """
+        if not date:
+            return None
+        for date_format in cls.date_formats:
+            try:
+                return int(datetime.datetime.strptime(date, date_format).timestamp())
+            except ValueError:
+                continue
+        return None
+
+    @classmethod
+    def format_timestamp(cls, timestamp):
+        """
+        Converts an epoch timestamp to the date text written to the date columns.
+
+        """
+        return datetime.datetime.fromtimestamp(timestamp).strftime(cls.date_formats[0])
+
+    def publishes_since(self, timestamp, department=None):
+        """
+        Retrieve every USD version published since an epoch timestamp, see publishes_between().
+
+        """
+        return self.publishes_between(timestamp, None, department=department)
+
+    def publishes_between(self, start, end=None, department=None):
+        """
+        Retrieve the USD versions published in a time range, oldest first, with the department they belong to.
+        The range is read with one scan of the timestamp index.
+
+        :param start: Epoch timestamp of the start of the range (included).
+        :param end: Epoch timestamp of the end of the range (excluded), None for no end.
+        :param department: Only return the publishes of the departments with this name, e.g. "modelling" (optional).
+        :return: A list of Row objects with the variantVersion columns plus department_name, asset_id, seq_id and shot_id.
+        """
+        columns = ", ".join(f"vv.{column}" for column in self.variantVersion_columns.split(", "))
+        sql = f"""
+            SELECT {columns}, d.name AS department_name, d.asset_id, d.seq_id, d.shot_id
+            FROM variantVersion vv
+            LEFT JOIN variant v ON v.var_id = vv.var_id
+            LEFT JOIN setVar s ON s.setVar_id = v.setVar_id
+            JOIN departments d ON d.department_id = COALESCE(vv.department_id, s.department_id)
+            WHERE vv.timestamp >= ? AND vv.timestamp < ? AND vv.usd_path IS NOT NULL
+        """
+        return self._history_between(sql, "vv.timestamp", start, end, department)
+
+    def saves_between(self, start, end=None, department=None):
+        """
+        Retrieve the scene files saved in a time range, oldest first, with the task and department they belong to.
+        The range is read with one scan of the timestamp index.
+
+        :param start: Epoch timestamp of the start of the range (included).
+        :param end: Epoch timestamp of the end of the range (excluded), None for no end.
+        :param department: Only return the saves of the departments with this name (optional).
+        :return: A list of Row objects with the files columns plus task_name, department_name, asset_id, seq_id and shot_id.
+        """
+        columns = ", ".join(f"f.{column}" for column in self.file_columns.split(", "))
+        sql = f"""
+            SELECT {columns}, t.name AS task_name, d.name AS department_name, d.asset_id, d.seq_id, d.shot_id
+            FROM files f
+            JOIN tasks t ON t.task_id = f.task_id
+            JOIN departments d ON d.department_id = t.department_id
+            WHERE f.timestamp >= ? AND f.timestamp < ? AND f.file_path IS NOT NULL
+        """
+        return self._history_between(sql, "f.timestamp", start, end, department)
+
+    def _history_between(self, sql, timestamp_column, start, end, department):
+        parameters = [start, end if end is not None else self.max_version]
+        if department is not None:
+            # The unlikely() hint keeps the timestamp index as the driving loop, departments has no name index.
+            sql += " AND unlikely(d.name = ?)"
+            parameters.append(department)
+        sql += f" ORDER BY {timestamp_column}"
+
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, parameters)
+            return cursor.fetchall()
+
+    # Frame ranges
+    def get_shots_in_range(self, first_frame, last_frame, seq_id=None):
+        """
+        Retrieve the shots whose frame range overlaps first_frame-last_frame, ordered by frame_start.
+
+        :param first_frame: The first frame of the range.
+        :param last_frame: The last frame of the range (included).
+        :param seq_id: Only search the shots of this sequence (optional).
+        :return: A list of Row objects. Shots without a parsable frame range are never returned.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            if seq_id is None:
+                cursor.execute("""
+                    SELECT * FROM shots WHERE frame_start <= ? AND frame_end >= ? ORDER BY frame_start
+                """, (last_frame, first_frame))
+            else:
+                cursor.execute("""
+                    SELECT * FROM shots WHERE seq_id = ? AND frame_start <= ? AND frame_end >= ? ORDER BY frame_start
+                """, (seq_id, last_frame, first_frame))
+            return cursor.fetchall()
+
+    def get_sequence_frame_totals(self, seq_id=None):
+        """
+        Frame totals per sequence, used to size farm submissions. Read from the shots frame index only.
+
+        :param seq_id: Only total this sequence (optional).
+        :return: A list of Row objects (seq_id, shot_count, first_frame, last_frame, frame_count, frame_count_with_handles).
+                 Shots without a parsable frame range are not counted.
+        """
+        sql = """
+            SELECT seq_id,
+                   COUNT(*) AS shot_count,
+                   MIN(frame_start) AS first_frame,
+                   MAX(frame_end) AS last_frame,
+                   SUM(frame_end - frame_start + 1) AS frame_count,
+                   SUM(frame_end - frame_start + 1 + 2 * handles) AS frame_count_with_handles
+            FROM shots
+            WHERE frame_start IS NOT NULL AND frame_end IS NOT NULL {condition}
+            GROUP BY seq_id
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            if seq_id is None:
+                cursor.execute(sql.format(condition=""))
+            else:
+                cursor.execute(sql.format(condition="AND seq_id = ?"), (seq_id,))
+            return cursor.fetchall()
+
+    # Search
+    # Words dropped from the queries, they match most comments and only slow the ranking down.
+    search_stopwords = {"a", "an", "and", "at", "by", "for", "from", "in", "is", "of", "on", "or", "the", "to", "with"}
+
+    def search(self, text, kinds=None, limit=50):
+        """
+        Full-text search of the asset, sequence and shot names and descriptions, and of the version and file comments.
+        Hits must contain every word of text, the last word may be cut short while typing ("wheel norm" finds "fixed
+        the wheel normals"). If no row holds all the words, rows holding any of them are returned instead.
+
+        :param text: The words to look for.
+        :param kinds: Only return hits of these kinds, any of "asset", "sequence", "shot", "variantVersion", "file" (optional).
+        :param limit: The maximum number of hits.
+        :return: A list of Row objects (kind, row_id, name, text, path, snippet, rank), best match first. A name match
+                 ranks above a match in the text.
+        """
+        words = re.findall(r"\w+", text.lower())
+        words = [word for word in words if word not in self.search_stopwords] or words
+        if not words:
+            return []
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += "*"
+
+        codes = {kind: code for kind, code, *_ in self.search_sources}
+        kind_case = " ".join(f"WHEN {code} THEN '{kind}'" for kind, code in codes.items())
+        condition = ""
+        if kinds is not None:
+            unknown = [kind for kind in kinds if kind not in codes]
+            if unknown:
+                print(f"Unknown search kinds: {unknown}. Expected any of {list(codes)}.")
+                return []
+            condition = f"AND rowid % 8 IN ({', '.join(str(codes[kind]) for kind in kinds)})"
+
+        sql = f"""
+            SELECT CASE rowid % 8 {kind_case} END AS kind,
+                   rowid / 8 AS row_id,
+                   name,
+                   text,
+                   path,
+                   snippet(search_index, 1, '[', ']', '...', 12) AS snippet,
+                   bm25(search_index, 10.0, 1.0) AS rank
+            FROM search_index
+            WHERE search_index MATCH ? {condition}
+            ORDER BY rank
+            LIMIT ?
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, (" AND ".join(terms), limit))
+                hits = cursor.fetchall()
+                if not hits and len(terms) > 1:
+                    cursor.execute(sql, (" OR ".join(terms), limit))
+                    hits = cursor.fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"Search failed: {e}")
+                return []
+            return hits
+
+    # Current versions
+    def get_current_version(self, id_type, id_value):
+        """
+        Retrieve the latest published and the pinned version of a variant/department from current_versions.
+
+        :param id_type: Either "department" or "variant".
+        :param id_value: The ID of the variant/department.
+        :return: A Row object (var_id, department_id, latest_id, latest_version, latest_path, pinned_id, pinned_version,
+                 pinned_path), or None if nothing was published yet. The pinned columns are NULL without a pin.
+        """
+        id_column = "var_id" if id_type == "variant" else "department_id"
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM current_versions WHERE {id_column} = ?", (id_value,))
+            return cursor.fetchone()
+
+    def get_lagging_pins(self):
+        """
+        Retrieve every variant and department sublayer whose pinned version is older than its latest publish,
+        read from the partial index of current_versions.
+
+        :return: A list of Row objects with the current_versions columns plus department_name, asset_id, seq_id,
+                 shot_id, asset_name, setVar_name and variant_name (NULL for department sublayers).
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT cv.*, d.name AS department_name, d.asset_id, d.seq_id, d.shot_id,
+                       a.name AS asset_name, s.name AS setVar_name, v.name AS variant_name
+                FROM current_versions cv
+                LEFT JOIN variant v ON v.var_id = cv.var_id
+                LEFT JOIN setVar s ON s.setVar_id = v.setVar_id
+                JOIN departments d ON d.department_id = COALESCE(cv.department_id, s.department_id)
+                LEFT JOIN assets a ON a.id = d.asset_id
+                WHERE cv.pinned_version < cv.latest_version
+            """)
+            return cursor.fetchall()
+
+    # Layer dependencies
+    # Recursive queries stop at this depth, composition cycles would otherwise never end.
+    max_dependency_depth = 64
+
+    @staticmethod
+    def normalize_layer_path(path):
+        return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+    def get_indexed_layers(self):
+        """
+        Retrieve the file state every layer of the dependency index was scanned at.
+
+        :return: A dictionary of layer path -> (mtime_ns, size).
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT path, mtime_ns, size FROM indexed_layers")
+            return {row["path"]: (row["mtime_ns"], row["size"]) for row in cursor.fetchall()}
+
+    def update_layer_dependencies(self, layers, removed_paths=()):
+        """
+        Replaces the dependencies of the scanned layers and forgets the removed ones, in one transaction.
+
+        :param layers: Iterable of (path, mtime_ns, size, dependencies) tuples, dependencies being a list of
+                       (asset_path, kind) pairs with kind "sublayer", "reference" or "payload".
+        :param removed_paths: Paths of the layers deleted from disk since they were indexed.
+        """
+        layers = list(layers)
+        removed_paths = [(path,) for path in removed_paths]
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("DELETE FROM layer_dependencies WHERE layer_path = ?", [(layer[0],) for layer in layers] + removed_paths)
+            cursor.executemany("DELETE FROM indexed_layers WHERE path = ?", removed_paths)
+            cursor.executemany("INSERT OR REPLACE INTO indexed_layers (path, mtime_ns, size) VALUES (?, ?, ?)",
+                               [(path, mtime_ns, size) for path, mtime_ns, size, dependencies in layers])
+            cursor.executemany("INSERT OR IGNORE INTO layer_dependencies (layer_path, asset_path, kind) VALUES (?, ?, ?)",
+                               [(path, asset_path, kind) for path, mtime_ns, size, dependencies in layers
+                                for asset_path, kind in dependencies])
+
+    def _walk_layer_dependencies(self, from_column, to_column, path, recursive):
+        path = self.normalize_layer_path(path)
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            if not recursive:
+                cursor.execute(f"""
+                    SELECT {to_column} AS path, kind, 1 AS depth FROM layer_dependencies WHERE {from_column} = ?
+                    ORDER BY path
+                """, (path,))
+                return cursor.fetchall()
+
+            # Each level is one index probe per layer reached, a layer reached twice keeps its shortest depth.
+            cursor.execute(f"""
+                WITH RECURSIVE walk(path, kind, depth) AS (
+                    SELECT {to_column}, kind, 1 FROM layer_dependencies WHERE {from_column} = ?
+                    UNION
+                    SELECT d.{to_column}, d.kind, walk.depth + 1
+                    FROM walk JOIN layer_dependencies d ON d.{from_column} = walk.path
+                    WHERE walk.depth < ?
+                )
+                SELECT path, kind, MIN(depth) AS depth FROM walk GROUP BY path ORDER BY depth, path
+            """, (path, self.max_dependency_depth))
+            return cursor.fetchall()
+
+    def get_layer_dependencies(self, layer_path, recursive=False):
+        """
+        Retrieve the layers and fragments a layer sublayers, references or loads as a payload.
+
+        :param recursive: Also follow the dependencies of the dependencies.
+        :return: A list of Row objects with path, kind and depth (1 for the direct dependencies).
+        """
+        return self._walk_layer_dependencies("layer_path", "asset_path", layer_path, recursive)
+
+    def get_layer_dependents(self, asset_path, recursive=False):
+        """
+        Retrieve the layers that sublayer, reference or load asset_path as a payload, e.g. every setVar and shot
+        using a fragment version.
+
+        :param recursive: Also return the layers using those layers, up to the shots.
+        :return: A list of Row objects with path, kind and depth (1 for the direct users).
+        """
+        return self._walk_layer_dependencies("asset_path", "layer_path", asset_path, recursive)
+
+    # Change feed
+    def data_version(self):
+        """
+        Returns a token that changes whenever the database was modified, by this connection or any other.
+
+        PRAGMA data_version only moves for commits made by other connections, total_changes covers our own.
+        Reading both costs no disk access, so it can be polled often. In snapshot mode the token moves when the
+        in-memory copy is reloaded.
+        """
+        conn = self.connect()
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes, conn.snapshot_generation
+
+    def get_changelog_seq(self):
+        """
+        Returns the sequence number of the latest recorded change, 0 if nothing was recorded yet.
+
+        """
+        row = self.connect().execute("SELECT MAX(seq) FROM changelog").fetchone()
+        return row[0] or 0
+
+    def get_changes_since(self, seq):
+        """
+        Retrieve every change recorded after a sequence number, oldest first.
+
+        :param seq: The last sequence number the caller has seen.
+        :return: A list of Row objects (seq, table_name, row_id, op, parent_column, parent_id), or None if the
+                 changelog was pruned past seq and the caller has to reload everything.
+        """
+        conn = self.connect()
+        oldest = conn.execute("SELECT MIN(seq) FROM changelog").fetchone()[0]
+        if oldest is not None and seq < oldest - 1:
+            return None
+        return conn.execute("SELECT * FROM changelog WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+
+    def prune_changelog(self, keep=10000):
+        """
+        Deletes all but the latest changelog entries.
+
+        :param keep: Number of entries to keep. Clients further behind reload their caches.
+        :return: The number of deleted entries.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM changelog WHERE seq <= (SELECT MAX(seq) FROM changelog) - ?", (keep,))
+            conn.commit()
+            return cursor.rowcount
+
+    # Thumbnail store
+    @staticmethod
+    def store_thumbnail(cursor, snapshot):
+        """
+        Store a snapshot image in the thumbnails table, keyed by its content hash. Identical captures are stored once.
+
+        :param cursor: The cursor of the transaction inserting the version row.
+        :param snapshot: The image bytes (or None).
+        :return: The content hash to reference from the version row, or None if there is no snapshot.
+        """
+        if not snapshot:
+            return None
+        if isinstance(snapshot, str):
+            snapshot = snapshot.encode('utf-8')
+
+        snapshot_hash = hashlib.sha256(snapshot).hexdigest()
+        cursor.execute("INSERT OR IGNORE INTO thumbnails (hash, data) VALUES (?, ?)", (snapshot_hash, snapshot))
+        return snapshot_hash
+
+    def get_thumbnail(self, snapshot_hash):
+        """
+        Retrieve the image bytes of a snapshot by its content hash.
+
+        :param snapshot_hash: The snapshot_hash of a variantVersion or file row.
+        :return: The image bytes, or None if there is no thumbnail for that hash.
+        """
+        if not snapshot_hash:
+            return None
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT data FROM thumbnails WHERE hash = ?", (snapshot_hash,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    # Hierarchy resolution
+    resolve_batch_size = 150  # Paths per query, keeps the bound parameters under SQLite's 999 limit.
+
+    def resolve(self, asset, department=None, setVar=None, variant=None, version=None):
+        """
+        Resolve an asset/department/setVar/variant/version path to its ids and USD paths in a single JOINed query.
+
+        The path can stop at any level, e.g. resolve("pumpkin", "modelling") only resolves the asset and its department.
+
+        :param asset: The name of the asset.
+        :param department: The name of the department (optional).
+        :param setVar: The name of the setVar (optional).
+        :param variant: The name of the variant (optional).
+        :param version: The variantVersion number (optional).
+        :return: A dictionary with the ids and paths of every requested level, or None if any of them does not exist.
+        """
+        return self.resolve_many([(asset, department, setVar, variant, version)])[0]
+
+    def resolve_many(self, paths):
+        """
+        Batch form of resolve(). Resolves hundreds of paths with one query per resolve_batch_size paths.
+
+        :param paths: A list of (asset, department, setVar, variant, version) tuples. Trailing levels can be None or omitted.
+        :return: A list with one dictionary (or None if the path does not exist) per path, in input order.
+        """
+        results = []
+        for start in range(0, len(paths), self.resolve_batch_size):
+            results.extend(self._resolve_batch(paths[start:start + self.resolve_batch_size]))
+        return results
+
+    def _resolve_batch(self, paths):
+        requests = []
+        parameters = []
+        for index, path in enumerate(paths):
+            asset, department, setVar, variant, version = (tuple(path) + (None,) * 5)[:5]
+            requests.append("(?, ?, ?, ?, ?, ?)")
+            parameters.extend((index, asset, department, setVar, variant, int(version) if version is not None else None))
+
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            WITH request(idx, asset, department, setVar, variant, version) AS (VALUES {", ".join(requests)})
+            SELECT request.idx,
+                   assets.id AS asset_id, assets.usd_path AS asset_path,
+                   departments.department_id, departments.usd_path AS department_path,
+                   setVar.setVar_id, setVar.usd_path AS setVar_path,
+                   variant.var_id,
+                   variantVersion.variantVersion_id, variantVersion.version,
+                   variantVersion.usd_path AS variantVersion_path, variantVersion.pinned
+            FROM request
+            LEFT JOIN assets ON assets.name = request.asset
+            LEFT JOIN departments ON departments.asset_id = assets.id AND departments.name = request.department
+            LEFT JOIN setVar ON setVar.department_id = departments.department_id AND setVar.name = request.setVar
+            LEFT JOIN variant ON variant.setVar_id = setVar.setVar_id AND variant.name = request.variant
+            LEFT JOIN variantVersion ON variantVersion.var_id = variant.var_id AND variantVersion.version = request.version
+                                     AND variantVersion.usd_path IS NOT NULL
+        """, parameters)
+
+        # Deepest level requested by each path, the path only resolves if that level was found.
+        level_keys = ("asset_id", "department_id", "setVar_id", "var_id", "variantVersion_id")
+
+        results = [None] * len(paths)
+        for row in cursor.fetchall():
+            index = row["idx"]
+            if results[index] is not None:
+                continue  # Duplicated names, keep the first match like the get_* methods do.
+
+            path = (tuple(paths[index]) + (None,) * 5)[:5]
+            depth = max((level for level, name in enumerate(path) if name is not None), default=None)
+            if depth is None or row[level_keys[depth]] is None:
+                continue
+
+            result = dict(row)
+            del result["idx"]
+            results[index] = result
+        return results
 
     # Utility functions
+    def explain_hot_queries(self):
+        """
+        Runs EXPLAIN QUERY PLAN on every hot lookup and reports the ones that fall back to a full table scan.
+
+        :return: A list of (query name, plan detail) tuples. An empty list means every hot query uses an index.
+        """
+        conn = self.connect()
+        scans = []
+        for name, sql, parameters in self.hot_queries:
+            for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters):
+                detail = row[3]
+                if detail.startswith("SCAN"):
+                    scans.append((name, detail))
+        return scans
+
+    def sweep_orphans(self, max_reservation_age=24 * 3600):
+        """
+        Deletes every row whose parent no longer exists, every thumbnail no version refers to, and the version
+        numbers reserved by saves and publishes that never finished.
+
+        Projects created before the cascading deletes are cleaned by the schema upgrade, this is kept as a
+        maintenance command for databases edited by hand or by older tools.
+
+        :param max_reservation_age: Age in seconds after which a reserved file or USD version that was never
+                                    finalized is considered abandoned and deleted.
+        :return: A dictionary with the number of deleted rows per table, the abandoned reservations are counted
+                 under "files reservations" and "variantVersion reservations".
+        """
+        expiry = int(time.time()) - max_reservation_age
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            deleted = self._sweep_orphans(cursor)
+            # Placeholders reserved before their timestamp was recorded have none, they are older than any expiry.
+            for table, path_column in (("files", "file_path"), ("variantVersion", "usd_path")):
+                cursor.execute(f"DELETE FROM {table} WHERE {path_column} IS NULL AND (timestamp IS NULL OR timestamp < ?)", (expiry,))
+                deleted[f"{table} reservations"] = cursor.rowcount
+            return deleted
+
+    def _sweep_orphans(self, cursor):
+        # Parents are swept before their children, so a single pass also removes the grandchildren of a missing parent.
+        deleted = {}
+        for table, references in self.cascade_tables:
+            orphan_conditions = " OR ".join(
+                f"({column} IS NOT NULL AND {column} NOT IN (SELECT {parent_column} FROM {parent}))"
+                for column, parent, parent_column in references)
+            cursor.execute(f"DELETE FROM {table} WHERE {orphan_conditions}")
+            deleted[table] = cursor.rowcount
+
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'thumbnails'").fetchone():
+            cursor.execute("""
+                DELETE FROM thumbnails WHERE hash NOT IN (
+                    SELECT snapshot_hash FROM variantVersion WHERE snapshot_hash IS NOT NULL
+                    UNION SELECT snapshot_hash FROM files WHERE snapshot_hash IS NOT NULL
+                )
+            """)
+            deleted["thumbnails"] = cursor.rowcount
+        return deleted
+
     @staticmethod
     def initialize_database(db_path):
-        db = ProjectDataBase(db_path)
\ No newline at end of file
+        db = ProjectDataBase(db_path)
+
+
+if __name__ == "__main__":
+    # Maintenance command: python data_base.py sweep <path/to/project.db>
+    if len(sys.argv) == 3 and sys.argv[1] == "sweep":
+        db = ProjectDataBase(sys.argv[2])
+        deleted = db.sweep_orphans()
+        for table, count in deleted.items():
+            print(f"{table}: {count} {'abandoned' if table.endswith('reservations') else 'orphaned rows'} deleted")
+        print(f"changelog: {db.prune_changelog()} old entries pruned")
+    else:
+        print("Usage: python data_base.py sweep <path/to/project.db>")
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+
+class DataBaseExecutor:
+    """
+    Runs database queries on a background thread so the UI thread never waits on SQLite.
+
+    Every request is submitted on a channel (usually the list widget it will fill). Submitting a new request on a
+    channel supersedes the previous one: if it has not started yet it is cancelled, otherwise its result is
+    simply reported as stale by is_current() and should be dropped by the caller.
+    """
+    def __init__(self, max_workers=1):
+        """
+        :param max_workers: Number of worker threads. Each worker gets its own pooled connection.
+        """
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mercury-db")
+        self._current = {}  # Channel -> latest future submitted on it.
+        self._lock = threading.Lock()
+
+    def submit(self, channel, function, *args, **kwargs):
+        """
+        Schedules function(*args, **kwargs) on the worker thread, superseding the previous request of the channel.
+
+        :param channel: Any hashable key identifying what the result is for.
+        :param function: The callable doing the query.
+        :return: A concurrent.futures.Future holding the result.
+        """
+        future = self.pool.submit(function, *args, **kwargs)
+        with self._lock:
+            previous = self._current.get(channel)
+            self._current[channel] = future
+        if previous is not None:
+            previous.cancel()
+        return future
+
+    def cancel(self, channel):
+        """
+        Cancels the pending request of a channel, if any. A request already running finishes but becomes stale.
+
+        """
+        with self._lock:
+            future = self._current.pop(channel, None)
+        if future is not None:
+            future.cancel()
+
+    def release(self, channel, future):
+        """
+        Forgets a delivered request, so channels used once (e.g. one per thumbnail) are not kept alive by the executor.
+
+        """
+        with self._lock:
+            if self._current.get(channel) is future:
+                del self._current[channel]
+
+    def is_current(self, channel, future):
+        """
+        Returns True if future is still the latest request of the channel.
+
+        """
+        with self._lock:
+            return self._current.get(channel) is future
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            pending = list(self._current.values())
+            self._current = {}
+        for future in pending:
+            future.cancel()
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,183 @@
+from pxr import Sdf
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import os
+
+
+def scan_layers(paths):
+    """
+    Reads the composition arcs of layers. Runs in the worker processes of DependencyIndex, so it only takes and
+    returns plain data.
+
+    :param paths: The normalized paths of the layers to scan.
+    :return: A list of (path, mtime_ns, size, dependencies) tuples, dependencies being a list of (asset_path, kind)
+             pairs. Layers that cannot be read have None as mtime_ns and size and the error message as dependencies.
+    """
+    results = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            results.append((path, stat.st_mtime_ns, stat.st_size, _scan_layer(path)))
+        except Exception as e:
+            results.append((path, None, None, f"Error: {e}"))
+    return results
+
+
+def _scan_layer(path):
+    # Opened anonymously so the file on disk is read even if this process holds an edited copy of the layer.
+    layer = Sdf.Layer.OpenAsAnonymous(path)
+    if layer is None:
+        raise RuntimeError(f"Could not open the USD layer {path}.")
+    folder = os.path.dirname(path)
+
+    def resolve(asset_path):
+        return os.path.normcase(os.path.normpath(os.path.join(folder, asset_path)))
+
+    dependencies = set((resolve(sublayer_path), "sublayer") for sublayer_path in layer.subLayerPaths)
+
+    # Published fragments are leaves, their prims are only walked when the layer has some arc.
+    if set(layer.GetCompositionAssetDependencies()) - set(layer.subLayerPaths):
+        prim_specs = list(layer.rootPrims)
+        while prim_specs:
+            prim_spec = prim_specs.pop()
+            for reference in prim_spec.referenceList.GetAddedOrExplicitItems():
+                if reference.assetPath:
+                    dependencies.add((resolve(reference.assetPath), "reference"))
+            for payload in prim_spec.payloadList.GetAddedOrExplicitItems():
+                if payload.assetPath:
+                    dependencies.add((resolve(payload.assetPath), "payload"))
+            prim_specs += prim_spec.nameChildren
+            for variant_set_spec in prim_spec.variantSets.values():
+                prim_specs += [variant_spec.primSpec for variant_spec in variant_set_spec.variants.values()]
+    return sorted(dependencies)
+
+
+class DependencyIndex:
+    """
+    Index of which layers of the project sublayer, reference or load as a payload which other layers and fragment
+    versions, stored in the layer_dependencies table of project.db.
+
+    update() walks the entity, sequences, shots and fragment folders and only scans the layers whose modification
+    time or size changed since the last run. The first crawl of a project is spread over a process pool. Queries
+    read the database only, no layer is opened to answer them.
+
+    Usage:
+        index = DependencyIndex(usd_manager)
+        index.update()
+        index.dependents(fragment_path, recursive=True)
+    """
+    layer_extensions = (".usd", ".usda", ".usdc")
+
+    # Below this many layers to scan the pool costs more to start than it saves, they are scanned in this process.
+    min_parallel_layers = 64
+
+    def __init__(self, usd_manager, max_workers=None, progress=None):
+        """
+        :param usd_manager: The UsdManager of the project.
+        :param max_workers: Worker processes of the pool, os.cpu_count() if None, 0 to scan in this process.
+        :param progress: Called as progress(done, total) each time a batch of layers is scanned.
+        """
+        self.um = usd_manager
+        self.db = usd_manager.db
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.progress = progress
+
+    def find_layers(self):
+        """
+        Returns the file state of every layer under the project USD folders, as a dictionary of normalized path ->
+        (mtime_ns, size).
+        """
+        layers = {}
+        for folder in (self.um.usd_assets_folder, self.um.usd_sequence_folder, self.um.usd_shots_folder, self.um.usd_fragment_folder):
+            for root, dirs, files in os.walk(folder):
+                for file_name in files:
+                    if file_name.endswith(self.layer_extensions):
+                        path = self.db.normalize_layer_path(os.path.join(root, file_name))
+                        try:
+                            stat = os.stat(path)
+                        except OSError:
+                            # Deleted or renamed by another artist since the walk listed it.
+                            continue
+                        layers[path] = (stat.st_mtime_ns, stat.st_size)
+        return layers
+
+    def update(self):
+        """
+        Scans the new and modified layers and forgets the deleted ones.
+
+        :return: A summary dictionary: the number of layers "scanned", "removed" and "unchanged", and the
+                 "failed" (path, error) pairs.
+        """
+        indexed = self.db.get_indexed_layers()
+        layers = self.find_layers()
+        changed = [path for path, file_stat in layers.items() if indexed.get(path) != file_stat]
+        removed = [path for path in indexed if path not in layers]
+
+        results = self._run(changed)
+        scanned = [result for result in results if result[1] is not None]
+        self.db.update_layer_dependencies(scanned, removed)
+        return {
+            "scanned": len(scanned),
+            "removed": len(removed),
+            "unchanged": len(layers) - len(changed),
+            "failed": [(path, error) for path, mtime_ns, size, error in results if mtime_ns is None],
+        }
+
+    def dependencies(self, layer_path, recursive=False):
+        """
+        The layers and fragments layer_path depends on, see ProjectDataBase.get_layer_dependencies().
+
+        """
+        return self.db.get_layer_dependencies(layer_path, recursive)
+
+    def dependents(self, asset_path, recursive=False):
+        """
+        The layers using asset_path, see ProjectDataBase.get_layer_dependents().
+
+        """
+        return self.db.get_layer_dependents(asset_path, recursive)
+
+    def _run(self, paths):
+        total = len(paths)
+        if not self.max_workers or total < self.min_parallel_layers:
+            results = scan_layers(paths)
+            if self.progress:
+                self.progress(total, total)
+            return results
+
+        # Several batches per worker keep the workers busy until the end and the progress moving.
+        batch_size = max(1, total // (self.max_workers * 8))
+        batches = [paths[start:start + batch_size] for start in range(0, total, batch_size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(scan_layers, batch) for batch in batches]
+            for future in as_completed(futures):
+                results += future.result()
+                if self.progress:
+                    self.progress(len(results), total)
+        return results
+
+
+if __name__ == "__main__":
+    # python -m lib.dependency_index <project> update | uses <path> | deps <path>
+    from lib.usd_manager import UsdManager
+
+    parser = argparse.ArgumentParser(description="Indexes the composition arcs between the layers of a project.")
+    parser.add_argument("project", help="The project root directory.")
+    parser.add_argument("command", choices=("update", "uses", "deps"), help="Update the index, or list the users or the dependencies of a layer.")
+    parser.add_argument("path", nargs="?", help="The layer or fragment queried by uses and deps.")
+    parser.add_argument("--recursive", action="store_true", help="Follow the dependencies transitively.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, 0 to scan in this process.")
+    args = parser.parse_args()
+
+    index = DependencyIndex(UsdManager(args.project), args.workers,
+                            progress=lambda done, total: print(f"\r{done}/{total} layers scanned", end="", flush=True))
+    if args.command == "update":
+        summary = index.update()
+        print(f"\n{summary['scanned']} layers scanned, {summary['removed']} removed, {summary['unchanged']} unchanged.")
+        for path, error in summary["failed"]:
+            print(f"{path}: {error}")
+    else:
+        rows = index.dependents(args.path, args.recursive) if args.command == "uses" else index.dependencies(args.path, args.recursive)
+        for row in rows:
+            print(f"{'  ' * (row['depth'] - 1)}{row['kind']}: {row['path']}")
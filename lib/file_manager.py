@@ -4,7 +4,6 @@ from lib import maya_utils
 import os
 import shutil
 import subprocess
-import datetime
 
 running_in_maya = False
 
@@ -18,11 +17,17 @@ if running_in_maya:
     import maya.cmds as cmds
     
 class FileManager:
-    def __init__(self, project):
+    def __init__(self, project, cache=None):
+        """
+        :param project: The project root directory.
+        :param cache: A ProjectCache shared with the other consumers of the project, a private one is created if None.
+        """
         self.project = project
         from lib import data_base
+        from lib.project_cache import ProjectCache
         db_path = os.path.join(self.project, "pipeline", "project.db")
         self.db = data_base.ProjectDataBase(db_path)
+        self.cache = cache if cache is not None else ProjectCache(self.db)
         self.maya_utils = maya_utils.InternalMayaUtils()
         
         self.usd_assets_folder = os.path.join(self.project, "entity")
@@ -37,7 +42,7 @@ class FileManager:
     def create_task_folder(self, name, department_name, software_name, asset_name=None, sequence_name=None, shot_name=None):
 
         if sequence_name is not None:
-            sequence_info = self.db.get_sequence(sequence_name)
+            sequence_info = self.cache.get_sequence(sequence_name)
             sequence_id = sequence_info['id']
 
             id_value = sequence_id
@@ -45,7 +50,7 @@ class FileManager:
             task_dir = os.path.join(self.usd_sequence_folder, sequence_name, software_name, department_name, name)
 
         if shot_name is not None:
-            shot_info = self.db.get_shot(sequence_id, shot_name)
+            shot_info = self.cache.get_shot(sequence_id, shot_name)
             shot_id = shot_info['id']
 
             id_value = shot_id
@@ -53,19 +58,29 @@ class FileManager:
             task_dir = os.path.join(self.usd_shots_folder, shot_name, software_name, department_name, name)
 
         if asset_name is not None:
-            asset_info = self.db.get_asset(asset_name)
+            asset_info = self.cache.get_asset(asset_name)
             asset_id = asset_info['id']
 
             id_value = asset_id
             id_type = "asset"
             task_dir = os.path.join(self.usd_assets_folder, asset_name, software_name, department_name, name)
         
-        department_info = self.db.get_department(id_type=id_type, id_value=id_value, department_name=department_name)
+        department_info = self.cache.get_department(id_type=id_type, id_value=id_value, department_name=department_name)
         department_id = department_info['department_id']
 
         os.makedirs(task_dir, exist_ok=True)
         self.db.create_task(department_id, name)
 
+    def create_task_folders(self, names, department_name, software_name, asset_name=None, sequence_name=None, shot_name=None):
+        """
+        Creates several task folders in the same department, committing the database changes once.
+
+        """
+        with self.db.transaction():
+            for name in names:
+                self.create_task_folder(name, department_name, software_name, asset_name=asset_name,
+                                        sequence_name=sequence_name, shot_name=shot_name)
+
     def delete_task_folder(self, task_type, name, department_type=None, asset_name=None, 
                             sequence_name=None, shot_name=None, department_name=None, 
                             variant_name=None, setVar_name=None):
@@ -98,7 +113,7 @@ class FileManager:
                             shot_name=None, department_name=None, task_name=None):
         
         if asset_name is not None: 
-            asset_info = self.db.get_asset(asset_name)
+            asset_info = self.cache.get_asset(asset_name)
             asset_id = asset_info['id']
 
             id_value = asset_id
@@ -106,7 +121,7 @@ class FileManager:
             
 
         if sequence_name is not None:
-            sequence_info = self.db.get_sequence(sequence_name)
+            sequence_info = self.cache.get_sequence(sequence_name)
             sequence_id = sequence_info['id']
 
             id_value = sequence_id
@@ -114,25 +129,23 @@ class FileManager:
             
         
         if shot_name is not None:
-            shot_info = self.db.get_shot(sequence_id, shot_name)
+            shot_info = self.cache.get_shot(sequence_id, shot_name)
             shot_id = shot_info['id']
 
             id_value = shot_id
             id_type = "shot"
             
-        department_info = self.db.get_department(id_type=id_type, id_value=id_value, department_name=department_name)
+        department_info = self.cache.get_department(id_type=id_type, id_value=id_value, department_name=department_name)
         department_id = department_info['department_id']
 
-        task_info = self.db.get_task(department_id, task_name)
+        task_info = self.cache.get_task(department_id, task_name)
         task_id = task_info['task_id']
 
-        highest_version = 0
-        file_list = self.db.get_file(task_id, all=True)
-        for entry in file_list:
-            entry_version = entry['version']
-            highest_version = max(highest_version, entry_version)
-                
-        version_int = highest_version + 1
+        if mode not in ("create", "save"):
+            return
+
+        # Reserve the next version number, safe against other artists saving the same task.
+        file_id, version_int = self.db.reserve_file(task_id)
         version_str = f"v{version_int:03d}"
 
         if asset_name is not None:
@@ -148,69 +161,54 @@ class FileManager:
             file_dir = os.path.join(self.usd_shots_folder, shot_name, software_name, department_name, task_name)
             file_path = os.path.join(file_dir, file_name)
 
-        if mode == "create":
-            if running_in_maya is True:
-                img_blob = self.maya_utils.capture_snapshot()
-                cmds.file(new=True, force=True)
-        
-                # Create the group structure
-                root_group = cmds.group(em=True, name='root')
-                geo_group = cmds.group(em=True, name='geo', parent=root_group)
-                render_group = cmds.group(em=True, name='render', parent=geo_group)
-                proxy_group = cmds.group(em=True, name='proxy', parent=geo_group)
+        img_blob = None
+        try:
+            if mode == "create":
+                if running_in_maya is True:
+                    img_blob = self.maya_utils.capture_snapshot()
+                    cmds.file(new=True, force=True)
+            
+                    # Create the group structure
+                    root_group = cmds.group(em=True, name='root')
+                    geo_group = cmds.group(em=True, name='geo', parent=root_group)
+                    render_group = cmds.group(em=True, name='render', parent=geo_group)
+                    proxy_group = cmds.group(em=True, name='proxy', parent=geo_group)
 
-                cmds.file(rename=file_path)
-                cmds.file(save=True, type="mayaAscii")
+                    cmds.file(rename=file_path)
+                    cmds.file(save=True, type="mayaAscii")
 
-                if os.path.exists(file_path):
-                    timestamp = os.path.getmtime(file_path)
-                    timestamp_date = datetime.datetime.fromtimestamp(timestamp)
-                    date = timestamp_date.strftime("%Y-%m-%d %H:%M:%S")
-                    self.db.create_file(task_id=task_id, file_type=file_format, version=version_int, comment=comment, date=date, file_path=file_path, snapshot=img_blob)
                 else:
-                    print("File does not exist. It may not have been created.")
-
-            else:
-                os.makedirs(file_dir, exist_ok=True)
-                command = [self.mayapy_path, self.script_path, file_path]
-                result = subprocess.run(command, capture_output=True)
-                
-                # Check if the subprocess was successful
-                if result.returncode == 0:
-                    print("Subprocess completed successfully.")
-
-                    # Check if the file was actually created
-                    if os.path.exists(file_path):
-                        timestamp = os.path.getmtime(file_path)
-                        timestamp_date = datetime.datetime.fromtimestamp(timestamp)
-                        date = timestamp_date.strftime("%Y-%m-%d %H:%M:%S")
-                        self.db.create_file(task_id=task_id, file_type=file_format, version=version_int, comment=comment, date=date, file_path=file_path, snapshot=None)
+                    os.makedirs(file_dir, exist_ok=True)
+                    command = [self.mayapy_path, self.script_path, file_path]
+                    result = subprocess.run(command, capture_output=True)
+                    
+                    # Check if the subprocess was successful
+                    if result.returncode == 0:
+                        print("Subprocess completed successfully.")
                     else:
-                        print("File does not exist. It may not have been created.")
-                else:
-                    # Handle subprocess error
-                    print(f"Error in subprocess: {result.stderr.decode('utf-8')}")
+                        # Handle subprocess error
+                        print(f"Error in subprocess: {result.stderr.decode('utf-8')}")
 
-        elif mode == "save":
-            img_blob = self.maya_utils.capture_snapshot()
+            elif mode == "save":
+                img_blob = self.maya_utils.capture_snapshot()
 
-            os.makedirs(file_dir, exist_ok=True)
-            cmds.file(rename=file_path)
-            cmds.file(save=True, type='mayaAscii')
-            
-            print(f"Scene saved as: {file_path}")
-            
-            # Check if the file was actually created
-            if os.path.exists(file_path):
-                timestamp = os.path.getmtime(file_path)
-                timestamp_date = datetime.datetime.fromtimestamp(timestamp)
-                date = timestamp_date.strftime("%Y-%m-%d %H:%M:%S")
-                self.db.create_file(task_id=task_id, file_type=file_format, version=version_int, comment=comment, date=date, file_path=file_path, snapshot=img_blob)
-            else:
-                print("File does not exist. It may not have been created.")
-        
+                os.makedirs(file_dir, exist_ok=True)
+                cmds.file(rename=file_path)
+                cmds.file(save=True, type='mayaAscii')
+                
+                print(f"Scene saved as: {file_path}")
+        except Exception:
+            self.db.delete_file(file_id)
+            raise
+
+        # Check if the file was actually created
+        if os.path.exists(file_path):
+            date = self.db.format_timestamp(os.path.getmtime(file_path))
+            self.db.finalize_file(file_id, file_type=file_format, comment=comment, date=date, file_path=file_path, snapshot=img_blob)
         else:
-            pass
+            # Release the reserved version so the number can be reused.
+            self.db.delete_file(file_id)
+            print("File does not exist. It may not have been created.")
 
     def load_file(self, file_version, file_format, asset_name=None, sequence_name=None, shot_name=None,
                    department_name=None, task_name=None):
@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from pxr import Usd, Sdf
+import os
+import threading
+
+
+class LayerCache:
+    """
+    Process-wide cache of the USD layers and stages opened by the pipeline, keyed by their resolved file path.
+
+    Every entry keeps a strong reference to its layer (or stage), so the usda is parsed once and later calls reuse
+    it. Entries are validated against the modification time and size of their files on every lookup: a layer
+    changed on disk by another tool or artist is reloaded, a deleted one is dropped. Layers with unsaved edits are
+    never reloaded or evicted.
+
+    The memory budget is measured on the size of the cached files on disk, least recently used entries are evicted
+    first when it is exceeded.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """
+        :param max_bytes: Approximate memory budget, as the summed size on disk of the cached layers.
+        """
+        self.max_bytes = max_bytes
+
+        # Stages opened through the cache, for tools that look stages up in a Usd.StageCache (usdview, Maya...).
+        self.stage_cache = Usd.StageCache()
+
+        self._entries = OrderedDict()  # (kind, resolved path) -> (layer or stage, {real path: (mtime_ns, size)}, size), least recently used first.
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        self.stats = {
+            "layers": {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0},
+            "stages": {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0},
+        }
+
+    @classmethod
+    def get_shared(cls):
+        """
+        Returns the cache shared by every UsdManager of the process, creating it the first time it is requested.
+
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def resolve_path(path):
+        return os.path.normcase(os.path.realpath(path))
+
+    def get_layer(self, layer_path):
+        """
+        Returns the layer at layer_path, opening it on a miss and reloading it if its file changed since it was cached.
+
+        :return: The Sdf.Layer, or None if the file cannot be opened.
+        """
+        key = ("layers", self.resolve_path(layer_path))
+        with self._lock:
+            stats = self.stats["layers"]
+            entry = self._entries.get(key)
+            if entry is not None:
+                layer, file_stats, size = entry
+                changed_paths = self._validate(key, file_stats)
+                if changed_paths == []:
+                    stats["hits"] += 1
+                    return layer
+                if changed_paths is not None:
+                    layer.Reload(force=True)
+                    stats["reloads"] += 1
+                    self._put(key, layer, [layer])
+                    return layer
+
+            stats["misses"] += 1
+            layer = Sdf.Layer.FindOrOpen(layer_path)
+            if layer is None:
+                return None
+            # Another owner may have kept an older copy of the layer alive in the Sdf registry.
+            if not layer.dirty:
+                layer.Reload()
+            self._put(key, layer, [layer])
+            return layer
+
+    def open_stage(self, root_layer_path, load=Usd.Stage.LoadNone):
+        """
+        Returns a stage on root_layer_path, reusing the cached one while none of its layers changed on disk.
+
+        :param load: The load set of the stage when it is opened, payloads are not loaded by default.
+        :return: The Usd.Stage, or None if the root layer cannot be opened.
+        """
+        key = ("stages", self.resolve_path(root_layer_path))
+        with self._lock:
+            stats = self.stats["stages"]
+            entry = self._entries.get(key)
+            if entry is not None:
+                stage, file_stats, size = entry
+                changed_paths = self._validate(key, file_stats)
+                if changed_paths == []:
+                    stats["hits"] += 1
+                    return stage
+                if changed_paths is not None:
+                    # Only the changed layers are reloaded, the stage recomposes what depends on them.
+                    for real_path in changed_paths:
+                        layer = Sdf.Layer.Find(real_path)
+                        if layer is not None:
+                            layer.Reload(force=True)
+                    stats["reloads"] += 1
+                    self._put(key, stage, stage.GetUsedLayers())
+                    return stage
+
+            stats["misses"] += 1
+            root_layer = self.get_layer(root_layer_path)
+            if root_layer is None:
+                return None
+            with Usd.StageCacheContext(self.stage_cache):
+                stage = Usd.Stage.Open(root_layer, load)
+            self._put(key, stage, stage.GetUsedLayers())
+            return stage
+
+    def refresh(self, layer):
+        """
+        Caches a layer the pipeline has just created or saved with the current state of its file, so it is not
+        reloaded on the next lookup.
+        """
+        key = ("layers", self.resolve_path(layer.realPath))
+        with self._lock:
+            self._put(key, layer, [layer])
+
+    def invalidate(self, path=None):
+        """
+        Drops the cached layer and stage of path, every entry under path if it is a folder, or everything when path is None.
+
+        """
+        with self._lock:
+            if path is None:
+                keys = list(self._entries)
+            else:
+                path = self.resolve_path(path)
+                keys = [key for key in self._entries if key[1] == path or key[1].startswith(path + os.sep)]
+            for key in keys:
+                self._remove(key)
+
+    def memory_usage(self):
+        return self._bytes
+
+    def hit_rate(self, kind="layers"):
+        stats = self.stats[kind]
+        lookups = stats["hits"] + stats["misses"]
+        return stats["hits"] / lookups if lookups else 0.0
+
+    def _validate(self, key, file_stats):
+        """
+        :return: The real paths of the files modified since they were cached, excluding layers with unsaved edits.
+                 None if one of the files was removed, the entry is dropped then.
+        """
+        changed_paths = []
+        for real_path, file_stat in file_stats.items():
+            try:
+                stat = os.stat(real_path)
+            except OSError:
+                self._remove(key)
+                return None
+            if (stat.st_mtime_ns, stat.st_size) != file_stat:
+                layer = Sdf.Layer.Find(real_path)
+                if layer is None or not layer.dirty:
+                    changed_paths.append(real_path)
+
+        if not changed_paths:
+            self._entries.move_to_end(key)
+        return changed_paths
+
+    def _put(self, key, value, layers):
+        if key in self._entries:
+            self._remove(key, erase_stage=False)
+
+        file_stats = {}
+        for layer in layers:
+            if layer.anonymous or not layer.realPath:
+                continue
+            try:
+                stat = os.stat(layer.realPath)
+            except OSError:
+                continue
+            file_stats[layer.realPath] = (stat.st_mtime_ns, stat.st_size)
+        size = sum(file_stat[1] for file_stat in file_stats.values())
+
+        self._entries[key] = (value, file_stats, size)
+        self._bytes += size
+
+        for evict_key in list(self._entries):
+            if self._bytes <= self.max_bytes or len(self._entries) <= 1:
+                break
+            if evict_key == key or (evict_key[0] == "layers" and self._entries[evict_key][0].dirty):
+                continue
+            self._remove(evict_key)
+            self.stats[evict_key[0]]["evictions"] += 1
+
+    def _remove(self, key, erase_stage=True):
+        value, file_stats, size = self._entries.pop(key)
+        self._bytes -= size
+        if key[0] == "stages" and erase_stage:
+            self.stage_cache.Erase(value)
@@ -0,0 +1,292 @@
+from pxr import Sdf
+import contextlib
+import os
+import shutil
+
+
+class LayerEditor:
+    """
+    Structural edits (sublayer lists, variant sets, variant payloads and selections) made directly on a single
+    layer with the Sdf API.
+
+    Opening a Usd.Stage composes every layer it reaches and can load the payloads of the fragments, only to change
+    a few opinions of its root layer. The editor opens just the target layer with Sdf.Layer.FindOrOpen, edits its
+    specs and saves it, nothing it references is ever read.
+
+    Inside session() the edited layers stay in memory and each one is written once, when the session ends. The
+    layers created by a session that is rolled back are deleted from disk.
+    """
+    def __init__(self, layer_cache=None):
+        """
+        :param layer_cache: A LayerCache to open the layers from, so unchanged layers are not parsed again.
+        """
+        self.layer_cache = layer_cache
+        self._session_layers = None  # Layer identifier -> layer edited in the current session, kept alive until it ends.
+        self._session_created = None  # (layer path, first folder made for it or None) of the layers created in the session.
+        self._session_depth = 0
+
+    def open_layer(self, layer_path):
+        """
+        Returns the layer at layer_path, reusing it if it is already open in this session.
+
+        """
+        if self.layer_cache is not None:
+            layer = self.layer_cache.get_layer(layer_path)
+        else:
+            layer = Sdf.Layer.FindOrOpen(layer_path)
+        if layer is None:
+            print(f"Could not open the USD layer {layer_path}.")
+        elif self._session_layers is not None:
+            self._session_layers[layer.identifier] = layer
+        return layer
+
+    def create_layer(self, layer_path, prim_path="/root", type_name="Xform"):
+        """
+        Creates a new layer holding a single defined prim, set as its default prim.
+
+        """
+        new_folder = None
+        folder = os.path.dirname(os.path.abspath(layer_path))
+        while not os.path.isdir(folder) and os.path.dirname(folder) != folder:
+            new_folder, folder = folder, os.path.dirname(folder)
+
+        layer = Sdf.Layer.CreateNew(layer_path)
+        prim_spec = Sdf.CreatePrimInLayer(layer, prim_path)
+        prim_spec.specifier = Sdf.SpecifierDef
+        prim_spec.typeName = type_name
+        layer.defaultPrim = prim_spec.name
+
+        if self._session_layers is not None:
+            self._session_layers[layer.identifier] = layer
+            self._session_created.append((layer.realPath, new_folder))
+        self.save(layer)
+        return layer
+
+    @staticmethod
+    def relative_path(layer_path, target_path):
+        """
+        Returns target_path relative to the folder of layer_path, in the "./dir/file.usda" form written by the pipeline.
+
+        """
+        relative_path = os.path.relpath(target_path, os.path.dirname(layer_path))
+        return "./" + relative_path.replace('\\', '/')
+
+    def save(self, layer):
+        """
+        Writes the layer if it has unsaved edits. Inside a session the write is deferred to the end of the session.
+
+        """
+        if self._session_layers is None and layer.dirty:
+            layer.Save()
+            if self.layer_cache is not None:
+                self.layer_cache.refresh(layer)
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Batches every edit made inside the block: change notices are grouped in one Sdf.ChangeBlock and each dirty
+        layer is saved once on exit. If an exception escapes, the edited layers are reloaded from disk instead,
+        dropping the changes of the session, and the layers it created are deleted with remove_created_layers().
+
+        Nested sessions join the outermost one.
+
+        Usage:
+            with layer_editor.session() as created:
+                layer_editor.add_sublayer(shot_path, modelling_path)
+                layer_editor.add_sublayer(shot_path, layout_path)
+
+        :return: The list of the layers created in the session, for callers that must undo them after it ended.
+        """
+        if self._session_depth > 0:
+            self._session_depth += 1
+            try:
+                yield self._session_created
+            finally:
+                self._session_depth -= 1
+            return
+
+        self._session_layers = {}
+        self._session_created = created = []
+        self._session_depth = 1
+        try:
+            with Sdf.ChangeBlock():
+                yield created
+        except BaseException:
+            layers, self._session_layers, self._session_created = self._session_layers, None, None
+            self._session_depth = 0
+            created_paths = set(layer_path for layer_path, new_folder in created)
+            for layer in layers.values():
+                if layer.dirty and layer.realPath not in created_paths:
+                    layer.Reload(force=True)
+            self.remove_created_layers(created)
+            raise
+
+        layers, self._session_layers, self._session_created = self._session_layers, None, None
+        self._session_depth = 0
+        for layer in layers.values():
+            self.save(layer)
+
+    def remove_created_layers(self, created):
+        """
+        Deletes the files of layers created in a session that did not go through, and the folders made for them.
+        The list is emptied, so calling it again for the same session does nothing.
+
+        :param created: The list returned by session().
+        """
+        while created:
+            layer_path, new_folder = created.pop()
+            if self.layer_cache is not None:
+                self.layer_cache.invalidate(new_folder or layer_path)
+            try:
+                if new_folder is not None:
+                    shutil.rmtree(new_folder)
+                elif os.path.exists(layer_path):
+                    os.remove(layer_path)
+            except OSError as e:
+                print(f"Could not remove the USD layer {layer_path}: {e}")
+
+    # Sublayers
+    def add_sublayer(self, layer_path, sublayer_path, index=0):
+        """
+        Adds sublayer_path to the sublayers of the layer, if it is not there yet.
+
+        :param sublayer_path: The path of the sublayer, absolute paths are made relative to the layer.
+        :param index: Position in the sublayer list, 0 (strongest) by default, -1 to append it (weakest).
+        """
+        layer = self.open_layer(layer_path)
+        if layer is None:
+            return
+        if os.path.isabs(sublayer_path):
+            sublayer_path = self.relative_path(layer_path, sublayer_path)
+
+        if sublayer_path not in layer.subLayerPaths:
+            if index == -1:
+                layer.subLayerPaths.append(sublayer_path)
+            else:
+                layer.subLayerPaths.insert(index, sublayer_path)
+        self.save(layer)
+
+    def remove_sublayer(self, layer_path, sublayer_path):
+        layer = self.open_layer(layer_path)
+        if layer is None:
+            return
+        if os.path.isabs(sublayer_path):
+            sublayer_path = self.relative_path(layer_path, sublayer_path)
+
+        if sublayer_path in layer.subLayerPaths:
+            layer.subLayerPaths.remove(sublayer_path)
+        self.save(layer)
+
+    def replace_sublayer(self, layer_path, old_sublayer_path, new_sublayer_path):
+        """
+        Replaces a sublayer in place, keeping its position (and so its strength) in the list.
+
+        :return: False if old_sublayer_path is not a sublayer of the layer.
+        """
+        layer = self.open_layer(layer_path)
+        if layer is None:
+            return False
+        if os.path.isabs(old_sublayer_path):
+            old_sublayer_path = self.relative_path(layer_path, old_sublayer_path)
+        if os.path.isabs(new_sublayer_path):
+            new_sublayer_path = self.relative_path(layer_path, new_sublayer_path)
+
+        sublayer_paths = list(layer.subLayerPaths)
+        if old_sublayer_path not in sublayer_paths:
+            return False
+        sublayer_paths[sublayer_paths.index(old_sublayer_path)] = new_sublayer_path
+        layer.subLayerPaths = sublayer_paths
+        self.save(layer)
+        return True
+
+    # Variant sets
+    def get_variant_set_spec(self, layer, prim_path, variant_set_name, create=False):
+        """
+        Returns the Sdf.VariantSetSpec of a prim, or None if the layer has no such variant set.
+
+        :param create: Create the prim spec (as an over) and the variant set if they are missing, registering the
+                       set in the prepended variantSetNames like Usd.VariantSets.AddVariantSet() does.
+        """
+        prim_spec = layer.GetPrimAtPath(prim_path)
+        if prim_spec is None:
+            if not create:
+                return None
+            prim_spec = Sdf.CreatePrimInLayer(layer, prim_path)
+
+        variant_set_spec = prim_spec.variantSets.get(variant_set_name)
+        if variant_set_spec is not None:
+            return variant_set_spec
+
+        # A set added by Usd.VariantSets.AddVariantSet() is only declared in variantSetNames until it has a variant.
+        if variant_set_name in prim_spec.variantSetNameList.GetAddedOrExplicitItems():
+            return Sdf.VariantSetSpec(prim_spec, variant_set_name)
+        if create:
+            variant_set_spec = Sdf.VariantSetSpec(prim_spec, variant_set_name)
+            prim_spec.variantSetNameList.prependedItems.append(variant_set_name)
+        return variant_set_spec
+
+    def add_variant_set(self, layer_path, prim_path, variant_set_name):
+        layer = self.open_layer(layer_path)
+        if layer is None:
+            return
+        self.get_variant_set_spec(layer, prim_path, variant_set_name, create=True)
+        self.save(layer)
+
+    def add_variant(self, layer_path, prim_path, variant_set_name, variant_name):
+        """
+        Adds an empty variant to an existing variant set of the layer.
+
+        :return: False if the layer has no such variant set.
+        """
+        layer = self.open_layer(layer_path)
+        if layer is None:
+            return False
+        variant_set_spec = self.get_variant_set_spec(layer, prim_path, variant_set_name)
+        if variant_set_spec is None:
+            return False
+
+        if variant_name not in variant_set_spec.variants:
+            Sdf.VariantSpec(variant_set_spec, variant_name)
+        self.save(layer)
+        return True
+
+    def set_variant_payload(self, layer_path, prim_path, variant_set_name, variant_name, payload_path, select=True, create=True):
+        """
+        Makes payload_path the only payload of a variant.
+
+        :param payload_path: The path of the payload, absolute paths are made relative to the layer.
+        :param select: Also make the variant the selection of its set in this layer.
+        :param create: Create the variant if the set does not have it yet.
+        :return: False if the layer has no such variant set, or no such variant and create is False.
+        """
+        layer = self.open_layer(layer_path)
+        if layer is None:
+            return False
+        variant_set_spec = self.get_variant_set_spec(layer, prim_path, variant_set_name)
+        if variant_set_spec is None:
+            return False
+        if os.path.isabs(payload_path):
+            payload_path = self.relative_path(layer_path, payload_path)
+
+        variant_spec = variant_set_spec.variants.get(variant_name)
+        if variant_spec is None:
+            if not create:
+                return False
+            variant_spec = Sdf.VariantSpec(variant_set_spec, variant_name)
+
+        payload_list = variant_spec.primSpec.payloadList
+        payload_list.ClearEdits()
+        payload_list.prependedItems.append(Sdf.Payload(payload_path))
+
+        if select:
+            layer.GetPrimAtPath(prim_path).variantSelections[variant_set_name] = variant_name
+        self.save(layer)
+        return True
+
+    def set_variant_selection(self, layer_path, prim_path, variant_set_name, variant_name):
+        layer = self.open_layer(layer_path)
+        if layer is None:
+            return
+        prim_spec = layer.GetPrimAtPath(prim_path) or Sdf.CreatePrimInLayer(layer, prim_path)
+        prim_spec.variantSelections[variant_set_name] = variant_name
+        self.save(layer)
@@ -0,0 +1,484 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class ProjectCache:
+    """
+    Bounded cache of project database rows, shared by the UI, UsdManager and FileManager.
+
+    Entries are grouped by entity (assets, variant_usds, thumbnails...) and keyed by their parent id. Every entity
+    has its own LRU size limit and optional time to live, and a memory cap on the whole cache evicts the least
+    recently used entries first, snapshot blobs included. Freshness comes from the database changelog: each lookup
+    syncs first, which costs a PRAGMA when nothing changed and only evicts the parents that did change.
+
+    Inside a write transaction the cache is bypassed, so rows that may still be rolled back are never kept.
+    """
+    # Entity -> maximum number of cached keys. Entities not listed use default_max_entries.
+    max_entries = {
+        "assets": 1,
+        "sequences": 1,
+        "thumbnails": 512,
+        "resolve": 1024,
+    }
+
+    # (changelog table, parent column) -> cached entities keyed by that parent. Top level entities are keyed by None.
+    changelog_entities = {
+        ("assets", None): ("assets",),
+        ("sequences", None): ("sequences",),
+        ("shots", "seq_id"): ("shots",),
+        ("departments", "asset_id"): ("asset_departments",),
+        ("departments", "seq_id"): ("sequence_departments",),
+        ("departments", "shot_id"): ("shot_departments",),
+        ("tasks", "department_id"): ("tasks",),
+        ("setVar", "department_id"): ("setVars",),
+        ("variant", "setVar_id"): ("variants",),
+        ("variantVersion", "var_id"): ("variant_usds", "latest_variant_usd", "current_variant_version"),
+        ("variantVersion", "department_id"): ("sublayer_usds", "current_sublayer_version"),
+        ("files", "task_id"): ("files",),
+    }
+
+    # Resolved paths span the asset hierarchy down to the versions, any change there drops them.
+    resolve_tables = {"assets", "departments", "setVar", "variant", "variantVersion"}
+
+    # Version lists only grow: entity -> row id column. New rows are appended to them instead of reloading the list.
+    appendable_entities = {
+        "variant_usds": "variantVersion_id",
+        "sublayer_usds": "variantVersion_id",
+        "files": "file_id",
+    }
+
+    # Changes kept for take_changes() before a consumer that never polls forces a full reload instead.
+    max_pending_changes = 1000
+
+    def __init__(self, db, default_max_entries=65536, max_bytes=64 * 1024 * 1024, ttl=None, ttls=None):
+        """
+        :param db: The ProjectDataBase to read from.
+        :param default_max_entries: Keys kept per entity when it has no entry in max_entries.
+        :param max_bytes: Approximate memory cap of the whole cache, row values and blobs included.
+        :param ttl: Seconds after which any entry is reloaded, None to rely on the changelog only.
+        :param ttls: Per entity overrides of ttl, e.g. {"variant_usds": 30}.
+        """
+        self.db = db
+        self.default_max_entries = default_max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttls = ttls or {}
+
+        self._entries = OrderedDict()  # (entity, key) -> (value, size, expires_at), least recently used first.
+        self._entity_keys = {}  # entity -> OrderedDict of its keys, least recently used first.
+        self._appended = {}  # (entity, key) -> lowest row id added to the parent since its list was cached.
+        self._complete = set()  # (entity, key) of the version lists holding every version, not just the newest pages.
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        self.stats = {}  # entity -> {"hits": int, "misses": int, "evictions": int, "deltas": int}
+
+        # Position in the changelog. The data version token is per connection, so it is tracked per thread.
+        self.changelog_seq = self.db.get_changelog_seq()
+        self._data_versions = {}
+        self._pending_changes = []
+
+    # Cache core
+    def get(self, entity, key, loader):
+        """
+        Returns the cached value of (entity, key), calling loader() to fetch it on a miss.
+
+        """
+        if self.db.connect().in_transaction:
+            return loader()
+        self.sync()
+
+        with self._lock:
+            stats = self._entity_stats(entity)
+            entry = self._entries.get((entity, key))
+            if entry is not None:
+                value, size, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end((entity, key))
+                    self._entity_keys[entity].move_to_end(key)
+                    stats["hits"] += 1
+                    return value
+                self._remove((entity, key))
+                stats["evictions"] += 1
+            stats["misses"] += 1
+
+        value = loader()
+        self.put(entity, key, value)
+        return value
+
+    def put(self, entity, key, value, size=None):
+        """
+        :param size: The estimated size of value when the caller already knows it.
+        """
+        with self._lock:
+            if (entity, key) in self._entries:
+                self._remove((entity, key))
+
+            ttl = self.ttls.get(entity, self.ttl)
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            if size is None:
+                size = self._sizeof(value)
+            self._entries[(entity, key)] = (value, size, expires_at)
+            entity_keys = self._entity_keys.setdefault(entity, OrderedDict())
+            entity_keys[key] = None
+            self._bytes += size
+
+            # Per entity LRU limit.
+            if len(entity_keys) > self.max_entries.get(entity, self.default_max_entries):
+                self._evict((entity, next(iter(entity_keys))))
+
+            # Memory cap across every entity.
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._evict(next(iter(self._entries)))
+
+    def invalidate(self, entity, key=None):
+        """
+        Drops one cached key of an entity, or the whole entity when key is None.
+
+        """
+        with self._lock:
+            if key is not None:
+                if (entity, key) in self._entries:
+                    self._remove((entity, key))
+                return
+            for entity_key in list(self._entity_keys.get(entity, ())):
+                self._remove((entity, entity_key))
+
+    def clear_cache(self, entity_type=None):
+        """
+        Drops every cached entity, or only entity_type.
+
+        """
+        with self._lock:
+            if entity_type is None:
+                self._entries = OrderedDict()
+                self._entity_keys = {}
+                self._appended = {}
+                self._complete = set()
+                self._bytes = 0
+            else:
+                self.invalidate(entity_type)
+
+    def memory_usage(self):
+        return self._bytes
+
+    def _entity_stats(self, entity):
+        if entity not in self.stats:
+            self.stats[entity] = {"hits": 0, "misses": 0, "evictions": 0, "deltas": 0}
+        return self.stats[entity]
+
+    def _remove(self, entry_key):
+        value, size, expires_at = self._entries.pop(entry_key)
+        del self._entity_keys[entry_key[0]][entry_key[1]]
+        self._appended.pop(entry_key, None)
+        self._complete.discard(entry_key)
+        self._bytes -= size
+
+    def _evict(self, entry_key):
+        self._remove(entry_key)
+        self._entity_stats(entry_key[0])["evictions"] += 1
+
+    def _sizeof(self, value):
+        # Rough payload size: strings and blobs by length, everything else as a fixed cost.
+        if value is None:
+            return 16
+        if isinstance(value, (bytes, bytearray, str)):
+            return 48 + len(value)
+        if isinstance(value, dict):
+            return 64 + sum(self._sizeof(key) + self._sizeof(item) for key, item in value.items())
+        if isinstance(value, (list, tuple)):
+            return 56 + sum(self._sizeof(item) for item in value)
+        if hasattr(value, "keys"):  # sqlite3.Row, its columns are never nested.
+            return 120 + sum(56 + len(item) if isinstance(item, (str, bytes)) else 32 for item in value)
+        return 32
+
+    # Change feed
+    def sync(self):
+        """
+        Evicts only the cache entries touched since the last sync, by this artist or any other.
+
+        :return: The list of changes applied, or None if the changelog was pruned and every entry was dropped.
+        """
+        if self.db.connect().in_transaction:
+            # The changelog rows of an open transaction may still be rolled back and their seq reused.
+            return []
+
+        thread_id = threading.get_ident()
+        data_version = self.db.data_version()
+        if self._data_versions.get(thread_id) == data_version:
+            return []
+
+        with self._lock:
+            self._data_versions[thread_id] = data_version
+            changes = self.db.get_changes_since(self.changelog_seq)
+            if changes is None:
+                self.changelog_seq = self.db.get_changelog_seq()
+                self.clear_cache()
+                self._pending_changes = None
+                return None
+
+            self._apply_changes(changes)
+            if changes:
+                self.changelog_seq = changes[-1]['seq']
+                if self._pending_changes is not None:
+                    self._pending_changes.extend(changes)
+                    if len(self._pending_changes) > self.max_pending_changes:
+                        self._pending_changes = None
+            return changes
+
+    def _apply_changes(self, changes):
+        for change in changes:
+            for entity in self.changelog_entities.get((change['table_name'], change['parent_column']), ()):
+                if entity in self.appendable_entities and self._is_appended(entity, change):
+                    continue
+                self.invalidate(entity, change['parent_id'] if change['parent_column'] is not None else None)
+            if change['table_name'] in self.resolve_tables:
+                self.invalidate("resolve")
+
+    def _is_appended(self, entity, change):
+        # A new row, or the first update of one not in the cached list yet (a reserved version being published),
+        # only adds to the list. Changes to rows already listed, and deletes, need a reload.
+        entry = self._entries.get((entity, change['parent_id']))
+        if entry is None or change['op'] == "delete":
+            return False
+        id_column = self.appendable_entities[entity]
+        if any(row[id_column] == change['row_id'] for row in entry[0].values()):
+            return False
+        entry_key = (entity, change['parent_id'])
+        self._appended[entry_key] = min(self._appended.get(entry_key, change['row_id']), change['row_id'])
+        return True
+
+    def get_versions(self, entity, key, count, page_loader, delta_loader):
+        """
+        get() for the version lists, which are loaded newest first, one page at a time.
+
+        The cached list holds the newest versions loaded so far. When rows were only added since it was cached,
+        delta_loader(row_id) fetches the rows newer than row_id and they are merged in. When more versions are asked
+        than the list holds, page_loader(before_version, limit) fetches only the missing older ones.
+
+        :param count: The number of newest versions wanted, None for all of them.
+        :return: A dictionary {version: row} ordered newest first, with at least count versions if they exist.
+        """
+        if self.db.connect().in_transaction:
+            return {row['version']: row for row in page_loader(None, count if count is not None else -1)}
+        self.sync()
+
+        entry_key = (entity, key)
+        with self._lock:
+            stats = self._entity_stats(entity)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(entry_key)
+                stats["evictions"] += 1
+                entry = None
+            since = self._appended.pop(entry_key, None)
+            complete = entry_key in self._complete
+
+        rows = dict(entry[0]) if entry is not None else {}
+        size = entry[1] if entry is not None else self._sizeof(rows)
+        changed = False
+
+        if entry is not None and since is not None:
+            stats["deltas"] += 1
+            oldest = next(reversed(rows), None)
+            for row in delta_loader(since - 1):
+                # A late publish below the loaded window is picked up with the page that reaches it.
+                if not complete and oldest is not None and row['version'] < oldest:
+                    continue
+                previous = rows.get(row['version'])
+                size += self._sizeof(row) - (self._sizeof(previous) if previous is not None else -self._sizeof(row['version']))
+                rows[row['version']] = row
+            rows = dict(sorted(rows.items(), reverse=True))
+            changed = True
+
+        missing = count - len(rows) if count is not None else None
+        if not complete and (missing is None or missing > 0):
+            stats["misses"] += 1
+            page = page_loader(next(reversed(rows), None), missing if missing is not None else -1)
+            for row in page:
+                size += self._sizeof(row) + self._sizeof(row['version'])
+                rows[row['version']] = row
+            complete = missing is None or len(page) < missing
+            changed = True
+        elif not changed:
+            stats["hits"] += 1
+
+        if changed:
+            with self._lock:
+                self.put(entity, key, rows, size=size)
+                if complete:
+                    self._complete.add(entry_key)
+        else:
+            with self._lock:
+                if entry_key in self._entries:
+                    self._entries.move_to_end(entry_key)
+                    self._entity_keys[entity].move_to_end(key)
+        return rows
+
+    def take_changes(self):
+        """
+        Returns the changes applied by every sync since the last call, None if the caller has to reload everything.
+
+        """
+        with self._lock:
+            changes = self._pending_changes
+            self._pending_changes = []
+            return changes
+
+    def poll(self):
+        """
+        Syncs with the database and returns every change applied since the last poll.
+
+        """
+        self.sync()
+        return self.take_changes()
+
+    # Lists, keyed by name or version.
+    def get_assets(self):
+        return self.get("assets", None, lambda: {asset['name']: asset for asset in self.db.get_asset(all=True)})
+
+    def get_asset_departments(self, asset_id):
+        return self.get("asset_departments", asset_id, lambda: {
+            department['name']: department for department in self.db.get_department("asset", asset_id, all=True)})
+
+    def get_setVars(self, department_id):
+        return self.get("setVars", department_id, lambda: {
+            setVar['name']: setVar for setVar in self.db.get_setVar(department_id, all=True)})
+
+    def get_variants(self, setVar_id):
+        return self.get("variants", setVar_id, lambda: {
+            variant['name']: variant for variant in self.db.get_variant(setVar_id, all=True)})
+
+    def get_variant_usds(self, variant_id, count=None):
+        return self.get_versions("variant_usds", variant_id, count,
+                                 lambda before, limit: self.db.get_variantVersions_page('variant', variant_id, before, limit),
+                                 lambda since: self.db.get_variantVersions_since('variant', variant_id, since))
+
+    def get_sequences(self):
+        return self.get("sequences", None, lambda: {sequence['name']: sequence for sequence in self.db.get_sequence(all=True)})
+
+    def get_sequence_departments(self, sequence_id):
+        return self.get("sequence_departments", sequence_id, lambda: {
+            department['name']: department for department in self.db.get_department("sequence", sequence_id, all=True)})
+
+    def get_shot_departments(self, shot_id):
+        return self.get("shot_departments", shot_id, lambda: {
+            department['name']: department for department in self.db.get_department("shot", shot_id, all=True)})
+
+    def get_files(self, task_id, count=None):
+        return self.get_versions("files", task_id, count,
+                                 lambda before, limit: self.db.get_files_page(task_id, before, limit),
+                                 lambda since: self.db.get_files_since(task_id, since))
+
+    def get_shots(self, sequence_id):
+        return self.get("shots", sequence_id, lambda: {shot['name']: shot for shot in self.db.get_shot(sequence_id, all=True)})
+
+    def get_tasks(self, department_id):
+        return self.get("tasks", department_id, lambda: {task['name']: task for task in self.db.get_task(department_id, all=True)})
+
+    def get_sublayer_usds(self, department_id, count=None):
+        return self.get_versions("sublayer_usds", department_id, count,
+                                 lambda before, limit: self.db.get_variantVersions_page('department', department_id, before, limit),
+                                 lambda since: self.db.get_variantVersions_since('department', department_id, since))
+
+    def get_latest_variant_usd(self, variant_id):
+        def load():
+            return next(iter(self.get_variant_usds(variant_id, count=1).values()), None)
+        return self.get("latest_variant_usd", variant_id, load)
+
+    def get_current_variant_version(self, variant_id):
+        return self.get("current_variant_version", variant_id, lambda: self.db.get_current_version('variant', variant_id))
+
+    def get_current_sublayer_version(self, department_id):
+        return self.get("current_sublayer_version", department_id, lambda: self.db.get_current_version('department', department_id))
+
+    def get_thumbnail(self, snapshot_hash):
+        # Thumbnails are content addressed and never change once stored.
+        return self.get("thumbnails", snapshot_hash, lambda: self.db.get_thumbnail(snapshot_hash))
+
+    # Single rows, answered from the lists above.
+    def get_asset(self, name):
+        return self.get_assets().get(name)
+
+    def get_sequence(self, name):
+        return self.get_sequences().get(name)
+
+    def get_shot(self, seq_id, shot_name):
+        return self.get_shots(seq_id).get(shot_name)
+
+    def get_department(self, id_type, id_value, department_name):
+        if id_type == "asset":
+            departments = self.get_asset_departments(id_value)
+        elif id_type == "sequence":
+            departments = self.get_sequence_departments(id_value)
+        else:
+            departments = self.get_shot_departments(id_value)
+        return departments.get(department_name)
+
+    def get_task(self, department_id, task_name):
+        return self.get_tasks(department_id).get(task_name)
+
+    def resolve(self, asset, department=None, setVar=None, variant=None, version=None):
+        """
+        Cached ProjectDataBase.resolve(). Paths that do not resolve are not cached.
+
+        """
+        key = (asset, department, setVar, variant, version)
+        result = self.get("resolve", key, lambda: self.db.resolve(asset, department, setVar, variant, version))
+        if result is None:
+            self.invalidate("resolve", key)
+        return result
+
+    # Project tree
+    def prefetch(self):
+        """
+        Fills the cache with the whole project skeleton from ProjectDataBase.load_tree(), so browsing the lists is
+        served from memory instead of one query per click. Parents without children are cached as empty too.
+
+        :return: The number of cache entries filled.
+        """
+        if self.db.connect().in_transaction:
+            return 0
+        self.sync()
+        tree = self.db.load_tree()
+
+        def group(parents, parent_key, rows, parent_column, key_column):
+            groups = {parent[parent_key]: {} for parent in parents}
+            for row in rows:
+                if row[parent_column] in groups:
+                    groups[row[parent_column]][row[key_column]] = row
+            return groups
+
+        departments = tree["departments"]
+        entities = {
+            "asset_departments": group(tree["assets"], "id", departments, "asset_id", "name"),
+            "sequence_departments": group(tree["sequences"], "id", departments, "seq_id", "name"),
+            "shot_departments": group(tree["shots"], "id", departments, "shot_id", "name"),
+            "shots": group(tree["sequences"], "id", tree["shots"], "seq_id", "name"),
+            "tasks": group(departments, "department_id", tree["tasks"], "department_id", "name"),
+            "setVars": group(departments, "department_id", tree["setVars"], "department_id", "name"),
+            "variants": group(tree["setVars"], "setVar_id", tree["variants"], "setVar_id", "name"),
+        }
+        latest = {variant['var_id']: None for variant in tree["variants"]}
+        latest.update({version['var_id']: version for version in tree["latest_versions"]})
+        entities["latest_variant_usd"] = latest
+        entities["current_variant_version"] = {variant['var_id']: None for variant in tree["variants"]}
+        entities["current_sublayer_version"] = {department['department_id']: None for department in departments}
+        for current in tree["current_versions"]:
+            if current['var_id'] is not None:
+                entities["current_variant_version"][current['var_id']] = current
+            elif current['department_id'] is not None:
+                entities["current_sublayer_version"][current['department_id']] = current
+
+        with self._lock:
+            self.put("assets", None, {asset['name']: asset for asset in tree["assets"]})
+            self.put("sequences", None, {sequence['name']: sequence for sequence in tree["sequences"]})
+            for entity, values in entities.items():
+                for key, value in values.items():
+                    self.put(entity, key, value)
+
+            # Another thread may have synced past the snapshot meanwhile, drop what changed since it was taken.
+            if tree["changelog_seq"] < self.changelog_seq:
+                self._apply_changes(self.db.get_changes_since(tree["changelog_seq"]) or [])
+        return 2 + sum(len(values) for values in entities.values())
@@ -0,0 +1,318 @@
+from lib.layer_editor import LayerEditor
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import csv
+import json
+import os
+import re
+
+
+def read_edit_list(path, sequence=None, fps=24, start_frame=1001):
+    """
+    Reads the sequences and shots of an edit list.
+
+    - CSV: one shot per row, with the columns sequence, shot, framerange (or frame_start and frame_end) and an
+      optional description.
+    - JSON: a list of rows with the same keys as the CSV, or {"sequences": [{"name", "description", "shots": [...]}]}.
+    - EDL (CMX 3600): one shot per event, named after its "FROM CLIP NAME" comment (the reel otherwise). The
+      sequence is the TITLE of the EDL unless sequence is given, every shot starts at start_frame.
+
+    :param sequence: The sequence of the shots that do not name one.
+    :param fps: The frame rate of the EDL timecodes.
+    :param start_frame: The first frame of the shots read from an EDL.
+    :return: A list of {"sequence", "shot", "framerange", "description", "sequence_description"} dictionaries, in
+             edit order.
+    :raises ValueError: If the format is not supported or a shot has no sequence.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".edl":
+        entries = _read_edl(path, sequence, fps, start_frame)
+    else:
+        entries = _read_rows(path, extension, sequence)
+
+    missing = [entry["shot"] for entry in entries if not entry["sequence"]]
+    if missing:
+        raise ValueError(f"No sequence for the shots {', '.join(str(shot) for shot in missing)}. Add a sequence column (or an EDL TITLE) or pass a sequence.")
+    return entries
+
+
+def _read_rows(path, extension, sequence):
+    sequence_descriptions = {}
+    if extension == ".json":
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            rows = []
+            for sequence_data in data.get("sequences", []):
+                sequence_descriptions[sequence_data["name"]] = sequence_data.get("description", "")
+                rows += [dict(shot, sequence=sequence_data["name"]) for shot in sequence_data.get("shots", [])]
+        else:
+            rows = data
+    elif extension == ".csv":
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        raise ValueError(f"Unsupported edit list format {extension}. Use .csv, .json or .edl")
+
+    entries = []
+    for row in rows:
+        framerange = row.get("framerange") or f"{row['frame_start']}-{row['frame_end']}"
+        entries.append({
+            "sequence": row.get("sequence") or sequence,
+            "shot": row.get("shot") or row.get("name"),
+            "framerange": str(framerange).replace(" ", ""),
+            "description": row.get("description") or "",
+            "sequence_description": sequence_descriptions.get(row.get("sequence"), ""),
+        })
+    return entries
+
+
+def _read_edl(path, sequence, fps, start_frame):
+    event_pattern = re.compile(r"^\d+\s+(\S+)\s+\S+\s+\S+\s+(?:\d+\s+)?[\d:;]+\s+[\d:;]+\s+([\d:;]+)\s+([\d:;]+)")
+
+    def frames(timecode):
+        hours, minutes, seconds, frame = (int(value) for value in re.split("[:;]", timecode))
+        return ((hours * 60 + minutes) * 60 + seconds) * fps + frame
+
+    entries = []
+    title = None
+    for line in open(path):
+        line = line.strip()
+        if line.startswith("TITLE:"):
+            title = line.split(":", 1)[1].strip()
+            continue
+        match = event_pattern.match(line)
+        if match:
+            reel, record_in, record_out = match.groups()
+            duration = frames(record_out) - frames(record_in)
+            entries.append({
+                "sequence": sequence or title,
+                "shot": reel,
+                "framerange": f"{start_frame}-{start_frame + duration - 1}",
+                "description": "",
+                "sequence_description": "",
+            })
+        elif line.startswith("* FROM CLIP NAME:") and entries:
+            entries[-1]["shot"] = line.split(":", 1)[1].strip()
+    return entries
+
+
+def author_layers(tasks):
+    """
+    Creates or conforms entity layers and their department layers. Runs in the worker processes of ShotBuilder,
+    so it only takes and returns plain data.
+
+    :param tasks: A list of {"path", "asset_info", "frames", "sublayers"} dictionaries: the entity layer, its
+                  assetInfo, its (start, end) time codes or None, and the department layer paths it sublayers, in
+                  creation order.
+    :return: A list of (path, status) tuples, status is "created", "updated", "unchanged" or the error message.
+    """
+    editor = LayerEditor()
+    results = []
+    for task in tasks:
+        try:
+            results.append((task["path"], _author_layer(editor, task)))
+        except Exception as e:
+            results.append((task["path"], f"Error: {e}"))
+    return results
+
+
+def _author_layer(editor, task):
+    with editor.session():
+        if os.path.exists(task["path"]):
+            status = "unchanged"
+            layer = editor.open_layer(task["path"])
+            layer.Reload()  # A forked worker may hold a copy of the layer read by the parent before a later edit.
+        else:
+            status = "created"
+            layer = editor.create_layer(task["path"])
+            layer.GetPrimAtPath(layer.defaultPrim).assetInfo = task["asset_info"]
+
+        if task["frames"] is not None and (layer.startTimeCode, layer.endTimeCode) != tuple(task["frames"]):
+            layer.startTimeCode, layer.endTimeCode = task["frames"]
+
+        for sublayer_path in task["sublayers"]:
+            if not os.path.exists(sublayer_path):
+                editor.create_layer(sublayer_path)
+            editor.add_sublayer(task["path"], sublayer_path)
+
+        if status == "unchanged" and layer.dirty:
+            status = "updated"
+    return status
+
+
+class ShotBuilder:
+    """
+    Scaffolds sequences and shots in bulk from an edit list, without the UI.
+
+    The shot layers and their department layers are authored in a process pool, then every new row (sequences,
+    shots and departments) is registered in a single transaction. Running it again with the same edit list changes
+    nothing: existing layers and rows are kept, only what is missing is created and changed frame ranges are
+    conformed.
+
+    Usage:
+        builder = ShotBuilder(usd_manager, departments=["layout", "animation", "lighting"])
+        builder.build(read_edit_list("sq010.edl"))
+    """
+    # Below this many layers the pool costs more to start than it saves, they are authored in this process.
+    min_parallel_tasks = 64
+
+    def __init__(self, usd_manager, departments=(), max_workers=None, progress=None):
+        """
+        :param usd_manager: The UsdManager of the project.
+        :param departments: The departments (sublayers) every shot gets.
+        :param max_workers: Worker processes of the pool, os.cpu_count() if None, 0 to author in this process.
+        :param progress: Called as progress(done, total) each time a batch of shot layers is written.
+        """
+        self.um = usd_manager
+        self.db = usd_manager.db
+        self.departments = list(departments)
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.progress = progress
+
+    def build(self, entries):
+        """
+        Creates the sequences, shots and departments of the edit list that do not exist yet.
+
+        :param entries: The shots to build, as returned by read_edit_list().
+        :return: A summary dictionary: the number of "sequences", "shots" and "departments" rows created, the
+                 number of shots "updated", and the "failed" (path, error) pairs whose rows were not registered.
+        """
+        tree = self.db.load_tree()
+        sequences = {row["name"]: row["id"] for row in tree["sequences"]}
+        shots = {(row["seq_id"], row["name"]): row for row in tree["shots"]}
+        shot_departments = {}  # Shot id -> {department name: usd_path}.
+        for row in tree["departments"]:
+            if row["shot_id"] is not None:
+                shot_departments.setdefault(row["shot_id"], {})[row["name"]] = row["usd_path"]
+        failed = []
+
+        # Sequence layers are few, they are written here before the shots.
+        sequence_tasks = {}
+        for entry in entries:
+            if entry["sequence"] and entry["sequence"] not in sequences and entry["sequence"] not in sequence_tasks:
+                sequence_tasks[entry["sequence"]] = {
+                    "path": self.um.get_entity_path("sequence", entry["sequence"]),
+                    "asset_info": {"seqDescription": entry.get("sequence_description", "")},
+                    "frames": None,
+                    "sublayers": [],
+                }
+        sequence_statuses = dict(author_layers(list(sequence_tasks.values())))
+
+        # One task per shot, a shot listed twice keeps its last entry.
+        shot_entries = {}
+        for entry in entries:
+            # Shots are only authored under a sequence that is registered, or will be.
+            if not entry["sequence"]:
+                failed.append((entry["shot"], "Error: the shot has no sequence"))
+                continue
+            sequence_task = sequence_tasks.get(entry["sequence"])
+            if sequence_task is not None and sequence_statuses[sequence_task["path"]].startswith("Error"):
+                failed.append((self.um.get_entity_path("shot", entry["shot"], seq_name=entry["sequence"]),
+                               f"Error: the layer of the sequence {entry['sequence']} could not be written"))
+                continue
+            frames = self.db.parse_framerange(entry["framerange"])
+            if frames[0] is None:
+                failed.append((entry["shot"], f"Error: invalid frame range {entry['framerange']}"))
+                continue
+            path = self.um.get_entity_path("shot", entry["shot"], seq_name=entry["sequence"])
+            shot = shots.get((sequences.get(entry["sequence"]), entry["shot"]))
+            # Departments already registered keep their layer, wherever it was created.
+            department_paths = shot_departments.get(shot["id"], {}) if shot is not None else {}
+            shot_entries[path] = (entry, {
+                "path": path,
+                "asset_info": {"shotDescription": entry["description"]},
+                "frames": frames,
+                "sublayers": [department_paths.get(department) or self.um.get_sublayer_path("shot", entry["shot"], department, entry["sequence"])
+                              for department in self.departments],
+            })
+        statuses = dict(self._run([task for entry, task in shot_entries.values()]))
+        failed += [(path, status) for path, status in {**sequence_statuses, **statuses}.items() if status.startswith("Error")]
+
+        summary = {"sequences": 0, "shots": 0, "departments": 0, "updated": 0, "failed": failed}
+        with self.db.transaction():
+            new_sequences = [(name, task["path"], task["asset_info"]["seqDescription"])
+                             for name, task in sequence_tasks.items() if not sequence_statuses[task["path"]].startswith("Error")]
+            for (name, usd_path, description), seq_id in zip(new_sequences, self.db.create_sequences_bulk(new_sequences)):
+                sequences[name] = seq_id
+            summary["sequences"] = len(new_sequences)
+
+            built_shots = []  # (shot id, shot name, sequence name) of every shot of the edit list, new or existing.
+            new_shots = []
+            for path, (entry, task) in shot_entries.items():
+                if statuses[path].startswith("Error"):
+                    continue
+                seq_id = sequences[entry["sequence"]]
+                shot = shots.get((seq_id, entry["shot"]))
+                if shot is None:
+                    new_shots.append((seq_id, entry["shot"], entry["framerange"], entry["description"], path))
+                    continue
+
+                built_shots.append((shot["id"], entry["shot"], entry["sequence"]))
+                description = entry["description"] or shot["description"]
+                if shot["framerange"] != entry["framerange"] or shot["description"] != description:
+                    self.db.update_shot(shot["id"], seq_id, entry["shot"], entry["framerange"], description)
+                    summary["updated"] += 1
+                elif statuses[path] == "updated":
+                    summary["updated"] += 1
+
+            shot_ids = self.db.create_shots_bulk(new_shots)
+            sequence_names = {seq_id: name for name, seq_id in sequences.items()}
+            built_shots += [(shot_id, shot[1], sequence_names[shot[0]]) for shot_id, shot in zip(shot_ids, new_shots)]
+            summary["shots"] = len(new_shots)
+
+            new_departments = [(shot_id, department, self.um.get_sublayer_path("shot", shot_name, department, seq_name))
+                               for shot_id, shot_name, seq_name in built_shots for department in self.departments
+                               if department not in shot_departments.get(shot_id, ())]
+            self.db.create_departments_bulk("shot", new_departments)
+            summary["departments"] = len(new_departments)
+        return summary
+
+    def _run(self, tasks):
+        """
+        Authors the shot layers, in the pool when there are enough of them.
+
+        :return: The (path, status) pairs of author_layers().
+        """
+        total = len(tasks)
+        if not self.max_workers or total < self.min_parallel_tasks:
+            results = author_layers(tasks)
+            if self.progress:
+                self.progress(total, total)
+            return results
+
+        # Several batches per worker keep the workers busy until the end and the progress moving.
+        batch_size = max(1, total // (self.max_workers * 8))
+        batches = [tasks[start:start + batch_size] for start in range(0, total, batch_size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(author_layers, batch) for batch in batches]
+            for future in as_completed(futures):
+                results += future.result()
+                if self.progress:
+                    self.progress(len(results), total)
+        return results
+
+
+if __name__ == "__main__":
+    # Headless scaffolding: python -m lib.shot_builder <project> <edit list> --departments layout,animation
+    from lib.usd_manager import UsdManager
+
+    parser = argparse.ArgumentParser(description="Creates the sequences and shots of an edit list in a project.")
+    parser.add_argument("project", help="The project root directory.")
+    parser.add_argument("edit_list", help="A .csv, .json or .edl edit list.")
+    parser.add_argument("--departments", default="", help="Comma separated departments every shot gets.")
+    parser.add_argument("--sequence", help="Sequence of the shots that do not name one (EDL default: its TITLE).")
+    parser.add_argument("--fps", type=int, default=24, help="Frame rate of the EDL timecodes.")
+    parser.add_argument("--start-frame", type=int, default=1001, help="First frame of the shots read from an EDL.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, 0 to run in this process.")
+    args = parser.parse_args()
+
+    entries = read_edit_list(args.edit_list, args.sequence, args.fps, args.start_frame)
+    builder = ShotBuilder(UsdManager(args.project), [name for name in args.departments.split(",") if name], args.workers,
+                          progress=lambda done, total: print(f"\r{done}/{total} shot layers", end="", flush=True))
+    summary = builder.build(entries)
+    print(f"\n{summary['sequences']} sequences, {summary['shots']} shots and {summary['departments']} departments created, "
+          f"{summary['updated']} shots updated.")
+    for path, error in summary["failed"]:
+        print(f"{path}: {error}")
@@ -1,10 +1,13 @@
 
 
 from lib import data_base
+from lib.project_cache import ProjectCache
+from lib.layer_editor import LayerEditor
+from lib.layer_cache import LayerCache
 from pxr import Usd
+import contextlib
 import os
 import shutil
-import datetime
 
 running_in_maya = False
 
@@ -21,10 +24,21 @@ if running_in_maya:
 
 
 class UsdManager:
-    def __init__(self, project):
+    def __init__(self, project, cache=None, layer_cache=None):
+        """
+        :param project: The project root directory.
+        :param cache: A ProjectCache shared with the other consumers of the project, a private one is created if None.
+        :param layer_cache: The LayerCache holding the parsed USD layers, the one shared by the process is used if None.
+        """
         self.project = project
         db_path = os.path.join(self.project, "pipeline", "project.db")
         self.db = data_base.ProjectDataBase(db_path)
+        self.cache = cache if cache is not None else ProjectCache(self.db)
+
+        # Layers and stages parsed once per process and reused while their files are unchanged.
+        self.layer_cache = layer_cache if layer_cache is not None else LayerCache.get_shared()
+        # Edits of existing layers go through Sdf, only the layer being changed is opened.
+        self.layer_editor = LayerEditor(self.layer_cache)
 
         if running_in_maya:
             self.publish_variant = publish_variant.UsdMeshExporter()
@@ -34,7 +48,93 @@ class UsdManager:
         self.usd_sequence_folder = os.path.join(self.project, "sequences")
         self.usd_shots_folder = os.path.join(self.project, "shots")
         self.usd_fragment_folder = os.path.join(self.project, "fragment")
+
+        self._pending_removals = None  # Folders deleted by the current edit session, removed once it is committed.
         
+    @contextlib.contextmanager
+    def edit_session(self):
+        """
+        Groups the database writes and the USD layer edits made inside the block. The database changes are committed
+        once and every edited layer is saved once, when the block ends. Folders deleted in the block are only removed
+        after the commit. If an exception escapes, the database and the layer edits are rolled back, the layers created
+        in the block are deleted and the deleted folders are kept.
+
+        Nested sessions join the outermost one.
+
+        Usage:
+            with usd_manager.edit_session():
+                usd_manager.create_usd_sublayer("shot", "sh010", "layout", seq_name="sq010")
+                usd_manager.create_usd_sublayer("shot", "sh010", "animation", seq_name="sq010")
+        """
+        if self._pending_removals is not None:
+            yield
+            return
+
+        self._pending_removals = []
+        created = []
+        try:
+            # Layers are saved before the commit, a failed save rolls the database back too.
+            with self.db.transaction(), self.layer_editor.session() as created:
+                yield
+        except BaseException:
+            # The layer session only removes its new layers when it fails itself, not when the commit does.
+            self.layer_editor.remove_created_layers(created)
+            raise
+        finally:
+            removals, self._pending_removals = self._pending_removals, None
+
+        for folder in removals:
+            try:
+                self.remove_folder(folder)
+            except OSError as e:
+                print(f"Error: {e}")
+
+    def remove_folder(self, folder):
+        """
+        Deletes a folder of USD layers and drops its cached layers. Inside an edit session the folder is only
+        deleted once the session is committed.
+
+        """
+        if self._pending_removals is not None:
+            self._pending_removals.append(folder)
+            return
+        shutil.rmtree(folder)
+        self.layer_cache.invalidate(folder)
+
+    def open_stage(self, usd_path, load_payloads=False):
+        """
+        Returns a stage on a pipeline USD file from the layer cache, tools opening the same stage again get the cached
+        one while its layers are unchanged on disk.
+
+        :param usd_path: The root layer of the stage, e.g. the usd_path of an asset or shot.
+        :param load_payloads: Load the payloads (the published variant versions) when the stage is first opened.
+        """
+        load = Usd.Stage.LoadAll if load_payloads else Usd.Stage.LoadNone
+        return self.layer_cache.open_stage(usd_path, load)
+
+    def get_entity_path(self, entity_type, name, format=".usda", seq_name=None):
+        """
+        Returns the path of the USD file of an asset, sequence or shot. Shot folders are prefixed with their sequence.
+
+        """
+        if entity_type == "asset":
+            return os.path.join(self.usd_assets_folder, name, f"{name}{format}")
+        if entity_type == "sequence":
+            return os.path.join(self.usd_sequence_folder, name, f"{name}{format}")
+        return os.path.join(self.usd_shots_folder, f"{seq_name}_{name}", f"{seq_name}_{name}{format}")
+
+    def get_sublayer_path(self, entity_type, parent_name, sublayer_name, seq_name=None):
+        """
+        Returns the path of the USD file of a department (sublayer) of an asset, sequence or shot. Shot departments
+        live in the shot folder and are prefixed with the sequence, shot names repeat across sequences.
+
+        :param seq_name: Name of the parent sequence when the entity is a shot.
+        """
+        if entity_type == "shot":
+            parent_name = f"{seq_name}_{parent_name}"
+        entity_folder = {"asset": self.usd_assets_folder, "sequence": self.usd_sequence_folder, "shot": self.usd_shots_folder}[entity_type]
+        return os.path.join(entity_folder, parent_name, sublayer_name, f"{parent_name}_{sublayer_name}.usda")
+
     def create_usd_entity(self, entity_type, name, format, asset_type=None, description=None, seq_name=None, framerange=None):
         """
         Creates a new Usd entity and saves it to project path. 
@@ -48,8 +148,7 @@ class UsdManager:
         :param framerange: The framerange fo the Shot to be created.
         """
         if entity_type == "asset":
-            file_name = f"{name}{format}"
-            file_path = os.path.join(self.usd_assets_folder, name, file_name)
+            file_path = self.get_entity_path(entity_type, name, format)
 
             stage = Usd.Stage.CreateNew(file_path)
 
@@ -65,8 +164,7 @@ class UsdManager:
             self.db.create_asset(asset_type, name, file_path, description)
 
         elif entity_type == "sequence":
-            file_name = f"{name}{format}"
-            file_path = os.path.join(self.usd_sequence_folder, name, file_name)
+            file_path = self.get_entity_path(entity_type, name, format)
 
             stage = Usd.Stage.CreateNew(file_path)
 
@@ -81,12 +179,10 @@ class UsdManager:
             self.db.create_sequence(name, file_path, description)
 
         elif entity_type == "shot":
-            seq_info = self.db.get_sequence(seq_name)
+            seq_info = self.cache.get_sequence(seq_name)
             seq_id = seq_info["id"]
 
-            complete_file_dir = f"{seq_name}_{name}"
-            complete_file_name = f"{complete_file_dir}{format}"
-            file_path = os.path.join(self.usd_shots_folder, complete_file_dir, complete_file_name)
+            file_path = self.get_entity_path(entity_type, name, format, seq_name)
 
             stage = Usd.Stage.CreateNew(file_path)
 
@@ -111,7 +207,7 @@ class UsdManager:
 
     def edit_usd_entity(self, entity_type, name, mode, sublayer_path, seq_name=None):
         """
-        Edits Usd asset and saves it to project path. 
+        Edits Usd asset and saves it to project path. Only the entity layer is opened, its sublayers are not composed.
 
         :param name: the name of the entity
         :param mode: "add", "delete", "move".
@@ -119,130 +215,70 @@ class UsdManager:
         """
         if entity_type == "asset":
             # Get the Asset USD path.
-            entity_info = self.db.get_asset(name)
+            entity_info = self.cache.get_asset(name)
             entity_path = entity_info["usd_path"]
 
-            # Construct Relative Path for Sublayer.
-            entity_dir = os.path.dirname(entity_path)
-            relative_sublayer_path = os.path.relpath(sublayer_path, entity_dir)
-            relative_sublayer_path = relative_sublayer_path.replace('\\', '/')
-            relative_sublayer_path = "./" + relative_sublayer_path
-
-            # Open The USD Asset file.
-            stage = Usd.Stage.Open(entity_path)
-            root_layer = stage.GetRootLayer()
-
-            # Add new Sublayer to Asset USD.
-            if mode == "add":
-                # Ensure the sublayer is not already part of the stage
-                if relative_sublayer_path not in root_layer.subLayerPaths:
-                    root_layer.subLayerPaths.insert(0, relative_sublayer_path)
-                    root_layer.Save()
-            elif mode == "delete":
-                if relative_sublayer_path in root_layer.subLayerPaths:
-                    root_layer.subLayerPaths.remove(relative_sublayer_path)
-                    root_layer.Save()
-                    
-            elif mode == "move":
-                pass
-
         elif entity_type == "sequence":
-            # Get the Asset USD path.
-            sequence_info = self.db.get_sequence(name)
-            sequence_path = sequence_info["usd_path"]
-
-            # Construct Relative Path for Sublayer.
-            sequence_dir = os.path.dirname(sequence_path)
-            relative_sublayer_path = os.path.relpath(sublayer_path, sequence_dir)
-            relative_sublayer_path = relative_sublayer_path.replace('\\', '/')
-            relative_sublayer_path = "./" + relative_sublayer_path
-
-            # Open The USD Asset file.
-            stage = Usd.Stage.Open(sequence_path)
-            root_layer = stage.GetRootLayer()
-
-            # Add new Sublayer to Asset USD.
-            if mode == "add":
-                # Ensure the sublayer is not already part of the stage
-                if relative_sublayer_path not in root_layer.subLayerPaths:
-                    root_layer.subLayerPaths.insert(0, relative_sublayer_path)
-                    root_layer.Save()
-            elif mode == "delete":
-                if relative_sublayer_path in root_layer.subLayerPaths:
-                    root_layer.subLayerPaths.remove(relative_sublayer_path)
-                    root_layer.Save()
-            elif mode == "move":
-                pass
+            # Get the Sequence USD path.
+            sequence_info = self.cache.get_sequence(name)
+            entity_path = sequence_info["usd_path"]
 
         elif entity_type == "shot":
             # Get the parent Sequence Id from db.
-            sequence_info = self.db.get_sequence(seq_name)
+            sequence_info = self.cache.get_sequence(seq_name)
             sequence_id = sequence_info["id"]
 
-            # Get the Asset USD path from db
-            shot_info = self.db.get_shot(sequence_id, name)
-            shot_path = shot_info["usd_path"]
-
-            # Construct Relative Path for Sublayer.
-            shot_dir = os.path.dirname(shot_path)
-            relative_sublayer_path = os.path.relpath(sublayer_path, shot_dir)
-            relative_sublayer_path = relative_sublayer_path.replace('\\', '/')
-            relative_sublayer_path = "./" + relative_sublayer_path
-
-            # Open The USD Asset file.
-            stage = Usd.Stage.Open(shot_path)
-            root_layer = stage.GetRootLayer()
-
-            # Add new Sublayer to Asset USD.
-            if mode == "add":
-                # Ensure the sublayer is not already part of the stage
-                if relative_sublayer_path not in root_layer.subLayerPaths:
-                    root_layer.subLayerPaths.insert(0, relative_sublayer_path)
-                    root_layer.Save()
-            elif mode == "delete":
-                if relative_sublayer_path in root_layer.subLayerPaths:
-                    root_layer.subLayerPaths.remove(relative_sublayer_path)
-                    root_layer.Save()
-            elif mode == "move":
-                pass
+            # Get the Shot USD path from db
+            shot_info = self.cache.get_shot(sequence_id, name)
+            entity_path = shot_info["usd_path"]
         else:
             return print("entity_type format incorrect. Usage: 'asset', 'sequence', 'shot'")
 
+        # The sublayer is written relative to the entity file.
+        if mode == "add":
+            self.layer_editor.add_sublayer(entity_path, sublayer_path)
+        elif mode == "delete":
+            self.layer_editor.remove_sublayer(entity_path, sublayer_path)
+        elif mode == "move":
+            pass
+
     def delete_usd_entity(self, entity_type, name, seq_name=None):
         if entity_type == "asset":
             # Get the Asset USD path.
-            entity_info = self.db.get_asset(name)
+            entity_info = self.cache.get_asset(name)
             entity_path = entity_info["usd_path"]
             entity_dir = os.path.dirname(entity_path)
             entity_dir = entity_dir.replace('\\', '/')
 
             try:
                 shutil.rmtree(entity_dir)
-                self.db.delete_asset(name)
+                self.layer_cache.invalidate(entity_dir)
+                self.db.delete_asset_by_id(entity_info["id"])
                 print(f"The folder at {entity_dir} has been successfully deleted.")
             except Exception as e:
                 print(f"Error: {e}")
 
         elif entity_type == "sequence":
             # Get the Sequence path.
-            entity_info = self.db.get_sequence(name)
+            entity_info = self.cache.get_sequence(name)
             entity_path = entity_info["usd_path"]
             entity_dir = os.path.dirname(entity_path)
             entity_dir = entity_dir.replace('\\', '/')
 
             try:
                 shutil.rmtree(entity_dir)
-                self.db.delete_sequence(name)
+                self.layer_cache.invalidate(entity_dir)
+                self.db.delete_sequence_by_id(entity_info["id"])
                 print(f"The folder at {entity_dir} has been successfully deleted.")
             except Exception as e:
                 print(f"Error: {e}")
 
         elif entity_type == "shot":
             # Get the Sequence id from db.
-            sequence_info = self.db.get_sequence(seq_name)
+            sequence_info = self.cache.get_sequence(seq_name)
             sequence_id = sequence_info["id"]
             # Get the shot path from db.
-            entity_info = self.db.get_shot(sequence_id, name)
+            entity_info = self.cache.get_shot(sequence_id, name)
             entity_path = entity_info["usd_path"]
 
             entity_dir = os.path.dirname(entity_path)
@@ -250,7 +286,8 @@ class UsdManager:
 
             try:
                 shutil.rmtree(entity_dir)
-                self.db.delete_shot(name)
+                self.layer_cache.invalidate(entity_dir)
+                self.db.delete_shot_by_id(entity_info["id"])
                 print(f"The folder at {entity_dir} has been successfully deleted.")
             except Exception as e:
                 print(f"Error: {e}")
@@ -258,6 +295,18 @@ class UsdManager:
         else:
             return print("entity_type format incorrect. Usage: 'asset', 'sequence', 'shot'")
 
+    def delete_usd_entities(self, entity_type, names, seq_name=None):
+        """
+        Deletes several Usd entities of the same type, committing the database changes once.
+
+        :param entity_type: Either asset, sequence or shot.
+        :param names: The names of the entities to delete.
+        :param seq_name: Name of the parent sequence when deleting shots.
+        """
+        with self.db.transaction():
+            for name in names:
+                self.delete_usd_entity(entity_type, name, seq_name=seq_name)
+
 
     def create_usd_sublayer(self, entity_type, parent_name, sublayer_name, seq_name=None):
         """
@@ -269,20 +318,14 @@ class UsdManager:
         """
         if entity_type == "asset":
             # Get Asset Id from db.
-            entity_info = self.db.get_asset(parent_name)
+            entity_info = self.cache.get_asset(parent_name)
             entity_id = entity_info["id"]
             
             # Construct file path for Sublayer usd.
-            file_name = f"{parent_name}_{sublayer_name}.usda"
-            file_path = os.path.join(self.usd_assets_folder, parent_name, sublayer_name, file_name)
+            file_path = self.get_sublayer_path(entity_type, parent_name, sublayer_name)
 
             # Create the content of the sublayer usd.
-            stage = Usd.Stage.CreateNew(file_path)
-
-            root_prim = stage.DefinePrim("/root", "Xform")
-            stage.SetDefaultPrim(root_prim)
-
-            stage.GetRootLayer().Save()
+            self.layer_editor.create_layer(file_path)
 
             # Create new Department/sublayer in db.
             self.db.create_department(entity_type, entity_id, sublayer_name, file_path)
@@ -292,20 +335,14 @@ class UsdManager:
 
         elif entity_type == "sequence":
             # Get Sequence Id from db.
-            entity_info = self.db.get_sequence(parent_name)
+            entity_info = self.cache.get_sequence(parent_name)
             entity_id = entity_info["id"]
             
             # Construct file path for Sublayer usd.
-            file_name = f"{parent_name}_{sublayer_name}.usda"
-            file_path = os.path.join(self.usd_sequence_folder, parent_name, sublayer_name, file_name)
+            file_path = self.get_sublayer_path(entity_type, parent_name, sublayer_name)
 
             # Create the content of the sublayer usd.
-            stage = Usd.Stage.CreateNew(file_path)
-
-            root_prim = stage.DefinePrim("/root", "Xform")
-            stage.SetDefaultPrim(root_prim)
-
-            stage.GetRootLayer().Save()
+            self.layer_editor.create_layer(file_path)
 
             # Create new Department/sublayer in db.
             self.db.create_department(entity_type, entity_id, sublayer_name, file_path)
@@ -315,24 +352,18 @@ class UsdManager:
         
         elif entity_type == "shot":
             # Get Sequence Id from db.
-            sequence_info = self.db.get_sequence(seq_name)
+            sequence_info = self.cache.get_sequence(seq_name)
             sequence_id = sequence_info["id"]
 
-            entity_info = self.db.get_shot(sequence_id, parent_name)
+            entity_info = self.cache.get_shot(sequence_id, parent_name)
             entity_id = entity_info["id"]
 
             
             # Construct file path for Sublayer usd.
-            file_name = f"{parent_name}_{sublayer_name}.usda"
-            file_path = os.path.join(self.usd_shots_folder, parent_name, sublayer_name, file_name)
+            file_path = self.get_sublayer_path(entity_type, parent_name, sublayer_name, seq_name)
 
             # Create the content of the sublayer usd.
-            stage = Usd.Stage.CreateNew(file_path)
-
-            root_prim = stage.DefinePrim("/root", "Xform")
-            stage.SetDefaultPrim(root_prim)
-
-            stage.GetRootLayer().Save()
+            self.layer_editor.create_layer(file_path)
 
             # Create new Department/sublayer in db.
             self.db.create_department(entity_type, entity_id, sublayer_name, file_path)
@@ -342,6 +373,19 @@ class UsdManager:
         else:
             return print("entity_type format incorrect. Usage: 'asset', 'sequence', 'shot'")
 
+    def create_usd_sublayers(self, entity_type, parent_name, sublayer_names, seq_name=None):
+        """
+        Creates several departments under the same entity, committing the database changes and saving the entity layer once.
+
+        :param entity_type: Either asset, sequence or shot.
+        :param parent_name: The name of the entity the departments belong to.
+        :param sublayer_names: The names of the departments to create.
+        :param seq_name: Name of the parent sequence when the entity is a shot.
+        """
+        with self.edit_session():
+            for sublayer_name in sublayer_names:
+                self.create_usd_sublayer(entity_type, parent_name, sublayer_name, seq_name=seq_name)
+
     def edit_usd_sublayer(self, entity_type, parent_name, sublayer_name, action, seq_name=None, new_sublayer_path=None):
         """
         Edits a USD sublayer by adding, removing, or updating it.
@@ -357,18 +401,18 @@ class UsdManager:
         
         
         if entity_type == "asset":
-            entity_info = self.db.get_asset(parent_name)
+            entity_info = self.cache.get_asset(parent_name)
             entity_id = entity_info['id']
 
-            department_info = self.db.get_department("asset", entity_id, sublayer_name) 
+            department_info = self.cache.get_department("asset", entity_id, sublayer_name) 
         elif entity_type == "sequence":
-            entity_info = self.db.get_sequence(parent_name)
+            entity_info = self.cache.get_sequence(parent_name)
         elif entity_type == "shot" and seq_name:
-            seq_info = self.db.get_sequence(seq_name)
+            seq_info = self.cache.get_sequence(seq_name)
             if not seq_info:
                 print(f"Sequence '{seq_name}' not found.")
                 return
-            entity_info = self.db.get_shot(seq_info["id"], parent_name)
+            entity_info = self.cache.get_shot(seq_info["id"], parent_name)
         else:
             print("Invalid entity_type or missing sequence name for 'shot'.")
             return
@@ -379,93 +423,87 @@ class UsdManager:
 
         department_path = department_info["usd_path"]
 
-        department_file_dir = os.path.dirname(department_path)
-        relative_path = os.path.relpath(new_sublayer_path, department_file_dir)
-        relative_path = relative_path.replace('\\', '/')
-        relative_path = "./" + relative_path
-
-        # Perform the specified action
-        stage = Usd.Stage.Open(department_path)
-        root_layer = stage.GetRootLayer()
-
+        # Perform the specified action on the department layer only.
         if action == "add":
-            if sublayer_name not in root_layer.subLayerPaths:
-                root_layer.subLayerPaths.append(relative_path)
+            self.layer_editor.add_sublayer(department_path, new_sublayer_path, index=-1)
         elif action == "remove":
-            if sublayer_name in root_layer.subLayerPaths:
-                root_layer.subLayerPaths.remove(relative_path)
+            self.layer_editor.remove_sublayer(department_path, new_sublayer_path)
         elif action == "update" and new_sublayer_path:
-            try:
-                index = root_layer.subLayerPaths.index(relative_path)
-                root_layer.subLayerPaths[index] = relative_path
-            except ValueError:
+            if not self.layer_editor.replace_sublayer(department_path, new_sublayer_path, new_sublayer_path):
                 print(f"Sublayer '{sublayer_name}' not found in '{parent_name}'.")
                 return
         else:
             print("Invalid action or missing parameters.")
 
-        root_layer.Save()
-
     def delete_usd_sublayer(self, entity_type, parent_name, sublayer_name, seq_name=None):
         if entity_type == "asset":
             # Get the Asset USD id.
-            asset_info = self.db.get_asset(parent_name)
+            asset_info = self.cache.get_asset(parent_name)
             asset_id = asset_info['id']
 
             # Get the Sublayer dir.
-            sublayer_info = self.db.get_department("asset", asset_id, sublayer_name)
+            sublayer_info = self.cache.get_department("asset", asset_id, sublayer_name)
             sublayer_path = sublayer_info["usd_path"]
             sublayer_dir = os.path.dirname(sublayer_path)
             sublayer_dir = sublayer_dir.replace('\\', '/')
 
             try:
-                shutil.rmtree(sublayer_dir)
-                self.db.delete_department("asset", asset_id, sublayer_name)
+                self.remove_folder(sublayer_dir)
+                self.db.delete_department_by_id(sublayer_info["department_id"])
                 self.edit_usd_entity(entity_type, parent_name, "delete", sublayer_path)
                 print(f"The folder at {sublayer_name} has been successfully deleted.")
             except Exception as e:
+                # A session must not commit a half-deleted department.
+                if self._pending_removals is not None:
+                    raise
                 print(f"Error: {e}")
 
         elif entity_type == "sequence":
             # Get the Sequence id.
-            sequence_info = self.db.get_sequence(parent_name)
+            sequence_info = self.cache.get_sequence(parent_name)
             sequence_id = sequence_info["id"]
 
             # Get the Sublayer dir.
-            sublayer_info = self.db.get_department("sequence", sequence_id, sublayer_name)
+            sublayer_info = self.cache.get_department("sequence", sequence_id, sublayer_name)
             sublayer_path = sublayer_info["usd_path"]
             sublayer_dir = os.path.dirname(sublayer_path)
             sublayer_dir = sublayer_dir.replace('\\', '/')
 
             try:
-                shutil.rmtree(sublayer_dir)
-                self.db.delete_department("sequence", sequence_id, sublayer_name)
+                self.remove_folder(sublayer_dir)
+                self.db.delete_department_by_id(sublayer_info["department_id"])
                 self.edit_usd_entity(entity_type, parent_name, "delete", sublayer_path)
                 print(f"The folder at {sublayer_name} has been successfully deleted.")
             except Exception as e:
+                # A session must not commit a half-deleted department.
+                if self._pending_removals is not None:
+                    raise
                 print(f"Error: {e}")
 
         elif entity_type == "shot":
             # Get the Sequence id.
-            sequence_info = self.db.get_sequence(seq_name)
+            sequence_info = self.cache.get_sequence(seq_name)
             sequence_id = sequence_info["id"]
 
             # Get the Shot id.
-            shot_info = self.db.get_shot(sequence_id, parent_name)
+            shot_info = self.cache.get_shot(sequence_id, parent_name)
             shot_id = shot_info["id"]
 
             # Get the sublayer dir.
-            sublayer_info = self.db.get_department("shot", shot_id, sublayer_name)
+            sublayer_info = self.cache.get_department("shot", shot_id, sublayer_name)
             sublayer_path = sublayer_info["usd_path"]
             sublayer_dir = os.path.dirname(sublayer_path)
             sublayer_dir = sublayer_dir.replace('\\', '/')
 
             try:
-                shutil.rmtree(sublayer_dir)
-                self.db.delete_department("shot", shot_id, sublayer_name)
-                self.edit_usd_entity(entity_type, parent_name, "delete", sublayer_path)
+                self.remove_folder(sublayer_dir)
+                self.db.delete_department_by_id(sublayer_info["department_id"])
+                self.edit_usd_entity(entity_type, parent_name, "delete", sublayer_path, seq_name)
                 print(f"The folder at {sublayer_name} has been successfully deleted.")
             except Exception as e:
+                # A session must not commit a half-deleted department.
+                if self._pending_removals is not None:
+                    raise
                 print(f"Error: {e}")
         else:
             return print("entity_type format incorrect. Usage: 'asset', 'sequence', 'shot'")    
@@ -487,43 +525,25 @@ class UsdManager:
 
         stage.GetRootLayer().Save()
 
-        asset_info = self.db.get_asset(asset_name)
-        asset_id = asset_info['id']
-
-        department_info = self.db.get_department("asset", id_value=asset_id, department_name=department_name)
+        department_info = self.cache.resolve(asset_name, department_name)
         department_id = department_info['department_id']
 
         self.db.create_setVar(department_id, name, file_path)
         self.edit_usd_sublayer("asset", asset_name, department_name, "add", new_sublayer_path=file_path)
 
     def edit_usd_setVar(self, setVar_path, setVar_name, var_name, variantVersion_path=None):
-        stage = Usd.Stage.Open(setVar_path)
-        root_prim = stage.GetPrimAtPath('/root')
-        variant_sets = root_prim.GetVariantSets()
-
-        if variant_sets.HasVariantSet(setVar_name):
-            varSet = variant_sets.GetVariantSet(setVar_name)
-
-            if variantVersion_path is None:
-                # Add variant to varSet without modifying payloads
-                varSet.AddVariant(var_name)
-            else:
-                varSet.SetVariantSelection(var_name)
-
-                with varSet.GetVariantEditContext():
-                    # Construct the relative path for the payload
-                    setVar_dir = os.path.dirname(setVar_path)
-                    relative_var_path = os.path.relpath(variantVersion_path, setVar_dir)
-                    relative_var_path = relative_var_path.replace('\\', '/')
-                    relative_var_path = "./" + relative_var_path
-
-
-                    root_prim.GetPayloads().ClearPayloads()
-                    
-                    # Add new payload pointing to the relative_var_path
-                    root_prim.GetPayloads().AddPayload(relative_var_path)
-                    
-        stage.GetRootLayer().Save()
+        """
+        Adds a variant to the setVar layer, or points it to a published version and selects it.
+        The payloads of the variants are never loaded.
+
+        :param variantVersion_path: The version the variant payloads, None to add an empty variant.
+        """
+        if variantVersion_path is None:
+            # Add variant to varSet without modifying payloads
+            self.layer_editor.add_variant(setVar_path, "/root", setVar_name, var_name)
+        else:
+            # The payload is written relative to the setVar file.
+            self.layer_editor.set_variant_payload(setVar_path, "/root", setVar_name, var_name, variantVersion_path)
 
     def delete_usd_setVar(self, department_name, asset_name, setVar_name):
         """
@@ -533,47 +553,28 @@ class UsdManager:
         :param asset_name: Name of the asset the SetVar is associated with.
         :param setVar_name: Name of the SetVar to delete.
         """
-        # Retrieve asset and department information
-        asset_info = self.db.get_asset(asset_name)
-        if not asset_info:
-            print(f"No asset found with name {asset_name}")
-            return
-        asset_id = asset_info['id']
-
-        department_info = self.db.get_department("asset", asset_id, department_name)
-        if not department_info:
-            print(f"No department found with name {department_name} for asset {asset_name}")
-            return
-        department_id = department_info['department_id']
-
-        # Fetch SetVar to find the file path
-        setVar_info = self.db.get_setVar(department_id, setVar_name)
+        # Resolve asset, department and SetVar to find the file path
+        setVar_info = self.cache.resolve(asset_name, department_name, setVar_name)
         if not setVar_info:
-            print(f"No SetVar found with name {setVar_name} in department {department_name}")
+            print(f"No SetVar found with name {setVar_name} in department {department_name} for asset {asset_name}")
             return
 
-        setVar_path = setVar_info['usd_path']
+        setVar_path = setVar_info['setVar_path']
         setVar_dir = os.path.dirname(setVar_path)
 
         # Remove the directory and delete the database entry
         try:
             shutil.rmtree(setVar_dir)
-            self.db.delete_setVar(setVar_name)
+            self.layer_cache.invalidate(setVar_dir)
+            self.db.delete_setVar_by_id(setVar_info['setVar_id'])
             print(f"SetVar {setVar_name} and its directory have been successfully deleted.")
         except Exception as e:
             print(f"Error deleting SetVar {setVar_name}: {e}")
 
 
     def create_variant(self, setVar_name, asset_name, name, department_name):
-        asset_info = self.db.get_asset(asset_name)
-        asset_id = asset_info['id']
-        
-        department_info = self.db.get_department("asset", id_value=asset_id, department_name=department_name)
-        department_id = department_info['department_id']
-        
-
-        setVar_info = self.db.get_setVar(department_id, setVar_name)
-        setVar_path = setVar_info['usd_path']
+        setVar_info = self.cache.resolve(asset_name, department_name, setVar_name)
+        setVar_path = setVar_info['setVar_path']
         setVar_id = setVar_info['setVar_id']
 
         self.db.create_variant(setVar_id, name)
@@ -597,29 +598,11 @@ class UsdManager:
             return
 
         setVar_path = setVar_info['usd_path']
-        stage = Usd.Stage.Open(setVar_path)
-        root_prim = stage.GetPrimAtPath('/root')
-        variant_sets = root_prim.GetVariantSets()
 
-        if not variant_sets.HasVariantSet(setVar_name):
-            print(f"VariantSet '{setVar_name}' not found.")
-            return
-
-        variant_set = variant_sets.GetVariantSet(setVar_name)
         if action == "update_payload" and new_payload_path:
-            if variant_set.HasVariant(variant_name):
-                variant_set.SetVariantSelection(variant_name)
-                with variant_set.GetVariantEditContext():
-                    # Assuming the variant primarily uses a payload to reference content
-                    root_prim.GetPayloads().ClearPayloads()
-                    root_prim.GetPayloads().AddPayload(new_payload_path)
-            else:
+            # Assuming the variant primarily uses a payload to reference content
+            if not self.layer_editor.set_variant_payload(setVar_path, "/root", setVar_name, variant_name, new_payload_path, create=False):
                 print(f"Variant '{variant_name}' not found in SetVar '{setVar_name}'.")
-        else:
-            pass
-            
-
-        stage.GetRootLayer().Save()
 
     def delete_variant(self, setVar_name, variant_name):
         """
@@ -646,7 +629,8 @@ class UsdManager:
         # Remove the directory and delete the database entry
         try:
             shutil.rmtree(variant_dir)
-            self.db.delete_variant(variant_name)
+            self.layer_cache.invalidate(variant_dir)
+            self.db.delete_variant_by_id(variant_info['var_id'])
             print(f"Variant {variant_name} and its directory have been successfully deleted.")
         except Exception as e:
             print(f"Error deleting variant {variant_name}: {e}")
@@ -655,49 +639,34 @@ class UsdManager:
     def create_usd_variantVersion(self, asset_name, department_name, setVar_name, var_name, comment):
         if running_in_maya:
             # Calculate Version.
-            # Fetch all variants for the setVar_id from the database
-            asset_info = self.db.get_asset(asset_name)
-            asset_id = asset_info['id']
-            
-            department_info = self.db.get_department("asset", id_value=asset_id, department_name=department_name)
-            department_id = department_info['department_id']
-
-            setVar_info = self.db.get_setVar(department_id, setVar_name)
-            setVar_id = setVar_info['setVar_id']
-            setVar_path = setVar_info['usd_path']
-
-            print("variant_info:", setVar_id, var_name)
-            variant_info = self.db.get_variant(setVar_id, var_name)
-            
+            # Resolve the variant and its setVar from the database in one query
+            variant_info = self.cache.resolve(asset_name, department_name, setVar_name, var_name)
+            setVar_path = variant_info['setVar_path']
             variant_id = variant_info['var_id']
 
-            variantVersions = self.db.get_variantVersion(id_type="variant", id_value=variant_id, all=True)
-            
-            # Find the highest version
-            highest_version = 0
-            for variantVersion in variantVersions:
-                version_int = int(variantVersion['version'])  # Convert version string to integer
-                if version_int > highest_version:
-                    highest_version = version_int
-            
-            # Assign the next number to version
-            version = highest_version + 1
+            # Reserve the next version number, safe against other artists publishing the same variant.
+            variantVersion_id, version = self.db.reserve_variantVersion(id_type="variant", id_value=variant_id)
             version_str = f"{version:03}"
             
             file_name = f"{setVar_name}_{department_name}_{asset_name}_{var_name}_{version_str}.usda"
             file_path = os.path.join(self.usd_fragment_folder, setVar_name, department_name, asset_name, var_name, file_name)
 
-            
-
-            self.publish_variant.export_to_usd(file_path)
+            try:
+                self.publish_variant.export_to_usd(file_path)
+            except Exception:
+                self.db.delete_usdVersion(variantVersion_id)
+                raise
+
+            if not os.path.exists(file_path):
+                # Release the reserved version so the number can be reused.
+                self.db.delete_usdVersion(variantVersion_id)
+                print(f"Publish failed, {file_path} was not written.")
+                return
 
-            if os.path.exists(file_path):
-                        timestamp = os.path.getmtime(file_path)
-                        timestamp_date = datetime.datetime.fromtimestamp(timestamp)
-                        date = timestamp_date.strftime("%d-%m-%Y %H:%M:%S")
+            date = self.db.format_timestamp(os.path.getmtime(file_path))
 
             snapshot = self.maya_utils.capture_snapshot()
-            self.db.create_variantVersion(id_type="variant", id_value=variant_id, version=version, comment=comment, date=date, usd_path=file_path, snapshot=snapshot)
+            self.db.finalize_variantVersion(variantVersion_id, comment=comment, date=date, usd_path=file_path, snapshot=snapshot)
 
             self.edit_usd_setVar(setVar_path=setVar_path, setVar_name=setVar_name, var_name=var_name, variantVersion_path=file_path)
 
@@ -709,21 +678,8 @@ class UsdManager:
 
 
     def set_default_variant(self, default_variant, asset_name, department_name, setVar_name):
-        asset_info = self.db.get_asset(asset_name)
-        asset_id = asset_info['id']
-
-        department_info = self.db.get_department("asset", asset_id, department_name)
-        department_id = department_info['department_id']
-
-        setVar_info = self.db.get_setVar(department_id, setVar_name)
-        setVar_id = setVar_info['setVar_id']
-        setVar_path = setVar_info['usd_path']
-
-        stage = Usd.Stage.Open(setVar_path)
-        
-        root = stage.GetPrimAtPath("/root")
-        variant_set = root.GetVariantSets().GetVariantSet(setVar_name)
-        variant_set.SetVariantSelection(default_variant)
+        setVar_info = self.cache.resolve(asset_name, department_name, setVar_name)
+        setVar_path = setVar_info['setVar_path']
 
-        stage.Save()
+        self.layer_editor.set_variant_selection(setVar_path, "/root", setVar_name, default_variant)
         return True
\ No newline at end of file
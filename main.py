@@ -1,10 +1,11 @@
-from ui import MainWindow, SceneFileItemWidget, UsdFileItemWidget
-from lib import ProjectDataBase, UsdManager, FileManager
+from ui import MainWindow, SceneFileItemWidget, UsdFileItemWidget, DataBaseResultRelay
+from lib import ProjectDataBase, ProjectCache, UsdManager, FileManager, DataBaseExecutor
 from PySide2.QtWidgets import *
 from PySide2.QtCore import Qt
 from PySide2.QtGui import QIcon
 from PySide2.QtCore import QTimer
 from pathlib import Path
+import bisect
 import sys
 import os
 
@@ -12,144 +13,10 @@ import os
 # Initializing project global variable.
 project = None
 
-class ProjectData:
-    """
-    Main class that caches the database information to be used in the lists.
-
-    """
-    def __init__(self, db_path):
-        self.db = ProjectDataBase(db_path)
-
-        self.assets_cache = {}
-        self.asset_departments_cache = {}
-        self.setVars_cache = {}
-        self.variants_cache = {}
-        self.variant_usds_cache = {}
-        
-        self.sequences_cache = {}
-        self.sequence_departments_cache = {}
-
-        self.shots_cache = {}
-        self.shot_departments_cache = {}
-
-        self.tasks_cache = {}
-        self.files_cache = {}
-        self.sublayer_usds_cache = {}
-
-    def get_assets(self):
-        if not self.assets_cache:
-            assets = self.db.get_asset(all=True)
-            self.assets_cache = {asset['name']: asset for asset in assets}
-        return self.assets_cache
-    
-    def get_asset_departments(self, asset_id):
-        # Cache by asset_id, not globally
-        if asset_id not in self.asset_departments_cache:
-            departments = self.db.get_department("asset", asset_id, all=True)
-            self.asset_departments_cache[asset_id] = {department['name']: department for department in departments}
-        return self.asset_departments_cache.get(asset_id, {})
-    
-    def get_setVars(self, department_id):
-        # Cache by department_id, not globally
-        if department_id not in self.setVars_cache:
-            setVars = self.db.get_setVar(department_id, all=True)
-            self.setVars_cache[department_id] = {setVar['name']: setVar for setVar in setVars}
-        return self.setVars_cache.get(department_id, {})
-
-    def get_variants(self, setVar_id):
-        # Cache by setVar_id, not globally
-        if setVar_id not in self.variants_cache:
-            variants = self.db.get_variant(setVar_id, all=True)
-            self.variants_cache[setVar_id] = {variant['name']: variant for variant in variants}
-        return self.variants_cache.get(setVar_id, {})
-
-    def get_variant_usds(self, variant_id):
-        # Cache by variant_id, not globally
-        if variant_id not in self.variant_usds_cache:
-            variant_usds = self.db.get_variantVersion('variant', variant_id, all=True)
-            self.variant_usds_cache[variant_id] = {variant_usd['version']: variant_usd for variant_usd in variant_usds}
-        return self.variant_usds_cache.get(variant_id, {})
-    
-    def get_sequences(self):
-        if not self.sequences_cache:
-            sequences = self.db.get_sequence(all=True)
-            self.sequences_cache = {sequence['name']: sequence for sequence in sequences}
-        return self.sequences_cache
-    
-    def get_sequence_departments(self, sequence_id):
-        if sequence_id not in self.sequence_departments_cache:
-            departments = self.db.get_department("sequence", sequence_id, all=True)
-            self.sequence_departments_cache[sequence_id] = {department['name']: department for department in departments}
-        return self.sequence_departments_cache.get(sequence_id, {})
-    
-    def get_files(self, task_id):
-        if task_id not in self.files_cache:
-            files = self.db.get_file(task_id, all=True)
-            self.files_cache[task_id] = {file['version']: file for file in files}
-        return self.files_cache.get(task_id, {})
-
-    def get_shots(self, sequence_id):
-        if sequence_id not in self.shots_cache:
-            shots = self.db.get_shot(sequence_id, all=True)
-            self.shots_cache[sequence_id] = {shot['name']: shot for shot in shots}
-        return self.shots_cache.get(sequence_id, {})
-
-    def get_tasks(self, department_id):
-        if department_id not in self.tasks_cache:
-            tasks = self.db.get_task(department_id, all=True)
-            self.tasks_cache[department_id] = {task['name']: task for task in tasks}
-        return self.tasks_cache.get(department_id, {})
-
-    def get_sublayer_usds(self, department_id):
-        # Cache by variant_id, not globally
-        if department_id not in self.sublayer_usds_cache:
-            sublayer_usds = self.db.get_variantVersion('department', department_id, all=True)
-            self.sublayer_usds_cache[department_id] = {sublayer_usd['version']: sublayer_usd for sublayer_usd in sublayer_usds}
-        return self.sublayer_usds_cache.get(department_id, {})
-    
-    def clear_cache(self, entity_type=None):
-        if entity_type is None:
-            # Clear all caches
-            self.assets_cache = {}
-            self.asset_departments_cache = {}
-            self.setVars_cache = {}
-            self.variants_cache = {}
-            self.variant_usds_cache = {}
-            self.sequences_cache = {}
-            self.sequence_departments_cache = {}
-            self.shots_cache = {}
-            self.shot_departments_cache = {}
-            self.tasks_cache = {}
-            self.files_cache = {}
-            self.sublayer_usds_cache = {}
-        else:
-            # Clear specific cache
-            if entity_type == "assets":
-                self.assets_cache = {}
-            elif entity_type == "asset_departments":
-                self.asset_departments_cache = {}
-            elif entity_type == "setVars":
-                self.setVars_cache = {}
-            elif entity_type == "variants":
-                self.variants_cache = {}
-            elif entity_type == "variant_usds":
-                self.variant_usds_cache = {}
-            elif entity_type == "sequences":
-                self.sequences_cache = {}
-            elif entity_type == "sequence_departments":
-                self.sequence_departments_cache = {}
-            elif entity_type == "shots":
-                self.shots_cache = {}
-            elif entity_type == "shot_departments":
-                self.shot_departments_cache = {}
-            elif entity_type == "tasks":
-                self.tasks_cache = {}
-            elif entity_type == "files":
-                self.files_cache = {}
-            elif entity_type == "sublayer_usds":
-                self.sublayer_usds_cache = {}
-
 class MercuryWindow:
+    # Versions loaded per page in the version trees, older pages load when the tree is scrolled to the bottom.
+    versions_page_size = 50
+
     def __init__(self):
         """
         Initialize the MercuryWindow application.
@@ -182,13 +49,32 @@ class MercuryWindow:
             self.project = project
             db_path = os.path.join(self.project, "pipeline", "project.db")
             self.db = ProjectDataBase(db_path)
-            self.db_cache = ProjectData(db_path)
+            self.db_cache = ProjectCache(self.db)
+
+            # Lists are filled from a background thread, the relay brings the results back to the UI thread.
+            self.db_executor = DataBaseExecutor()
+            self.db_relay = DataBaseResultRelay(self.db_executor)
+            self.app.aboutToQuit.connect(self.db_executor.shutdown)
+
+            # Load the project skeleton up front, the lists are then filled from memory as the artist browses.
+            self.db_executor.submit("tree", self.db_cache.prefetch)
+
+            # Version lists on screen, refreshed when another artist publishes or saves into them.
+            self.shown_usds = None
+            self.current_usds = None
+            self.shown_files = None
+            self.usds_more = False
+            self.files_more = False
+            self.changes_timer = QTimer()
+            self.changes_timer.timeout.connect(self.poll_changes)
+            self.changes_timer.start(2000)
         else:
             self.main_window.status_bar.showMessage("Project not set. User cancelled or no directory returned.", 5000)
         
         # Calling instance of UsdManager and FileManager.
-        self.um = UsdManager(project)
-        self.fm = FileManager(project)
+        # Both managers read through the cache of the lists, a publish reuses the rows the artist just browsed.
+        self.um = UsdManager(project, cache=self.db_cache)
+        self.fm = FileManager(project, cache=self.db_cache)
 
         # Setting Comments QLineEdits first.
         self.scene_files_comment_QLineEdit = self.main_window.findChild(QLineEdit, "scene_files_comment_QLineEdit")
@@ -209,6 +95,16 @@ class MercuryWindow:
         self.publish_version_QPushButton = self.main_window.findChild(QPushButton, "publish_version_QPushButton")
         self.publish_version_QPushButton.clicked.connect(self.on_publish_version_button_clicked)
 
+        # Search box, the query runs once the artist stops typing.
+        self.search_QLineEdit = self.main_window.findChild(QLineEdit, "search_QLineEdit")
+        self.search_results_QListWidget = self.main_window.findChild(QListWidget, "search_results_QListWidget")
+        self.search_timer = QTimer()
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_QLineEdit.textChanged.connect(self.search_timer.start)
+        self.search_results_QListWidget.itemClicked.connect(self.on_search_result_clicked)
+
         
         self.create_menu_bar()
         self.setup_scene_files_connections()
@@ -274,10 +170,12 @@ class MercuryWindow:
         self.scene_files_shots_files_QtreeWidget = self.main_window.findChild(QTreeWidget, "scene_files_shots_files_QtreeWidget")
         self.scene_files_shots_files_QtreeWidget.setContextMenuPolicy(Qt.CustomContextMenu)
         self.scene_files_shots_files_QtreeWidget.customContextMenuRequested.connect(lambda point: self.on_context_menu(point=point, context="files", type="shots"))
+        self.scene_files_shots_files_QtreeWidget.verticalScrollBar().valueChanged.connect(lambda value: self.load_more_versions("files", "shots"))
         # Assets-Files QTreeList
         self.scene_files_assets_files_QtreeWidget = self.main_window.findChild(QTreeWidget, "scene_files_assets_files_QtreeWidget")
         self.scene_files_assets_files_QtreeWidget.setContextMenuPolicy(Qt.CustomContextMenu)
         self.scene_files_assets_files_QtreeWidget.customContextMenuRequested.connect(lambda point: self.on_context_menu(point=point, context="files", type="assets"))
+        self.scene_files_assets_files_QtreeWidget.verticalScrollBar().valueChanged.connect(lambda value: self.load_more_versions("files", "assets"))
 
     def setup_usd_config_connections(self):
         """
@@ -335,10 +233,12 @@ class MercuryWindow:
 
         # Shots-Files QTreeList
         self.usd_config_shots_variantVersions_QtreeWidget = self.main_window.findChild(QTreeWidget, "usd_config_shots_variantVersions_QtreeWidget")
+        self.usd_config_shots_variantVersions_QtreeWidget.verticalScrollBar().valueChanged.connect(lambda value: self.load_more_versions("usds", "shots"))
         # Assets-variantVersions QTreeList
         self.usd_config_assets_variantVersions_QtreeWidget = self.main_window.findChild(QTreeWidget, "usd_config_assets_variantVersions_QtreeWidget")
         self.usd_config_assets_variantVersions_QtreeWidget.setContextMenuPolicy(Qt.CustomContextMenu)
         self.usd_config_assets_variantVersions_QtreeWidget.customContextMenuRequested.connect(lambda point: self.on_context_menu(point=point, context="variantVersion", type="assets"))
+        self.usd_config_assets_variantVersions_QtreeWidget.verticalScrollBar().valueChanged.connect(lambda value: self.load_more_versions("usds", "assets"))
         
         self.usd_config_assets_QPushButton.click()
         self.scene_files_assets_QPushButton.click()
@@ -366,8 +266,6 @@ class MercuryWindow:
         Populate the shots list in the UI.
         
         """
-        self.db_cache.clear_cache("shots")
-        self.db_cache.clear_cache("sequences")
 
         self.clear_lists(context, "shots", 0)
 
@@ -376,17 +274,25 @@ class MercuryWindow:
         else:
             selected_list = self.usd_config_shots_QtreeWidget
 
-    
-        # Gets all sequences and shots and adds them as items to the QTreeWidget
-        self.sequences = self.db_cache.get_sequences()
+        def fetch():
+            # Gets all sequences and their shots on the database thread.
+            sequences = self.db_cache.get_sequences()
+            shots = {name: self.db_cache.get_shots(sequence_info['id']) for name, sequence_info in sequences.items()}
+            return sequences, shots
+
+        def render(result):
+            # Adds the sequences and shots as items to the QTreeWidget.
+            self.sequences, shots = result
 
-        for sequence_info in self.sequences:
-            sequence_item = QTreeWidgetItem(selected_list, [sequence_info['name']])
+            for sequence_info in self.sequences.values():
+                sequence_item = QTreeWidgetItem(selected_list, [sequence_info['name']])
 
-            self.shots = self.db_cache.get_shots(sequence_info['id'])
+                self.shots = shots[sequence_info['name']]
 
-            for shot_info in self.shots:
-                QTreeWidgetItem(sequence_item, [shot_info['name']])
+                for shot_info in self.shots.values():
+                    QTreeWidgetItem(sequence_item, [shot_info['name']])
+
+        self.fetch_async(selected_list, fetch, render)
 
     def populate_assets_list(self, context):
         """
@@ -394,32 +300,34 @@ class MercuryWindow:
         
         """
         self.clear_lists(context, "assets", 0)
-        self.db_cache.clear_cache("assets")
 
         selected_list = self.scene_files_assets_QtreeWidget if context == "sceneFiles" else self.usd_config_assets_QtreeWidget
-        
-        # Gets all sequences and shots and adds them as items to the QTreeWidget.
-        self.assets = self.db_cache.get_assets()
-
-        type_parent_items = {}
-
-        for asset_info in self.assets.values():
-            asset_type = asset_info['type']
-            asset_name = asset_info['name']
-
-            # Check if the asset type category already exists.
-            if asset_type not in type_parent_items:
-                # Create a new parent item for the new asset type.
-                parent_item = QTreeWidgetItem(selected_list, [asset_type])
-                parent_item_icon = self.get_icons("asset", "type")
-                parent_item.setIcon(0, parent_item_icon)
-                type_parent_items[asset_type] = parent_item
-            else:
-                # Retrieve the existing parent item.
-                parent_item = type_parent_items[asset_type]
 
-            # Add the current asset as a child to the corresponding asset type category.
-            QTreeWidgetItem(parent_item, [asset_name])
+        def render(assets):
+            # Adds the assets as items to the QTreeWidget, grouped by type.
+            self.assets = assets
+
+            type_parent_items = {}
+
+            for asset_info in self.assets.values():
+                asset_type = asset_info['type']
+                asset_name = asset_info['name']
+
+                # Check if the asset type category already exists.
+                if asset_type not in type_parent_items:
+                    # Create a new parent item for the new asset type.
+                    parent_item = QTreeWidgetItem(selected_list, [asset_type])
+                    parent_item_icon = self.get_icons("asset", "type")
+                    parent_item.setIcon(0, parent_item_icon)
+                    type_parent_items[asset_type] = parent_item
+                else:
+                    # Retrieve the existing parent item.
+                    parent_item = type_parent_items[asset_type]
+
+                # Add the current asset as a child to the corresponding asset type category.
+                QTreeWidgetItem(parent_item, [asset_name])
+
+        self.fetch_async(selected_list, self.db_cache.get_assets, render)
      
     # /SHARED Second List.
     def populate_departments_list(self, context, type):
@@ -440,14 +348,18 @@ class MercuryWindow:
                 selected_text = shot_selected_item.text(0)
 
                 if shot_selected_item.parent() is None:
-                    self.db_cache.clear_cache("sequence_departments")
 
                     self.is_sequence = True
                     sequence_name = self.sequences.get(selected_text)
-                    self.departments = self.db_cache.get_sequence_departments(sequence_name['id'])
-                    for department_info in self.departments:
-                        
-                        self.scene_files_shots_department_QListWidget.addItem(department_info['name'])
+
+                    def render(departments):
+                        self.departments = departments
+                        for department_info in self.departments.values():
+                            
+                            self.scene_files_shots_department_QListWidget.addItem(department_info['name'])
+
+                    self.fetch_async(self.scene_files_shots_department_QListWidget,
+                                     lambda: self.db_cache.get_sequence_departments(sequence_name['id']), render)
 
                     ## CREATING SEQUENCE SELECTION.
 
@@ -455,19 +367,23 @@ class MercuryWindow:
                     self.sequence_name = self.sequence_item.item(0)
 
                 else:
-                    self.db_cache.clear_cache("shot_departments")
 
                     self.is_sequence = False
                     selected_item_parent = shot_selected_item.parent()
                     selected_parent_text = selected_item_parent.text(0)
                     sequence_info = self.sequences.get(selected_parent_text)
 
-                    self.shots = self.db_cache.get_shots(sequence_info['id'])
-                    shot_info = self.shots.get(selected_text)
+                    def fetch():
+                        shots = self.db_cache.get_shots(sequence_info['id'])
+                        shot_info = shots.get(selected_text)
+                        return shots, self.db_cache.get_shot_departments(shot_info['id'])
 
-                    self.departments = self.db_cache.get_shot_departments(shot_info['id'])
-                    for department_info in self.departments:
-                        self.scene_files_shots_department_QListWidget.addItem(department_info['name'])
+                    def render(result):
+                        self.shots, self.departments = result
+                        for department_info in self.departments.values():
+                            self.scene_files_shots_department_QListWidget.addItem(department_info['name'])
+
+                    self.fetch_async(self.scene_files_shots_department_QListWidget, fetch, render)
                     
                     ## CREATING SHOT SELECTION.
 
@@ -479,20 +395,24 @@ class MercuryWindow:
 
             if type == "assets" and asset_selected_parent is not None:
                 self.clear_lists(context, type, 1)
-                self.db_cache.clear_cache("asset_departments")
 
                 selected_text = asset_selected_item.text(0)
                 asset_name = self.assets.get(selected_text)
-                self.departments = self.db_cache.get_asset_departments(asset_name['id'])
+
+                def render(departments):
+                    self.departments = departments
                 
-                for department_key, department_value in self.departments.items():
-                    department_item_name = department_value['name']
-                    list_item = QListWidgetItem(department_item_name)
+                    for department_key, department_value in self.departments.items():
+                        department_item_name = department_value['name']
+                        list_item = QListWidgetItem(department_item_name)
+
+                        icon = self.get_icons("department", department_item_name)
+                        list_item.setIcon(icon)  # Set the icon.
 
-                    icon = self.get_icons("department", department_item_name)
-                    list_item.setIcon(icon)  # Set the icon.
+                        self.scene_files_assets_department_QListWidget.insertItem(0, list_item)
 
-                    self.scene_files_assets_department_QListWidget.insertItem(0, list_item)
+                self.fetch_async(self.scene_files_assets_department_QListWidget,
+                                 lambda: self.db_cache.get_asset_departments(asset_name['id']), render)
 
                 ## CREATING ASSET SELECTION.
                 self.asset_item = self.scene_files_assets_QtreeWidget.currentItem()
@@ -508,13 +428,17 @@ class MercuryWindow:
                 selected_text = shot_selected_item.text(0)
 
                 if shot_selected_item.parent() is None:
-                    self.db_cache.clear_cache("sequence_departments")
 
                     sequence_name = self.sequences.get(selected_text)
-                    self.departments = self.db_cache.get_sequence_departments(sequence_name['id'])
-                    for department_key, department_value in self.departments.items():
-                        department_item = department_value['name']
-                        self.scene_files_assets_department_QListWidget.addItem(department_item)
+
+                    def render(departments):
+                        self.departments = departments
+                        for department_key, department_value in self.departments.items():
+                            department_item = department_value['name']
+                            self.scene_files_assets_department_QListWidget.addItem(department_item)
+
+                    self.fetch_async(self.usd_config_shots_department_QListWidget,
+                                     lambda: self.db_cache.get_sequence_departments(sequence_name['id']), render)
                     
                     ## CREATING SEQUENCE SELECTION.
 
@@ -522,19 +446,23 @@ class MercuryWindow:
                     self.sequence_name = self.sequence_item.item(0)
 
                 else:
-                    self.db_cache.clear_cache("shot_departments")
 
                     selected_item_parent = shot_selected_item.parent()
                     selected_parent_text = selected_item_parent.text(0)
                     sequence_info = self.sequences.get(selected_parent_text)
 
-                    self.shots = self.db_cache.get_shots(sequence_info['id'])
-                    shot_info = self.shots.get(selected_text)
+                    def fetch():
+                        shots = self.db_cache.get_shots(sequence_info['id'])
+                        shot_info = shots.get(selected_text)
+                        return shots, self.db_cache.get_shot_departments(shot_info['id'])
 
-                    self.departments = self.db_cache.get_shot_departments(shot_info['id'])
-                    for department_key, department_value in self.departments.items():
-                        department_item = department_value['name']
-                        self.scene_files_assets_department_QListWidget.addItem(department_item)
+                    def render(result):
+                        self.shots, self.departments = result
+                        for department_key, department_value in self.departments.items():
+                            department_item = department_value['name']
+                            self.scene_files_assets_department_QListWidget.addItem(department_item)
+
+                    self.fetch_async(self.usd_config_shots_department_QListWidget, fetch, render)
                     
                     ## CREATING SHOT SELECTION.
 
@@ -546,18 +474,22 @@ class MercuryWindow:
 
             if type == "assets" and asset_selected_parent is not None:
                 self.clear_lists(context, type, 1)
-                self.db_cache.clear_cache("asset_departments")
 
                 selected_text = asset_selected_item.text(0)
                 asset_name = self.assets.get(selected_text)
-                self.departments = self.db_cache.get_asset_departments(asset_name['id'])
 
-                for department_key, department_value in self.departments.items():
-                    department_item_name = department_value['name']
-                    list_item = QListWidgetItem(department_item_name)
-                    icon = self.get_icons("department", department_item_name)
-                    list_item.setIcon(icon)  # Set the icon.
-                    self.usd_config_assets_department_QListWidget.insertItem(0, list_item)  # Insert the item.
+                def render(departments):
+                    self.departments = departments
+
+                    for department_key, department_value in self.departments.items():
+                        department_item_name = department_value['name']
+                        list_item = QListWidgetItem(department_item_name)
+                        icon = self.get_icons("department", department_item_name)
+                        list_item.setIcon(icon)  # Set the icon.
+                        self.usd_config_assets_department_QListWidget.insertItem(0, list_item)  # Insert the item.
+
+                self.fetch_async(self.usd_config_assets_department_QListWidget,
+                                 lambda: self.db_cache.get_asset_departments(asset_name['id']), render)
 
                 ## CREATING ASSET SELECTION.
                 self.asset_item = self.usd_config_assets_QtreeWidget.currentItem()
@@ -571,8 +503,7 @@ class MercuryWindow:
         :param context: "sceneFiles" - "usdConfig"
         :logic: CACHE/WIDGETS/CREATE_ITEMS/FETCH_INFO/POPULATE
         """
-        # Clear cache and list selections.
-        self.db_cache.clear_cache("setVars")
+        # Clear list selections.
         self.clear_lists("usdConfig", "assets", 2)
 
         # Determine the appropriate widgets based on context.
@@ -592,16 +523,19 @@ class MercuryWindow:
             print(f"Failed to retrieve valid setVar data for department: {self.department_name}")
             return
 
-        # Get setVars from Department selection.
-        self.setVars = self.db_cache.get_setVars(setVar_name['department_id'])
-        if not self.setVars:
-            print(f"No setVars found for department ID: {setVar_name['department_id']}")
-            return
+        def render(setVars):
+            self.setVars = setVars
+            if not self.setVars:
+                print(f"No setVars found for department ID: {setVar_name['department_id']}")
+                return
+
+            # Populate list with SetVar Items.
+            for setVar_key, setVar_value in self.setVars.items():
+                setVar_item = setVar_value['name']
+                setVar_widget.addItem(setVar_item)  # Use the widget determined by the context
 
-        # Populate list with SetVar Items.
-        for setVar_key, setVar_value in self.setVars.items():
-            setVar_item = setVar_value['name']
-            setVar_widget.addItem(setVar_item)  # Use the widget determined by the context
+        # Get setVars from Department selection.
+        self.fetch_async(setVar_widget, lambda: self.db_cache.get_setVars(setVar_name['department_id']), render)
             
     # /SHARED Fourth List.
     def populate_variants_list(self):
@@ -611,8 +545,7 @@ class MercuryWindow:
         :param context: "sceneFiles" - "usdConfig"
         :logic: CACHE/WIDGETS/CREATE_ITEMS/FETCH_INFO/POPULATE
         """
-        # Clear cache and list selections.
-        self.db_cache.clear_cache("variants")
+        # Clear list selections.
         self.clear_lists("usdConfig", "assets", 3)
 
         # Determine the appropriate widgets based on context.
@@ -631,15 +564,19 @@ class MercuryWindow:
         if not variant_name:
             print(f"Failed to retrieve valid variant data for setVar: {self.setVar_name}")
             return
-        self.variants = self.db_cache.get_variants(variant_name['setVar_id'])
-        if not self.variants:
-            print(f"No setVars found for department ID: {variant_name['setVar_id']}")
-            return
-        
-        # Populate list with variant Items.
-        for variant_key, variant_value in self.variants.items():
-            variant_item = variant_value['name']
-            variant_widget.addItem(variant_item)
+
+        def render(variants):
+            self.variants = variants
+            if not self.variants:
+                print(f"No setVars found for department ID: {variant_name['setVar_id']}")
+                return
+            
+            # Populate list with variant Items.
+            for variant_key, variant_value in self.variants.items():
+                variant_item = variant_value['name']
+                variant_widget.addItem(variant_item)
+
+        self.fetch_async(variant_widget, lambda: self.db_cache.get_variants(variant_name['setVar_id']), render)
             
     # /SCENE_FILES SPECIFIC.
     def populate_tasks_list(self, type):
@@ -650,7 +587,6 @@ class MercuryWindow:
         """
         # Clear list selection.
         self.clear_lists("sceneFiles", type, 4) if type == "shots" else self.clear_lists("sceneFiles", type, 2)
-        self.db_cache.clear_cache("tasks")
 
         # Determine the appropriate widgets based on context.
         selected_widget = self.scene_files_shots_department_QListWidget if type == "shots" else self.scene_files_assets_department_QListWidget
@@ -670,14 +606,17 @@ class MercuryWindow:
         if not task_name:
             print(f"Failed to retrieve valid task data for Department: {self.department_name}")
             return
-        
-        # Clear Cache and get task from Department selection.
-        self.tasks = self.db_cache.get_tasks(task_name['department_id'])
 
-        # Populate Task list.
-        for task_key, task_value in self.tasks.items():
-            task_item = task_value['name']
-            task_widget.addItem(task_item)
+        def render(tasks):
+            self.tasks = tasks
+
+            # Populate Task list.
+            for task_key, task_value in self.tasks.items():
+                task_item = task_value['name']
+                task_widget.addItem(task_item)
+        
+        # Get task from Department selection.
+        self.fetch_async(task_widget, lambda: self.db_cache.get_tasks(task_name['department_id']), render)
 
     def populate_files_list(self, type):
         """
@@ -686,7 +625,6 @@ class MercuryWindow:
         :param type: "shots" - "assets"
         """
         self.clear_lists("sceneFiles", type, 3)
-        self.db_cache.clear_cache("files")
 
         # Determine the appropriate widgets based on context.
         task_widget = self.scene_files_shots_task_QListWidget if type == "shots" else self.scene_files_assets_task_QListWidget
@@ -705,27 +643,61 @@ class MercuryWindow:
             print(f"Failed to retrieve valid file data for Task: {self.task_name}")
             return
 
-        
-        self.files = self.db_cache.get_files(file_name['task_id'])
-        if not self.files:
-                    print(f"No Files found for Task ID: {file_name['task_id']}")
-                    return
-        
-        # Extract sqlite3.Row objects into a list.
-        files_list = list(self.files.values())
-        sorted_files = sorted(files_list, key=lambda x: x['version'], reverse=True)
-
-        for file_info in sorted_files:
-            version = f"{file_info['version']:03}"
-            comment = file_info['comment'] if file_info['comment'] is not None else ""
-            type = file_info['file_type'] if file_info['file_type'] is not None else ""
-            date = file_info['date'] if file_info['date'] is not None else ""
-            # user = file['user'] if file['user'] is not None else ""
-            snapshot = file_info['snapshot'] if file_info['snapshot'] is not None else ""
-
-            tree_item = QTreeWidgetItem(file_widget)
-            custom_widget = SceneFileItemWidget(version, type, comment, user="R.Zandarin", date=date, snapshot=snapshot)
-            file_widget.setItemWidget(tree_item, 0, custom_widget)
+        def render(files):
+            self.files = files
+            self.files_more = len(files) >= self.versions_page_size
+            self.shown_files = (file_name['task_id'], type)
+            if not self.files:
+                        print(f"No Files found for Task ID: {file_name['task_id']}")
+                        return
+            
+            # Rows come newest first from the database.
+            for file_info in self.files.values():
+                self.add_file_item(file_widget, file_info)
+
+        self.fetch_async(file_widget, lambda: self.db_cache.get_files(file_name['task_id'], self.versions_page_size), render)
+
+    def refresh_files_list(self, type, more=False):
+        """
+        Adds the files missing from the list: the ones saved since it was filled, or with more=True the next page of
+        older files. Only reloads the list when a file already listed changed.
+
+        :param type: "shots" - "assets"
+        :param more: Load the next page of older files as well.
+        """
+        if self.shown_files is None or self.shown_files[1] != type:
+            self.populate_files_list(type)
+            return
+
+        task_id = self.shown_files[0]
+        file_widget = self.scene_files_shots_files_QtreeWidget if type == "shots" else self.scene_files_assets_files_QtreeWidget
+        shown_files = self.files
+        count = len(shown_files) + self.versions_page_size if more else max(len(shown_files), self.versions_page_size)
+
+        def render(files):
+            if any(files.get(version) != file_info for version, file_info in shown_files.items()):
+                self.populate_files_list(type)
+                return
+            self.files = self.insert_version_items(file_widget, shown_files, files, self.add_file_item)
+            self.files_more = len(files) >= count
+
+        self.fetch_async(file_widget, lambda: self.db_cache.get_files(task_id, count), render)
+
+    def add_file_item(self, file_widget, file_info, index=None):
+        version = f"{file_info['version']:03}"
+        comment = file_info['comment'] if file_info['comment'] is not None else ""
+        file_type = file_info['file_type'] if file_info['file_type'] is not None else ""
+        date = file_info['date'] if file_info['date'] is not None else ""
+        # user = file['user'] if file['user'] is not None else ""
+        snapshot_loader = self.get_snapshot_loader(file_info['snapshot_hash'])
+
+        tree_item = QTreeWidgetItem()
+        if index is None:
+            file_widget.addTopLevelItem(tree_item)
+        else:
+            file_widget.insertTopLevelItem(index, tree_item)
+        custom_widget = SceneFileItemWidget(version, file_type, comment, user="R.Zandarin", date=date, snapshot_loader=snapshot_loader)
+        file_widget.setItemWidget(tree_item, 0, custom_widget)
 
     # /USD_CONFIG SPECIFIC.
     def populate_usds_list(self, type):
@@ -748,36 +720,84 @@ class MercuryWindow:
 
             department_name = self.departments.get(self.department_name)
 
-            self.db_cache.clear_cache("sublayer_usds")
-            self.usds = self.db_cache.get_sublayer_usds(department_name['department_id'])
+            fetch = lambda: (self.db_cache.get_sublayer_usds(department_name['department_id'], self.versions_page_size),
+                             self.db_cache.get_current_sublayer_version(department_name['department_id']))
+            shown_usds = ("department_id", department_name['department_id'])
         else:
             self.variant_item = selected_widget.currentItem()
             self.variant_name = self.variant_item.text()
 
             variant_name = self.variants.get(self.variant_name)
 
-            self.db_cache.clear_cache("variant_usds")
-            self.usds = self.db_cache.get_variant_usds(variant_name['var_id'])
+            fetch = lambda: (self.db_cache.get_variant_usds(variant_name['var_id'], self.versions_page_size),
+                             self.db_cache.get_current_variant_version(variant_name['var_id']))
+            shown_usds = ("var_id", variant_name['var_id'])
 
-        # Extract sqlite3.Row objects into a list.
-        usds_list = list(self.usds.values())
-        sorted_usds = sorted(usds_list, key=lambda x: x['version'], reverse=True)
+        def render(result):
+            usds, self.current_usds = result
+            self.usds = usds
+            self.usds_more = len(usds) >= self.versions_page_size
+            self.shown_usds = (shown_usds, type)
 
-        for file_info in sorted_usds:
-            version = f"{file_info['version']:03}"
-            comment = file_info['comment'] if file_info['comment'] is not None else ""
-            date = file_info['date'] if file_info['date'] is not None else ""
-            # user = file['user'] if file['user'] is not None else ""
-            snapshot = file_info['snapshot'] if file_info['snapshot'] is not None else ""
-            pinned = file_info['pinned'] if file_info['pinned'] is not None else ""
+            # Rows come newest first from the database.
+            for file_info in self.usds.values():
+                self.add_usd_item(usd_widget, file_info)
+            
+            # Pass Latest version to details.
+            latest_version = self.get_latest_version(mode="usdConfig", type=type)
+            self.usd_config_asset_latest_version_QLabel.setText(latest_version)
 
-            tree_item = QTreeWidgetItem(usd_widget)
-            custom_widget = UsdFileItemWidget(version, comment, user="R.Zandarin", date=date, pinned=pinned, snapshot=snapshot)
-            usd_widget.setItemWidget(tree_item, 0, custom_widget)
-        
-        # Pass Latest version to details.
-        latest_version = self.get_latest_version(mode="usdConfig", type=type)
-        self.usd_config_asset_latest_version_QLabel.setText(latest_version)
+        self.fetch_async(usd_widget, fetch, render)
+
+    def refresh_usds_list(self, type, more=False):
+        """
+        Adds the versions missing from the list: the ones published since it was filled, or with more=True the next
+        page of older versions. Only reloads the list when a version already listed changed (a pin for instance).
+
+        :param type: "shots" - "assets"
+        :param more: Load the next page of older versions as well.
+        """
+        if self.shown_usds is None or self.shown_usds[1] != type:
+            self.populate_usds_list(type)
+            return
+
+        id_column, id_value = self.shown_usds[0]
+        usd_widget = self.usd_config_shots_variantVersions_QtreeWidget if type == "shots" else self.usd_config_assets_variantVersions_QtreeWidget
+        shown_usds = self.usds
+        count = len(shown_usds) + self.versions_page_size if more else max(len(shown_usds), self.versions_page_size)
+        if id_column == "department_id":
+            fetch = lambda: (self.db_cache.get_sublayer_usds(id_value, count), self.db_cache.get_current_sublayer_version(id_value))
+        else:
+            fetch = lambda: (self.db_cache.get_variant_usds(id_value, count), self.db_cache.get_current_variant_version(id_value))
+
+        def render(result):
+            usds, self.current_usds = result
+            if any(usds.get(version) != file_info for version, file_info in shown_usds.items()):
+                self.populate_usds_list(type)
+                return
+            self.usds = self.insert_version_items(usd_widget, shown_usds, usds, self.add_usd_item)
+            self.usds_more = len(usds) >= count
+
+            latest_version = self.get_latest_version(mode="usdConfig", type=type)
+            self.usd_config_asset_latest_version_QLabel.setText(latest_version)
+
+        self.fetch_async(usd_widget, fetch, render)
+
+    def add_usd_item(self, usd_widget, file_info, index=None):
+        version = f"{file_info['version']:03}"
+        comment = file_info['comment'] if file_info['comment'] is not None else ""
+        date = file_info['date'] if file_info['date'] is not None else ""
+        # user = file['user'] if file['user'] is not None else ""
+        snapshot_loader = self.get_snapshot_loader(file_info['snapshot_hash'])
+        pinned = file_info['pinned'] if file_info['pinned'] is not None else ""
+
+        tree_item = QTreeWidgetItem()
+        if index is None:
+            usd_widget.addTopLevelItem(tree_item)
+        else:
+            usd_widget.insertTopLevelItem(index, tree_item)
+        custom_widget = UsdFileItemWidget(version, comment, user="R.Zandarin", date=date, pinned=pinned, snapshot_loader=snapshot_loader)
+        usd_widget.setItemWidget(tree_item, 0, custom_widget)
        
     def populate_selection_details(self, context, type):
         if context == "usdConfig":
@@ -793,12 +813,15 @@ class MercuryWindow:
 
                 self.usd_config_asset_type_QLabel.setText(type_widget_parent_name)
 
-                assets = self.db_cache.get_assets()
-                selected_asset = assets.get(type_widget_name)
-                selected_asset_description = selected_asset['description']
+                def render(assets):
+                    selected_asset = assets.get(type_widget_name)
+                    selected_asset_description = selected_asset['description']
+
+                    self.usd_config_asset_description_QLabel.setText(selected_asset_description)
 
-                self.usd_config_asset_description_QLabel.setText(selected_asset_description)
+                self.fetch_async(self.usd_config_asset_description_QLabel, self.db_cache.get_assets, render)
         else:
+            self.db_executor.cancel(self.usd_config_asset_description_QLabel)  # A description still loading would overwrite the cleared label.
             self.usd_config_asset_type_QLabel.setText("")
             self.usd_config_asset_description_QLabel.setText("")
             self.usd_config_asset_latest_version_QLabel.setText("")
@@ -838,7 +861,16 @@ class MercuryWindow:
         # Clear the widgets from the specified position onwards.
         if widgets_to_clear and position < len(widgets_to_clear):
             for widget in widgets_to_clear[position:]:
+                self.db_executor.cancel(widget)  # Results still on their way for this list are now stale.
                 widget.clear()
+
+            # The cleared version lists no longer follow the changelog until they are populated again.
+            if any(widget is self.usd_config_assets_variantVersions_QtreeWidget or widget is self.usd_config_shots_variantVersions_QtreeWidget
+                   for widget in widgets_to_clear[position:]):
+                self.shown_usds = None
+            if any(widget is self.scene_files_assets_files_QtreeWidget or widget is self.scene_files_shots_files_QtreeWidget
+                   for widget in widgets_to_clear[position:]):
+                self.shown_files = None
         else:
             print("not being executed")
 
@@ -1032,8 +1064,7 @@ class MercuryWindow:
         if all is not None:
             all_items = self.get_all_items(self.scene_files_assets_QtreeWidget)
 
-            for item in all_items:
-                self.um.delete_usd_entity(entity_type="asset", name=item)
+            self.um.delete_usd_entities(entity_type="asset", names=all_items)
 
             self.refresh("asset")
         else:
@@ -1055,27 +1086,31 @@ class MercuryWindow:
     def delete_sequence_usd(self, all=None):
         if all is not None:
             all_items = self.get_all_child_items_with_parents(self.scene_files_shots_QtreeWidget)
-            for item in all_items:
-                shot_item = item['child']
-                sequence_item = item['parent']
-                self.um.delete_usd_entity(entity_type="shot", name=shot_item, seq_name=sequence_item)
-            for item in all_items:
-                shot_item = item['child']
-                sequence_item = item['parent']
-                self.um.delete_usd_entity(entity_type="sequence", name=sequence_item)
+            # One commit for the whole deletion.
+            with self.um.db.transaction():
+                for item in all_items:
+                    shot_item = item['child']
+                    sequence_item = item['parent']
+                    self.um.delete_usd_entity(entity_type="shot", name=shot_item, seq_name=sequence_item)
+                for item in all_items:
+                    shot_item = item['child']
+                    sequence_item = item['parent']
+                    self.um.delete_usd_entity(entity_type="sequence", name=sequence_item)
                 
             self.refresh("sequence")
         else:
             sequence_item = self.scene_files_shots_QtreeWidget.currentItem()
             sequence_name = sequence_item.text(0)
             
-            self.um.delete_usd_entity(entity_type="sequence", name=sequence_name)
+            # One commit for the sequence and its shots.
+            with self.um.db.transaction():
+                self.um.delete_usd_entity(entity_type="sequence", name=sequence_name)
 
-            children = []
-            for i in range(sequence_item.childCount()):
-                child_item = sequence_item.child(i)
-                child_name = child_item.text(0)
-                self.um.delete_usd_entity(entity_type="shot", name=child_name, seq_name=sequence_name)
+                children = []
+                for i in range(sequence_item.childCount()):
+                    child_item = sequence_item.child(i)
+                    child_name = child_item.text(0)
+                    self.um.delete_usd_entity(entity_type="shot", name=child_name, seq_name=sequence_name)
 
             self.refresh("sequence")
 
@@ -1099,7 +1134,9 @@ class MercuryWindow:
             for i in range(sequence_item.childCount()):
                 child_item = sequence_item.child(i)
                 child_name = child_item.text(0)
-                self.um.delete_usd_entity(entity_type="shot", name=child_name, seq_name=sequence_name)
+                children.append(child_name)
+
+            self.um.delete_usd_entities(entity_type="shot", names=children, seq_name=sequence_name)
 
             self.refresh("shot")
 
@@ -1122,31 +1159,38 @@ class MercuryWindow:
 
             selected_text = asset_selected_item.text(0)
             asset_name = self.assets.get(selected_text)
-            self.departments = self.db_cache.get_asset_departments(asset_name['id'])
-            
-            department_selection = []
 
-            for department_key, department_value in self.departments.items():
-                department_selection.append(department_value['name'])
+            # The dialog opens once the departments of the asset are loaded.
+            def render(departments):
+                self.departments = departments
+
+                department_selection = []
+
+                for department_key, department_value in self.departments.items():
+                    department_selection.append(department_value['name'])
+                        
+                dialog = DepartmentSelectionDialog(department_selection)
+
+                if dialog.exec_() == QDialog.Accepted:
+                    selected_info = dialog.get_selected_departments()
+                    print(selected_info)
                     
-            dialog = DepartmentSelectionDialog(department_selection)
 
-            if dialog.exec_() == QDialog.Accepted:
-                selected_info = dialog.get_selected_departments()
-                print(selected_info)
-                
+                    # Every department change of the dialog is committed at once, the asset layer is saved once.
+                    with self.um.edit_session():
+                        for department_name, is_selected, index in selected_info:
+                            existing_department = self.departments.get(department_name)
+                            print("existing_department", existing_department)
+                            if is_selected and existing_department is None: # Create New Department.
+                                self.um.create_usd_sublayer(entity_type="asset", parent_name=self.asset_name, sublayer_name=department_name)
+                                print("create new department")
+                            elif not is_selected and existing_department is not None: # Delete Department if Exists.
+                                self.um.delete_usd_sublayer(entity_type="asset", parent_name=self.asset_name, sublayer_name=department_name)
+                                print(f"deleted {department_name} department")
+
+                    self.refresh("department")
 
-                for department_name, is_selected, index in selected_info:
-                    existing_department = self.departments.get(department_name)
-                    print("existing_department", existing_department)
-                    if is_selected and existing_department is None: # Create New Department.
-                        self.um.create_usd_sublayer(entity_type="asset", parent_name=self.asset_name, sublayer_name=department_name)
-                        print("create new department")
-                        self.refresh("department")
-                    elif not is_selected and existing_department is not None: # Delete Department if Exists.
-                        self.um.delete_usd_sublayer(entity_type="asset", parent_name=self.asset_name, sublayer_name=department_name)
-                        print(f"deleted {department_name} department")
-                        self.refresh("department")
+            self.fetch_async("edit_departments", lambda: self.db_cache.get_asset_departments(asset_name['id']), render)
 
                 
         # Conditional if Shots Button is checked.
@@ -1398,33 +1442,25 @@ class MercuryWindow:
 
         asset_item = self.usd_config_assets_QtreeWidget.currentItem()
         asset_name = asset_item.text(0)
-        asset_info = self.db.get_asset(asset_name)
-        asset_id = asset_info['id']
 
         department_item = self.usd_config_assets_department_QListWidget.currentItem()
         department_name = department_item.text()
-        department_info = self.db.get_department("asset", asset_id, department_name)
-        department_id = department_info['department_id']
 
         setVar_item = self.usd_config_assets_setVar_QListWidget.currentItem()
         setVar_name = setVar_item.text()
-        setVar_info = self.db.get_setVar(department_id, setVar_name)
-        setVar_path = setVar_info['usd_path']
-        setVar_id = setVar_info['setVar_id']
 
         var_item = self.usd_config_assets_variant_QListWidget.currentItem()
         var_name = var_item.text()
-        var_info = self.db.get_variant(setVar_id, var_name)
-        var_id = var_info['var_id']
-
 
         variantVersions_item = self.usd_config_assets_variantVersions_QtreeWidget.currentItem()
         variantVersions_widget = self.usd_config_assets_variantVersions_QtreeWidget.itemWidget(variantVersions_item, 0)
         variantVersions_version = variantVersions_widget.get_version() # Returns Text
 
-        variantVersion_info = self.db.get_variantVersion("variant", var_id, variantVersions_version)
+        # Resolve asset/department/setVar/variant/version in one query.
+        variantVersion_info = self.db.resolve(asset_name, department_name, setVar_name, var_name, variantVersions_version)
+        setVar_path = variantVersion_info['setVar_path']
         variantVersion_id = variantVersion_info['variantVersion_id']
-        variantversion_path = variantVersion_info['usd_path'] 
+        variantversion_path = variantVersion_info['variantVersion_path']
         
         if mode == "pin":
         
@@ -1438,65 +1474,26 @@ class MercuryWindow:
 
             self.db.update_variantVersion(variantVersion_id=variantVersion_id, pinned=False)
 
-            highest_version = 0
-            highest_version_item = None
-
-            # Iterate over each top-level item in the QTreeWidget
-            for i in range(self.usd_config_assets_variantVersions_QtreeWidget.topLevelItemCount()):
-                # Get the QTreeWidgetItem at the current index
-                tree_item = self.usd_config_assets_variantVersions_QtreeWidget.topLevelItem(i)
-                
-                # Assuming you have a custom widget in the first column, retrieve the widget
-                version_widget = self.usd_config_assets_variantVersions_QtreeWidget.itemWidget(tree_item, 0)
-                
-                item_version_str = version_widget.get_version()
-                try:
-                    item_version = int(item_version_str)
-                    
-                    # Compare and find the highest version number
-                    if item_version >= highest_version:
-                        highest_version = item_version
-                        highest_version_item = tree_item
-
-                except ValueError:
-                    print(f"Could not convert version '{item_version_str}' to integer.")
-            
-            latest_item_version = str(highest_version).zfill(3)
-            latest_variantVersion_info = self.db.get_variantVersion("variant", var_id, latest_item_version)
-            variantVersion_id = latest_variantVersion_info['variantVersion_id']
-            variantversion_path = latest_variantVersion_info['usd_path'] 
+            # The variant falls back to its latest published version.
+            current = self.db.get_current_version("variant", variantVersion_info['var_id'])
+            variantversion_path = current['latest_path']
 
             self.um.edit_usd_setVar(setVar_path=setVar_path, setVar_name=setVar_name, var_name=var_name, variantVersion_path=variantversion_path)
 
 
-        self.populate_usds_list(type="assets")
+        self.refresh_usds_list(type="assets")
     
 
     # Auxiliary functions.
     def get_latest_version(self, mode, type):
-        if mode == "usdConfig":
-            if type == "assets":
-                highest_version = 0
-                
-                # Iterate over each top-level item in the QTreeWidget
-                for i in range(self.usd_config_assets_variantVersions_QtreeWidget.topLevelItemCount()):
-                    # Get the QTreeWidgetItem at the current index
-                    tree_item = self.usd_config_assets_variantVersions_QtreeWidget.topLevelItem(i)
-                    
-                    # Assuming you have a custom widget in the first column, retrieve the widget
-                    version_widget = self.usd_config_assets_variantVersions_QtreeWidget.itemWidget(tree_item, 0)
-                    
-                    item_version_str = version_widget.get_version()
-                    try:
-                        item_version = int(item_version_str)
-                        
-                        # Compare and find the highest version number
-                        if item_version >= highest_version:
-                            highest_version = item_version
-                            print(highest_version)
-                    except ValueError:
-                        print(f"Could not convert version '{item_version_str}' to integer.")
+        """
+        Returns the latest published version of the variant/department shown in the usdConfig version tree, as
+        zero padded text. Read from the current_versions row fetched along with the list.
 
+        """
+        highest_version = 0
+        if mode == "usdConfig" and self.current_usds is not None:
+            highest_version = self.current_usds['latest_version']
         return str(highest_version).zfill(3)
 
     def toggle_qactions(self):
@@ -1556,7 +1553,7 @@ class MercuryWindow:
                 elif type == "task":
                     QTimer.singleShot(10, lambda: self.populate_tasks_list(type="assets")) # Add delay of 10 miliseconds.
                 elif type == "file":
-                    QTimer.singleShot(10, lambda: self.populate_files_list(type="assets")) # Add delay of 10 miliseconds.
+                    QTimer.singleShot(10, lambda: self.refresh_files_list(type="assets")) # Add delay of 10 miliseconds.
             
             # Conditional if shots button is checked
             elif self.scene_files_shots_QPushButton.isChecked():
@@ -1567,7 +1564,7 @@ class MercuryWindow:
                 elif type == "task":
                     QTimer.singleShot(10, lambda: self.populate_tasks_list(type="shots")) # Add delay of 10 miliseconds.
                 elif type == "file":
-                    QTimer.singleShot(10, lambda: self.populate_files_list(type="shots")) # Add delay of 10 miliseconds.
+                    QTimer.singleShot(10, lambda: self.refresh_files_list(type="shots")) # Add delay of 10 miliseconds.
         else:
             if self.usd_config_assets_QPushButton.isChecked():
                 if type == "sequence" or type == "shot":
@@ -1579,12 +1576,137 @@ class MercuryWindow:
                 elif type == "variant":
                     QTimer.singleShot(10, self.populate_variants_list) # Add delay of 10 miliseconds.
                 elif type == "usds":
-                    QTimer.singleShot(10, lambda: self.populate_usds_list(type="assets")) # Add delay of 10 miliseconds.
+                    QTimer.singleShot(10, lambda: self.refresh_usds_list(type="assets")) # Add delay of 10 miliseconds.
             elif self.usd_config_shots_QPushButton.isChecked():
                 pass
         
         self.main_window.status_bar.showMessage(f"refresh", 5000) 
 
+    def run_search(self):
+        """
+        Lists the rows matching the search box, best match first. An empty search box hides the list.
+
+        """
+        text = self.search_QLineEdit.text().strip()
+        if not text:
+            self.db_executor.cancel(self.search_results_QListWidget)
+            self.search_results_QListWidget.clear()
+            self.search_results_QListWidget.hide()
+            return
+
+        def render(hits):
+            self.search_results_QListWidget.clear()
+            for hit in hits:
+                name = hit['name'] or os.path.basename(hit['path'] or "")
+                item = QListWidgetItem(f"{hit['kind']}  {name}  {hit['snippet'] or ''}")
+                item.setData(Qt.UserRole, hit['path'])
+                item.setToolTip(hit['path'] or "")
+                self.search_results_QListWidget.addItem(item)
+            if not hits:
+                self.search_results_QListWidget.addItem(f"No results for \"{text}\"")
+            self.search_results_QListWidget.show()
+
+        self.fetch_async(self.search_results_QListWidget, lambda: self.db.search(text), render)
+
+    def on_search_result_clicked(self, item):
+        path = item.data(Qt.UserRole)
+        if path:
+            self.main_window.status_bar.showMessage(path, 10000)
+
+    def fetch_async(self, channel, fetch, render):
+        """
+        Runs fetch() on the database thread and calls render(result) on the UI thread once it is done.
+
+        :param channel: The widget the result is for. A newer request on the same widget discards this one.
+        """
+        future = self.db_executor.submit(channel, fetch)
+        self.db_relay.watch(channel, future, render)
+
+    def poll_changes(self):
+        """
+        Checks the database for changes made by other artists and refreshes the version list they affect.
+
+        """
+        future = self.db_executor.submit("changes", self.db_cache.poll)
+        self.db_relay.watch("changes", future, self.on_database_changed)
+
+    def on_database_changed(self, changes):
+        if changes == []:
+            return
+
+        # None means too much changed to tell, every list on screen is reloaded.
+        changed_parents = {(change['parent_column'], change['parent_id']) for change in changes} if changes is not None else None
+        if self.shown_usds is not None and (changed_parents is None or self.shown_usds[0] in changed_parents):
+            self.refresh_usds_list(type=self.shown_usds[1])
+        if self.shown_files is not None and (changed_parents is None or ("task_id", self.shown_files[0]) in changed_parents):
+            self.refresh_files_list(type=self.shown_files[1])
+
+    def load_more_versions(self, kind, type):
+        """
+        Loads the next page of older versions once a version tree is scrolled to its bottom.
+
+        :param kind: "usds" - "files"
+        :param type: "shots" - "assets"
+        """
+        if kind == "usds":
+            widget = self.usd_config_shots_variantVersions_QtreeWidget if type == "shots" else self.usd_config_assets_variantVersions_QtreeWidget
+            shown, more = self.shown_usds, self.usds_more
+        else:
+            widget = self.scene_files_shots_files_QtreeWidget if type == "shots" else self.scene_files_assets_files_QtreeWidget
+            shown, more = self.shown_files, self.files_more
+        if shown is None or shown[1] != type or not more:
+            return
+
+        scroll_bar = widget.verticalScrollBar()
+        if scroll_bar.value() < scroll_bar.maximum() - scroll_bar.pageStep():
+            return  # Not near the bottom yet.
+
+        if kind == "usds":
+            self.refresh_usds_list(type, more=True)
+        else:
+            self.refresh_files_list(type, more=True)
+
+    def insert_version_items(self, widget, shown, rows, add_item):
+        """
+        Adds the rows missing from a version tree sorted newest first, each one at its sorted position.
+
+        :param shown: The {version: row} dictionary already in the tree.
+        :param rows: The {version: row} dictionary to show, newest first.
+        :param add_item: add_usd_item or add_file_item.
+        :return: The {version: row} dictionary now in the tree, newest first.
+        """
+        # Negated versions sort ascending, their insertion point is the number of newer versions in the tree.
+        negated_versions = sorted(-version for version in shown)
+        for version, row in rows.items():
+            if version in shown:
+                continue
+            index = bisect.bisect_left(negated_versions, -version)
+            add_item(widget, row, index=index)
+            negated_versions.insert(index, -version)
+
+        merged = dict(shown)
+        merged.update(rows)
+        return dict(sorted(merged.items(), reverse=True))
+
+    def get_snapshot_loader(self, snapshot_hash):
+        """
+        Returns a callable that fetches a version snapshot from the thumbnail store on the database thread and shows
+        it in the SnapshotView passed to it, or None if the version has no snapshot.
+
+        """
+        if not snapshot_hash:
+            return None
+
+        def render(view, snapshot):
+            if not snapshot:
+                return
+            try:
+                view.set_snapshot(snapshot)
+            except RuntimeError:
+                pass  # The row was removed from its list while the thumbnail was loading.
+
+        return lambda view: self.fetch_async(view, lambda: self.db_cache.get_thumbnail(snapshot_hash), lambda snapshot: render(view, snapshot))
+
     def get_icons(self, type, name):
         icon_path = os.path.join(self.icons_dir, f"{type}_{name}_icon.png")
         icon_item = QIcon(icon_path)
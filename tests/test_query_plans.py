@@ -0,0 +1,69 @@
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import unittest
+
+# lib/__init__ imports the Maya modules, data_base is loaded on its own.
+spec = importlib.util.spec_from_file_location("data_base", os.path.join(os.path.dirname(__file__), "..", "lib", "data_base.py"))
+data_base = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(data_base)
+
+# The tables and triggers of a project created before the schema migrations, at user_version 0.
+baseline_schema = [
+    data_base.ProjectDataBase.create_assets_sql,
+    data_base.ProjectDataBase.create_sequences_sql,
+    data_base.ProjectDataBase.create_shots_sql,
+    data_base.ProjectDataBase.create_departments_sql,
+    data_base.ProjectDataBase.create_setVar_sql,
+    data_base.ProjectDataBase.create_variant_sql,
+    data_base.ProjectDataBase.create_variantVersion_sql,
+    data_base.ProjectDataBase.create_tasks_sql,
+    data_base.ProjectDataBase.create_files_sql,
+    data_base.ProjectDataBase.trigger_insert_variantVersion_sql,
+    data_base.ProjectDataBase.trigger_update_variantVersion_sql,
+]
+
+
+class HotQueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.folder.name, "project.db")
+
+    def tearDown(self):
+        for pool in data_base.ConnectionPool._pools.values():
+            pool.close_all()
+        data_base.ConnectionPool._pools.clear()
+        self.folder.cleanup()
+
+    def test_fresh_database_uses_indexes(self):
+        db = data_base.ProjectDataBase(self.db_path)
+        self.assertEqual(db.explain_hot_queries(), [])
+
+    def test_upgraded_database_uses_indexes(self):
+        connection = sqlite3.connect(self.db_path)
+        try:
+            for sql in baseline_schema:
+                connection.execute(sql)
+            connection.execute("INSERT INTO assets (type, name, usd_path) VALUES ('prop', 'car', '/car.usda')")
+            connection.execute("INSERT INTO departments (asset_id, name, usd_path) VALUES (1, 'geo', '/geo.usda')")
+            connection.execute("INSERT INTO tasks (department_id, name) VALUES (1, 'model')")
+            connection.execute("INSERT INTO files (task_id, version, date, file_path) VALUES (1, 1, '2024-01-01 10:00:00', '/v001.ma')")
+            connection.commit()
+        finally:
+            connection.close()
+
+        db = data_base.ProjectDataBase(self.db_path)
+        self.assertEqual(db.get_schema_version(), len(db.migrations))
+        self.assertEqual(db.explain_hot_queries(), [])
+
+    def test_missing_index_is_reported(self):
+        db = data_base.ProjectDataBase(self.db_path)
+        # idx_files_task_version is replaced by its UNIQUE version by the migrations, it is the one the file lookups use.
+        db.connect().execute("DROP INDEX idx_files_task_version_unique")
+
+        self.assertIn(("get_files", "SCAN files"), db.explain_hot_queries())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import unittest
+
+# lib/__init__ imports the Maya modules, data_base is loaded on its own.
+spec = importlib.util.spec_from_file_location("data_base", os.path.join(os.path.dirname(__file__), "..", "lib", "data_base.py"))
+data_base = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(data_base)
+
+
+class SnapshotWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.folder.name, "project.db")
+        self.db = data_base.ProjectDataBase(self.db_path, snapshot=True)
+
+    def tearDown(self):
+        self.db.pool.close_all()
+        data_base.ConnectionPool._pools.clear()
+        self.folder.cleanup()
+
+    def test_failed_write_releases_the_file(self):
+        asset_id = self.db.create_asset("prop", "car", "/car.usda", "")
+        department_id = self.db.create_department("asset", asset_id, "geo", "/geo.usda")
+        self.db.create_variantVersion("department", department_id, 1, "", "2024-01-01 10:00:00", "/v001.usda", b"first")
+
+        # Same version number: the thumbnail insert runs, then the version insert fails.
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.create_variantVersion("department", department_id, 1, "", "2024-01-01 10:00:00", "/v001b.usda", b"second")
+
+        self.assertFalse(self.db.connect().file_connection.in_transaction)
+        other = sqlite3.connect(self.db_path, timeout=0.2)
+        try:
+            other.execute("INSERT INTO assets (type, name) VALUES ('prop', 'truck')")
+            other.commit()
+            self.assertEqual(other.execute("SELECT COUNT(*) FROM thumbnails").fetchone()[0], 1)
+        finally:
+            other.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
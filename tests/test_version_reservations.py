@@ -0,0 +1,61 @@
+import importlib.util
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import unittest
+
+# lib/__init__ imports the Maya modules, data_base is loaded on its own.
+spec = importlib.util.spec_from_file_location("data_base", os.path.join(os.path.dirname(__file__), "..", "lib", "data_base.py"))
+data_base = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(data_base)
+
+processes = 8
+reservations = 50
+
+
+def reserve_versions(db_path, department_id, task_id):
+    # Runs in the worker processes, each one opens its own connections.
+    db = data_base.ProjectDataBase(db_path)
+    versions = []
+    for _ in range(reservations):
+        versions.append(("variantVersion", db.reserve_variantVersion("department", department_id)[1]))
+        versions.append(("files", db.reserve_file(task_id)[1]))
+    db.pool.close_all()
+    return versions
+
+
+class ConcurrentReservationTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.folder.name, "project.db")
+        self.db = data_base.ProjectDataBase(self.db_path)
+
+    def tearDown(self):
+        self.db.pool.close_all()
+        data_base.ConnectionPool._pools.clear()
+        self.folder.cleanup()
+
+    def test_concurrent_reservations_get_unique_versions(self):
+        asset_id = self.db.create_asset("prop", "car", "/car.usda", "")
+        department_id = self.db.create_department("asset", asset_id, "geo", "/geo.usda")
+        task_id = self.db.create_task(department_id, "model")
+
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(reserve_versions, [(self.db_path, department_id, task_id)] * processes)
+
+        expected = list(range(1, processes * reservations + 1))
+        for table, scope_column, scope_value in (("variantVersion", "department_id", department_id), ("files", "task_id", task_id)):
+            reserved = sorted(version for versions in results for reserved_table, version in versions if reserved_table == table)
+            self.assertEqual(reserved, expected)
+
+            connection = sqlite3.connect(self.db_path)
+            try:
+                stored = sorted(row[0] for row in connection.execute(f"SELECT version FROM {table} WHERE {scope_column} = ?", (scope_value,)))
+            finally:
+                connection.close()
+            self.assertEqual(stored, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
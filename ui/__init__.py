@@ -1,2 +1,2 @@
 from .ui_mainWindow import MainWindow
-from .ui_utils import SceneFileItemWidget, UsdFileItemWidget
+from .ui_utils import SceneFileItemWidget, UsdFileItemWidget, DataBaseResultRelay
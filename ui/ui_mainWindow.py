@@ -65,9 +65,23 @@ class MainWindow(QMainWindow):
         self.mode_buttons_layout.addWidget(self.usd_config_button)
 
         self.mode_buttons_layout.addStretch(1)
+
+        # Search box, the hits are listed under the mode buttons while it holds text.
+        self.search_QLineEdit = QLineEdit()
+        self.search_QLineEdit.setObjectName("search_QLineEdit")
+        self.search_QLineEdit.setPlaceholderText("Search names, descriptions and comments")
+        self.search_QLineEdit.setClearButtonEnabled(True)
+        self.search_QLineEdit.setMaximumWidth(300)
+        self.mode_buttons_layout.addWidget(self.search_QLineEdit)
         
         self.main_layout.addLayout(self.mode_buttons_layout)
 
+        self.search_results_QListWidget = QListWidget()
+        self.search_results_QListWidget.setObjectName("search_results_QListWidget")
+        self.search_results_QListWidget.setMaximumHeight(150)
+        self.search_results_QListWidget.hide()
+        self.main_layout.addWidget(self.search_results_QListWidget)
+
         # Create StackedWidget for modes
         self.mode_stackedWidget = QStackedWidget()
         self.main_layout.addWidget(self.mode_stackedWidget)
@@ -1,7 +1,7 @@
 from lib import maya_utils
 from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QGraphicsView, QGraphicsScene, QGraphicsPixmapItem,
                                 QSizePolicy, QFrame, QListWidget, QPushButton, QAction, QDialog, QFormLayout, QLineEdit, QListWidgetItem, QTextEdit)
-from PySide2.QtCore import QSize, Qt
+from PySide2.QtCore import QSize, Qt, QObject, Signal
 
 
 running_in_maya = False
@@ -14,11 +14,92 @@ except ImportError:
 
 
 
+class DataBaseResultRelay(QObject):
+    """
+    Hands the results of a DataBaseExecutor back to the Qt main thread.
+
+    The future callback runs on the worker thread and only emits a signal, the queued connection then calls the
+    render callback on the thread owning the relay. Results of superseded or cancelled requests are dropped.
+    """
+    result_ready = Signal(object, object, object)
+
+    def __init__(self, executor, parent=None):
+        """
+        :param executor: The DataBaseExecutor the watched futures come from.
+        """
+        super(DataBaseResultRelay, self).__init__(parent)
+        self.executor = executor
+        self.result_ready.connect(self.deliver)
+
+    def watch(self, channel, future, callback):
+        """
+        Calls callback(result) on the main thread once future is done, if it is still the latest request of channel.
+
+        """
+        future.add_done_callback(lambda done_future: self.result_ready.emit(channel, done_future, callback))
+
+    def deliver(self, channel, future, callback):
+        if future.cancelled() or not self.executor.is_current(channel, future):
+            return
+        self.executor.release(channel, future)
+
+        error = future.exception()
+        if error is not None:
+            print(f"Database request failed: {error}")
+            return
+        callback(future.result())
+
+
+class SnapshotView(QGraphicsView):
+    """
+    Fixed size view holding the snapshot image of a version Item.
+
+    The image can be given directly or through a loader, which is only called the first time the view is shown,
+    so rows that are never scrolled into view never fetch their thumbnail. The loader only starts the fetch, the
+    image is set once it arrives, so showing a row never waits on the database.
+    """
+    def __init__(self, snapshot=None, snapshot_loader=None, parent=None):
+        """
+        :param snapshot: The snapshot image bytes (optional).
+        :param snapshot_loader: Callable taking this view, it fetches the snapshot in the background and calls
+                                set_snapshot() with it (optional).
+        """
+        self.snapshot_scene = QGraphicsScene()
+        super(SnapshotView, self).__init__(self.snapshot_scene, parent)
+        self.maya_utils = maya_utils.InternalMayaUtils()
+        self.snapshot_loader = snapshot_loader
+
+        self.setFixedSize(90, 50)
+        self.setContentsMargins(0, 0, 0, 0)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+
+        if snapshot:
+            self.set_snapshot(snapshot)
+
+    def set_snapshot(self, snapshot):
+        """
+        Replaces the image shown in the view.
+
+        :param snapshot: The snapshot image bytes.
+        """
+        pixmap = self.maya_utils.blob_to_pixmap(snapshot)
+        self.snapshot_scene.clear()
+        self.snapshot_scene.addItem(QGraphicsPixmapItem(pixmap))
+
+    def showEvent(self, event):
+        super(SnapshotView, self).showEvent(event)
+
+        # Fetch the thumbnail only once, the first time the Item is visible.
+        if self.snapshot_loader is not None:
+            snapshot_loader, self.snapshot_loader = self.snapshot_loader, None
+            snapshot_loader(self)
+
 class SceneFileItemWidget(QFrame):
     """
     Custom Widget (QFrame) to hold the Scene Version Files.
     """
-    def __init__(self, version, scene_type, comment, user, date, snapshot=None, parent=None):
+    def __init__(self, version, scene_type, comment, user, date, snapshot=None, parent=None, snapshot_loader=None):
         """
         Init function that constructs the widget.
 
@@ -28,6 +109,7 @@ class SceneFileItemWidget(QFrame):
         :param user: The user that created the Scene File Item.
         :param date: The date of the Scene File Item.
         :param snapshot: The snapshot image asociated with the Scene File Item.
+        :param snapshot_loader: Callable loading the snapshot into the view, called lazily when the Item is first shown.
         """
         super(SceneFileItemWidget, self).__init__(parent)
         self.maya_utils = maya_utils.InternalMayaUtils()
@@ -73,26 +155,9 @@ class SceneFileItemWidget(QFrame):
 
         self.layout.addWidget(col3_container_widget)
 
-        # Assuming this is all in a method of a class that includes maya_utils and self
-        pixmap = self.maya_utils.blob_to_pixmap(snapshot)
-        snapshot_pixmap_item = QGraphicsPixmapItem(pixmap)
-
-        # Create a scene and add the pixmap item to it
-        snapshot_scene = QGraphicsScene()
-        snapshot_scene.addItem(snapshot_pixmap_item)
-
-        # Create the view and set its scene
-        col4_snapshot = QGraphicsView(snapshot_scene)
-        
-        col4_snapshot.setFixedSize(90, 50) 
-        col4_snapshot.setContentsMargins(0, 0, 0, 0)
-        col4_snapshot.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        col4_snapshot.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-
-        # Set the scene on the view
-        col4_snapshot.setScene(snapshot_scene)
-
-        self.layout.addWidget(col4_snapshot)
+        # Column 4: Snapshot, fetched from the thumbnail store the first time the row is shown.
+        self.col4_snapshot = SnapshotView(snapshot=snapshot, snapshot_loader=snapshot_loader)
+        self.layout.addWidget(self.col4_snapshot)
 
         self.setLayout(self.layout)
 
@@ -111,7 +176,7 @@ class UsdFileItemWidget(QFrame):
     """
     Custom Widget (QFrame) to hold the USD Version Files.
     """
-    def __init__(self, version, comment, user, date, pinned, snapshot=None, parent=None):
+    def __init__(self, version, comment, user, date, pinned, snapshot=None, parent=None, snapshot_loader=None):
         """
         Init function that constructs the widget.
 
@@ -121,6 +186,7 @@ class UsdFileItemWidget(QFrame):
         :param date: The date of the Scene File Item.
         :param pinned: Boolean if the USD Item is pinned.
         :param snapshot: The snapshot image asociated with the Scene File Item.
+        :param snapshot_loader: Callable loading the snapshot into the view, called lazily when the Item is first shown.
         """
         
         super(UsdFileItemWidget, self).__init__(parent)
@@ -164,26 +230,9 @@ class UsdFileItemWidget(QFrame):
 
         self.layout.addWidget(col3_container_widget)
         
-        # Assuming this is all in a method of a class that includes maya_utils and self
-        pixmap = self.maya_utils.blob_to_pixmap(snapshot)
-        snapshot_pixmap_item = QGraphicsPixmapItem(pixmap)
-
-        # Create a scene and add the pixmap item to it
-        snapshot_scene = QGraphicsScene()
-        snapshot_scene.addItem(snapshot_pixmap_item)
-
-        # Create the view and set its scene
-        col4_snapshot = QGraphicsView(snapshot_scene)
-        
-        col4_snapshot.setFixedSize(90, 50) 
-        col4_snapshot.setContentsMargins(0, 0, 0, 0)
-        col4_snapshot.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        col4_snapshot.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-
-        # Set the scene on the view
-        col4_snapshot.setScene(snapshot_scene)
-
-        self.layout.addWidget(col4_snapshot)
+        # Column 4: Snapshot, fetched from the thumbnail store the first time the row is shown.
+        self.col4_snapshot = SnapshotView(snapshot=snapshot, snapshot_loader=snapshot_loader)
+        self.layout.addWidget(self.col4_snapshot)
 
         self.setLayout(self.layout)
 